@@ -61,11 +61,54 @@ def create_app():
     app.config['HOUSEHOLD_LIMITS'] = HOUSEHOLD_LIMITS
     app.config['STRIPE_PRICE_IDS'] = STRIPE_PRICE_IDS
 
+    # AI requests run as background jobs; AI_MODEL_CLIENT=fake answers them without calling Gemini.
+    app.config['AI_MODEL_CLIENT'] = os.getenv('AI_MODEL_CLIENT', 'gemini')
+    app.config['AI_JOB_WORKERS'] = int(os.getenv('AI_JOB_WORKERS', 4))
+    app.config['AI_JOBS_INLINE'] = os.getenv('AI_JOBS_INLINE', '').lower() in ('1', 'true', 'yes')
+    app.config['AI_JOB_STALE_AFTER'] = int(os.getenv('AI_JOB_STALE_AFTER', 600))
+    app.config['AI_REQUEST_TIMEOUT'] = int(os.getenv('AI_REQUEST_TIMEOUT', 120))
+    # Responses to repeated prompts for these tasks are served from the ai_response_cache table.
+    app.config['AI_CACHE_ENABLED'] = os.getenv('AI_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['AI_CACHE_TASKS'] = os.getenv('AI_CACHE_TASKS', 'import_recipe,nutrition,remix').split(',')
+    app.config['AI_CACHE_TTL'] = int(os.getenv('AI_CACHE_TTL', 30 * 24 * 3600))
+    app.config['AI_CACHE_MAX_ENTRIES'] = int(os.getenv('AI_CACHE_MAX_ENTRIES', 10000))
+    app.config['AI_CACHE_HITS_CHARGE_CREDITS'] = os.getenv('AI_CACHE_HITS_CHARGE_CREDITS', 'true').lower() in ('1', 'true', 'yes')
+    # URL imports fetch at most IMPORT_CONCURRENCY pages at once per process, and space requests
+    # to one host IMPORT_HOST_INTERVAL seconds apart. Batch imports commit recipes in groups.
+    app.config['IMPORT_CONCURRENCY'] = int(os.getenv('IMPORT_CONCURRENCY', 4))
+    app.config['IMPORT_HOST_INTERVAL'] = float(os.getenv('IMPORT_HOST_INTERVAL', 1.0))
+    app.config['IMPORT_COMMIT_BATCH'] = int(os.getenv('IMPORT_COMMIT_BATCH', 10))
+    app.config['IMPORT_BATCH_MAX_URLS'] = int(os.getenv('IMPORT_BATCH_MAX_URLS', 200))
+    # Characters of cleaned page text sent to the model when a page has no complete schema.org recipe.
+    app.config['IMPORT_MAX_PAGE_CHARS'] = int(os.getenv('IMPORT_MAX_PAGE_CHARS', 12000))
+    # CSV uploads are written and committed this many rows at a time.
+    app.config['CSV_IMPORT_CHUNK_ROWS'] = int(os.getenv('CSV_IMPORT_CHUNK_ROWS', 1000))
+    app.config['CSV_IMPORT_MAX_ERRORS'] = int(os.getenv('CSV_IMPORT_MAX_ERRORS', 100))
+    # Exports are streamed from the database this many rows at a time.
+    app.config['EXPORT_BATCH_ROWS'] = int(os.getenv('EXPORT_BATCH_ROWS', 1000))
+    # The longest date range /api/plan-totals aggregates in one request.
+    app.config['PLAN_TOTALS_MAX_DAYS'] = int(os.getenv('PLAN_TOTALS_MAX_DAYS', 400))
+    # A request running one query shape more than N_PLUS_ONE_THRESHOLD times is logged as a likely
+    # N+1 load (0 turns the check off); N_PLUS_ONE_RAISE makes the request fail instead, for tests.
+    app.config['N_PLUS_ONE_THRESHOLD'] = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+    app.config['N_PLUS_ONE_RAISE'] = os.getenv('N_PLUS_ONE_RAISE', '').lower() in ('1', 'true', 'yes')
+    # Per-request timings (database, templates, Pint, model calls) as a Server-Timing header and
+    # Prometheus metrics at /metrics, which asks for "Authorization: Bearer <METRICS_TOKEN>" when set.
+    # Statements slower than SLOW_QUERY_MS are logged (0 turns the log off). Off, nothing is hooked in.
+    app.config['INSTRUMENTATION_ENABLED'] = os.getenv('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 0))
+
     # --- INITIALIZE EXTENSIONS ---
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+
+    from .query_watch import init_query_watch
+    from .instrumentation import init_instrumentation
+    init_query_watch(app)
+    init_instrumentation(app)
     
     stripe.api_key = app.config['STRIPE_SECRET_KEY']
 
@@ -93,9 +136,17 @@ def create_app():
         app.register_blueprint(payments_blueprint)
 
         # Register all commands
-        from .commands import init_achievements_command, nuke_ingredients_command
+        from .commands import (init_achievements_command, nuke_ingredients_command,
+                               ai_cache_stats_command, ai_cache_clear_command,
+                               import_csv_command, rebuild_nutrition_rollup_command,
+                               generate_synthetic_data_command)
         app.cli.add_command(init_achievements_command)
         app.cli.add_command(nuke_ingredients_command)
+        app.cli.add_command(ai_cache_stats_command)
+        app.cli.add_command(ai_cache_clear_command)
+        app.cli.add_command(import_csv_command)
+        app.cli.add_command(rebuild_nutrition_rollup_command)
+        app.cli.add_command(generate_synthetic_data_command)
 
         # --- CONTEXT PROCESSORS & BEFORE REQUEST ---
         @app.context_processor
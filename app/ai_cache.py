@@ -0,0 +1,133 @@
+import hashlib
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app, g
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from . import db
+from .models import AIResponseCache
+
+# --- AI Response Cache ---
+# The same prompts reach the model over and over: one URL imported by several households,
+# the same remix of the same recipe, the nutrition prompt for an identical ingredient list.
+# Responses for the tasks in AI_CACHE_TASKS are stored in ai_response_cache, keyed by a hash
+# of the model name, the whitespace-normalized prompt and the generation config, so repeats
+# are answered from the database. Entries expire after AI_CACHE_TTL seconds and the least
+# recently used are evicted beyond AI_CACHE_MAX_ENTRIES. The cache uses its own connection
+# and transactions, so a job that fails after the model call still keeps the response.
+
+
+def cache_key(model_name, contents, json_response):
+    parts = [contents] if isinstance(contents, str) else list(contents)
+    normalized = json.dumps({
+        'model': model_name,
+        'contents': [' '.join(str(part).split()) for part in parts],
+        'json_response': bool(json_response),
+    }, sort_keys=True)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def count_call(name):
+    # Per app context, so a job can tell whether it reached the model at all.
+    setattr(g, name, g.get(name, 0) + 1)
+
+
+class CachingClient:
+    """
+    Wraps a model client with the response cache. `stats` counts hits, misses and
+    uncached calls per task for this process.
+    """
+    def __init__(self, client, tasks, ttl, max_entries):
+        self.client = client
+        self.model_name = client.model_name
+        self.tasks = set(tasks)
+        self.ttl = timedelta(seconds=ttl)
+        self.max_entries = max_entries
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _record(self, task, outcome):
+        with self._stats_lock:
+            self.stats[f'{task}.{outcome}'] += 1
+
+    def stats_snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def generate(self, contents, task='freeform', json_response=False, timeout=None):
+        if task not in self.tasks:
+            self._record(task, 'uncached')
+            return self.client.generate(contents, task=task, json_response=json_response, timeout=timeout)
+
+        key = cache_key(self.model_name, contents, json_response)
+        response = self._get(key)
+        if response is not None:
+            self._record(task, 'hits')
+            count_call('ai_cache_hits')
+            return response
+
+        self._record(task, 'misses')
+        response = self.client.generate(contents, task=task, json_response=json_response, timeout=timeout)
+        self._put(key, task, response)
+        return response
+
+    def _get(self, key):
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as conn:
+                response = conn.scalar(select(AIResponseCache.response).where(
+                    AIResponseCache.key == key, AIResponseCache.created_at >= now - self.ttl
+                ))
+                if response is not None:
+                    conn.execute(update(AIResponseCache).where(AIResponseCache.key == key).values(
+                        hits=AIResponseCache.hits + 1, last_used_at=now
+                    ))
+                return response
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f"AI cache read failed, calling the model instead: {e}")
+            return None
+
+    def _put(self, key, task, response):
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as conn:
+                # Replaces an expired entry that hasn't been pruned yet.
+                conn.execute(delete(AIResponseCache).where(AIResponseCache.key == key))
+                conn.execute(insert(AIResponseCache).values(
+                    key=key, model=self.model_name, task=task, response=response, hits=0,
+                    created_at=now, last_used_at=now
+                ))
+            self._prune(now)
+        except IntegrityError:
+            # Another worker stored the same prompt first.
+            pass
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f"AI cache write failed: {e}")
+
+    def _prune(self, now):
+        with db.engine.begin() as conn:
+            conn.execute(delete(AIResponseCache).where(AIResponseCache.created_at < now - self.ttl))
+            oldest_kept = conn.scalar(
+                select(AIResponseCache.last_used_at).order_by(AIResponseCache.last_used_at.desc())
+                .offset(self.max_entries - 1).limit(1)
+            )
+            if oldest_kept is not None:
+                conn.execute(delete(AIResponseCache).where(AIResponseCache.last_used_at < oldest_kept))
+
+
+def cache_summary():
+    """(task, entries, hits) rows for the entries currently stored."""
+    return db.session.execute(
+        select(AIResponseCache.task, func.count(), func.coalesce(func.sum(AIResponseCache.hits), 0))
+        .group_by(AIResponseCache.task).order_by(AIResponseCache.task)
+    ).all()
+
+
+def clear_cache():
+    deleted = db.session.execute(delete(AIResponseCache)).rowcount
+    db.session.commit()
+    return deleted
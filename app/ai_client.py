@@ -0,0 +1,116 @@
+import json
+import os
+import time
+import zlib
+from collections import deque
+
+import google.generativeai as genai
+from flask import current_app
+
+from .ai_cache import CachingClient, count_call
+from .instrumentation import timed
+
+try:
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+except Exception as e:
+    print(f"Error configuring Google AI: {e}")
+
+# --- Model Clients ---
+# Every AI feature talks to the model through generate(contents, task=..., json_response=...),
+# which returns the response text. `task` names what is being asked for ('recipe',
+# 'import_recipe', 'nutrition', 'remix', 'meal_plan', 'freeform') so the fake client can
+# answer without a network call and the response cache can tell which calls to cache.
+# AI_MODEL_CLIENT picks the implementation: 'gemini' or 'fake'. Both count their calls in
+# g.ai_model_calls, which is how a job knows whether it owes a credit.
+MODEL_NAME = 'gemini-2.5-pro'
+
+
+class GeminiClient:
+    def __init__(self, model_name=MODEL_NAME, timeout=None):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+
+    def generate(self, contents, task='freeform', json_response=False, timeout=None):
+        count_call('ai_model_calls')
+        kwargs = {}
+        if json_response:
+            kwargs['generation_config'] = genai.types.GenerationConfig(response_mime_type="application/json")
+        if timeout or self.timeout:
+            kwargs['request_options'] = {"timeout": timeout or self.timeout}
+        with timed('ai'):
+            return self.model.generate_content(contents, **kwargs).text
+
+
+def _fake_recipe(prompt):
+    # Named after the prompt so repeated quick adds don't collide on the duplicate-name check.
+    return {
+        'name': f"Test Kitchen Special #{zlib.crc32(prompt.encode()) % 10000}",
+        'servings': 4,
+        'instructions': "Combine everything in a pan.\nCook until done.",
+        'meal_type': 'Main Course',
+        'ingredients': [
+            {'name': 'Chicken Breast', 'quantity': '1', 'unit': 'lb'},
+            {'name': 'Olive Oil', 'quantity': '2', 'unit': 'tbsp'},
+            {'name': 'Garlic', 'quantity': '3', 'unit': 'cloves'},
+        ],
+    }
+
+
+def _fake_nutrition(prompt):
+    return {'calories': 420, 'protein': 35, 'fat': 18, 'carbs': 12}
+
+
+FAKE_RESPONSES = {
+    'recipe': _fake_recipe,
+    'import_recipe': lambda prompt: dict(_fake_recipe(prompt), nutrition=_fake_nutrition(prompt)),
+    'remix': _fake_recipe,
+    'nutrition': _fake_nutrition,
+    'meal_plan': lambda prompt: {
+        day: {'Dinner': {'id': None, 'name': 'Takeout Night'}}
+        for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    },
+    'freeform': lambda prompt: "Test Kitchen Special\n\nIngredients:\n- Whatever you have\n\nInstructions:\n1. Cook it.",
+}
+
+
+class FakeModelClient:
+    """
+    Canned, deterministic responses for local development and tests. AI_FAKE_RESPONSES
+    overrides the text returned per task and AI_FAKE_LATENCY adds a delay in seconds.
+    The most recent calls are kept in `calls` as (task, contents).
+    """
+    model_name = 'fake'
+
+    def __init__(self, responses=None, latency=0, max_recorded_calls=100):
+        self.responses = responses or {}
+        self.latency = latency
+        self.calls = deque(maxlen=max_recorded_calls)
+
+    def generate(self, contents, task='freeform', json_response=False, timeout=None):
+        self.calls.append((task, contents))
+        count_call('ai_model_calls')
+        if self.latency:
+            with timed('ai'):
+                time.sleep(self.latency)
+        if task in self.responses:
+            return self.responses[task]
+        prompt = contents if isinstance(contents, str) else '\n'.join(contents)
+        response = FAKE_RESPONSES.get(task, FAKE_RESPONSES['freeform'])(prompt)
+        return json.dumps(response) if json_response else str(response)
+
+
+def get_model_client():
+    """The app's model client, created on first use and wrapped in the response cache when enabled."""
+    client = current_app.extensions.get('ai_client')
+    if client is None:
+        if current_app.config['AI_MODEL_CLIENT'] == 'fake':
+            client = FakeModelClient(current_app.config.get('AI_FAKE_RESPONSES'),
+                                     current_app.config.get('AI_FAKE_LATENCY', 0))
+        else:
+            client = GeminiClient(timeout=current_app.config['AI_REQUEST_TIMEOUT'])
+        if current_app.config['AI_CACHE_ENABLED']:
+            client = CachingClient(client, current_app.config['AI_CACHE_TASKS'], current_app.config['AI_CACHE_TTL'],
+                                   current_app.config['AI_CACHE_MAX_ENTRIES'])
+        current_app.extensions['ai_client'] = client
+    return client
@@ -1,28 +1,33 @@
 import calendar
 import json
-import os
 import random
-import requests
-from bs4 import BeautifulSoup
-import google.generativeai as genai
-from flask import Blueprint, jsonify, request, flash, url_for, redirect, current_app
+import pint
+from flask import Blueprint, jsonify, request, flash, url_for, current_app
 from flask_login import current_user, login_required
-from sqlalchemy import and_
+from sqlalchemy import select
 from datetime import date, timedelta, datetime
 
 from . import db
 from .decorators import require_ai_credits
-from .models import (Ingredient, MealPlan, PantryItem, Recipe,
+from .importer import canonical_url, import_batch, import_recipe
+from .jobs import InsufficientCredits, JobError, accepted, enqueue_job, job_handler, job_status
+from .models import (AIJob, Ingredient, MealPlan, PantryItem, Recipe,
                      RecipeIngredient, SavedMeal, HistoricalPlan, ShoppingListItem)
-from .utils import (award_achievement, convert_quantity_to_float,
-                    deduct_ai_credit, sanitize_unit, ureg, pint, consume_ingredients_from_recipe)
+from .utils import award_achievement, convert_quantity_to_float
+from .units import parse_quantity, convert
+from .cookable import get_cookable_index, get_stocked_ingredient_ids
+from .ingredients import SAME_INGREDIENT, IngredientIndex, resolve_ingredient_ids
+from .search import search_recipes
+from .loading import load_profile
+from .pantry import PantryLedger
+from .meal_plans import entries_from_ai_plan, plan_totals, write_plan
 
 api = Blueprint('api', __name__)
 
-try:
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-except Exception as e:
-    print(f"Error configuring Google AI: {e}")
+@api.errorhandler(InsufficientCredits)
+def insufficient_credits(e):
+    # require_ai_credits turns most requests away first; this catches concurrent ones.
+    return jsonify({'error': str(e), 'redirect_url': url_for('payments.pricing')}), 403
 
 @api.route('/ai-quick-add', methods=['POST'])
 @login_required
@@ -30,11 +35,15 @@ except Exception as e:
 def ai_quick_add():
     ai_request_text = request.form.get('ai_request')
     if not ai_request_text:
-        flash('Please enter a recipe request.', 'warning')
-        return redirect(url_for('main.list_recipes'))
+        return jsonify({'error': 'Please enter a recipe request.'}), 400
+    return accepted(enqueue_job('quick_add', current_user, {'ai_request': ai_request_text}))
 
+@job_handler('quick_add',
+             'The AI failed to generate a recipe. This can be due to a server timeout or an issue with the AI service. Please try your request again.',
+             success_message='Successfully generated and saved "{name}"!', achievement='AI Assistant')
+def run_quick_add(payload, user, client):
     prompt = f"""
-        Generate a creative and delicious recipe based on the following user request: "{ai_request_text}".
+        Generate a creative and delicious recipe based on the following user request: "{payload['ai_request']}".
         Give the recipe a suitable, creative name based on the request.
         Your output must be a single, valid JSON object with the following keys:
         - "name": The creative title of the recipe.
@@ -42,74 +51,37 @@ def ai_quick_add():
         - "meal_type": Must be one of 'Main Course', 'Side Dish', 'Dessert', 'Snack', or 'Meal Prep'.
         - "ingredients": An array of objects, where each object has "name", "quantity", and "unit".
     """
-    
-    try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                response_mime_type="application/json"
-            ),
-            request_options={"timeout": 25}
-        )
-        recipe_data = json.loads(response.text)
-
-        if not recipe_data.get('name') or not recipe_data.get('instructions') or not recipe_data.get('ingredients'):
-            flash('The AI returned an incomplete recipe. Please try a different request.', 'warning')
-            return redirect(url_for('main.list_recipes'))
-        
-        if Recipe.query.filter_by(name=recipe_data['name'], household_id=current_user.household_id).first():
-            flash(f'A recipe named "{recipe_data["name"]}" already exists. The AI generated a duplicate name.', 'info')
-            return redirect(url_for('main.list_recipes'))
-
-        new_recipe = Recipe(
-            name=recipe_data['name'],
-            instructions=recipe_data['instructions'],
-            meal_type=recipe_data.get('meal_type', 'Main Course'),
-            author=current_user,
-            household_id=current_user.household_id
+    recipe_data = json.loads(client.generate(prompt, task='recipe', json_response=True))
+
+    if not recipe_data.get('name') or not recipe_data.get('instructions') or not recipe_data.get('ingredients'):
+        raise JobError('The AI returned an incomplete recipe. Please try a different request.')
+
+    if Recipe.query.filter_by(name=recipe_data['name'], household_id=user.household_id).first():
+        raise JobError(f'A recipe named "{recipe_data["name"]}" already exists. The AI generated a duplicate name.')
+
+    new_recipe = Recipe(
+        name=recipe_data['name'],
+        instructions=recipe_data['instructions'],
+        meal_type=recipe_data.get('meal_type', 'Main Course'),
+        author=user,
+        household_id=user.household_id
+    )
+    db.session.add(new_recipe)
+    db.session.flush()
+
+    ingredient_lines = [ing for ing in recipe_data['ingredients'] if ing.get('name', '').strip()]
+    ingredient_ids = resolve_ingredient_ids(ing['name'] for ing in ingredient_lines)
+    for ing_data in ingredient_lines:
+        quantity_val = convert_quantity_to_float(ing_data.get('quantity', '0'))
+
+        recipe_ingredient = RecipeIngredient(
+            recipe_id=new_recipe.id,
+            ingredient_id=ingredient_ids[ing_data['name'].strip().lower()],
+            quantity=quantity_val,
+            unit=ing_data.get('unit', '')
         )
-        db.session.add(new_recipe)
-        db.session.flush()
-        
-        ingredient_cache = {}
-        for ing_data in recipe_data['ingredients']:
-            ingredient_name = ing_data.get('name', '').strip()
-            if not ingredient_name: continue
-            
-            lower_ingredient_name = ingredient_name.lower()
-            
-            if lower_ingredient_name in ingredient_cache:
-                ingredient_obj = ingredient_cache[lower_ingredient_name]
-            else:
-                ingredient_obj = Ingredient.query.filter(db.func.lower(Ingredient.name) == lower_ingredient_name).first()
-                if not ingredient_obj:
-                    ingredient_obj = Ingredient(name=ingredient_name)
-                    db.session.add(ingredient_obj)
-                    db.session.flush()
-                ingredient_cache[lower_ingredient_name] = ingredient_obj
-
-            quantity_val = convert_quantity_to_float(ing_data.get('quantity', '0'))
-            
-            recipe_ingredient = RecipeIngredient(
-                recipe_id=new_recipe.id,
-                ingredient_id=ingredient_obj.id,
-                quantity=quantity_val,
-                unit=ing_data.get('unit', '')
-            )
-            db.session.add(recipe_ingredient)
-        
-        deduct_ai_credit(current_user)
-        db.session.commit()
-        award_achievement(current_user, 'AI Assistant')
-        flash(f'Successfully generated and saved "{recipe_data["name"]}"!', 'success')
-
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"AI Quick Add failed for user {current_user.email}. Error: {e}", exc_info=True)
-        flash('The AI failed to generate a recipe. This can be due to a server timeout or an issue with the AI service. Please try your request again.', 'danger')
-        
-    return redirect(url_for('main.list_recipes'))
+        db.session.add(recipe_ingredient)
+    return {'recipe_id': new_recipe.id, 'name': new_recipe.name}
 
 @api.route('/import-and-create-recipe', methods=['POST'])
 @login_required
@@ -119,96 +91,56 @@ def import_and_create_recipe():
     url = data.get('url')
     if not url:
         return jsonify({'error': 'URL is required.'}), 400
+    return accepted(enqueue_job('import_recipe', current_user, {'url': url}))
 
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        content_selectors = ['article', 'main', '.recipe', '#recipe', '[class*="recipe-"]', '[id*="recipe-"]']
-        main_content = next((soup.select_one(s) for s in content_selectors if soup.select_one(s)), soup.body)
-        page_text = ' '.join(main_content.get_text(separator=' ', strip=True).split())
-
-        if len(page_text) < 150:
-             return jsonify({'error': 'Could not extract enough readable content.'}), 400
-        
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        
-        recipe_prompt = (f"""
-            Analyze the following text from a recipe webpage and extract the recipe details.
-            Your output must be a single, valid JSON object with keys: "name", "servings", "instructions", "meal_type", and "ingredients".
-        """)
-        
-        recipe_response = model.generate_content(
-            [recipe_prompt, page_text[:30000]],
-            generation_config=genai.types.GenerationConfig(response_mime_type="application/json")
-        )
-        recipe_data = json.loads(recipe_response.text)
-
-        if not all(k in recipe_data for k in ['name', 'instructions', 'ingredients']):
-            return jsonify({'error': 'The AI could not understand the recipe from that URL.'}), 400
-        
-        ingredient_list_for_nutrition = ", ".join([f"{ing.get('quantity', '')} {ing.get('unit', '')} {ing.get('name', '')}" for ing in recipe_data['ingredients']])
-        nutrition_prompt = f"""
-            Analyze the ingredient list: {ingredient_list_for_nutrition} for {recipe_data.get('servings', 1) or 1} servings.
-            Estimate nutritional info PER SERVING. Output a JSON object with keys: "calories", "protein", "fat", "carbs".
-        """
-        nutrition_response = model.generate_content(
-            nutrition_prompt,
-            generation_config=genai.types.GenerationConfig(response_mime_type="application/json")
-        )
-        nutrition_data = json.loads(nutrition_response.text)
-
-        new_recipe = Recipe(
-            name=recipe_data['name'],
-            instructions=recipe_data['instructions'],
-            servings=recipe_data.get('servings'),
-            meal_type=recipe_data.get('meal_type', 'Main Course'),
-            author=current_user,
-            household_id=current_user.household_id,
-            calories=nutrition_data.get('calories'),
-            protein=nutrition_data.get('protein'),
-            fat=nutrition_data.get('fat'),
-            carbs=nutrition_data.get('carbs')
-        )
-        db.session.add(new_recipe)
-        db.session.flush()
-
-        for ing_data in recipe_data['ingredients']:
-            ingredient_name = ing_data.get('name', '').strip()
-            if not ingredient_name: continue
-            ingredient_obj = Ingredient.query.filter(db.func.lower(Ingredient.name) == db.func.lower(ingredient_name)).first()
-            if not ingredient_obj:
-                ingredient_obj = Ingredient(name=ingredient_name.title())
-                db.session.add(ingredient_obj)
-                db.session.flush()
-            
-            recipe_ingredient = RecipeIngredient(
-                recipe_id=new_recipe.id,
-                ingredient_id=ingredient_obj.id,
-                quantity=convert_quantity_to_float(ing_data.get('quantity', '0')),
-                unit=ing_data.get('unit', '')
-            )
-            db.session.add(recipe_ingredient)
-        
-        deduct_ai_credit(current_user)
-        db.session.commit()
-        award_achievement(current_user, 'Web Scraper')
-        flash(f'Successfully imported "{new_recipe.name}"! Please review the details.', 'success')
-        return jsonify({'success': True, 'recipe_id': new_recipe.id})
+@job_handler('import_recipe', 'An unexpected error occurred during import.',
+             success_message='Successfully imported "{name}"! Please review the details.', achievement='Web Scraper')
+def run_import_recipe(payload, user, client):
+    new_recipe = import_recipe(payload['url'], user, client)
+    return {'recipe_id': new_recipe.id, 'name': new_recipe.name}
 
-    except requests.exceptions.RequestException:
-        return jsonify({'error': f'Failed to fetch the URL.'}), 500
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': 'An unexpected error occurred during import.'}), 500
+@api.route('/import-recipes', methods=['POST'])
+@login_required
+@require_ai_credits
+def import_recipes_batch():
+    urls = (request.get_json() or {}).get('urls') or []
+    if isinstance(urls, str):
+        urls = urls.split()
+    entries = [{'url': url.strip(), 'canonical': canonical_url(url)} for url in urls if isinstance(url, str) and url.strip()]
+    if not entries:
+        return jsonify({'error': 'Please provide at least one URL.'}), 400
+    max_urls = current_app.config['IMPORT_BATCH_MAX_URLS']
+    if len(entries) > max_urls:
+        return jsonify({'error': f'Please import at most {max_urls} URLs at a time.'}), 400
+    unique_pages = len({entry['canonical'] for entry in entries if entry['canonical']})
+    if current_user.subscription_plan != 'elite' and unique_pages > current_user.ai_credits:
+        return jsonify({
+            'error': f'Importing {unique_pages} recipes needs {unique_pages} AI credits, but you have {current_user.ai_credits} left.',
+            'redirect_url': url_for('payments.pricing')
+        }), 403
+    return accepted(enqueue_job('import_batch', current_user, {'entries': entries}, credits=unique_pages))
+
+@job_handler('import_batch', 'An unexpected error occurred during import.',
+             success_message='Imported {imported} of {total} recipes.', achievement='Web Scraper', charges_credit=False)
+def run_import_batch(payload, user, client):
+    progress = import_batch(payload['entries'], user, client)
+    recipe_ids = [entry['recipe_id'] for entry in progress if entry['status'] == 'imported']
+    return {
+        'total': len(progress),
+        'imported': len(recipe_ids),
+        'duplicates': sum(entry['status'] == 'duplicate' for entry in progress),
+        'failed': sum(entry['status'] == 'failed' for entry in progress),
+        'recipe_ids': recipe_ids,
+    }
 
 @api.route('/build-plan', methods=['POST'])
 @login_required
 @require_ai_credits
 def build_plan_api():
-    data = request.get_json()
+    return accepted(enqueue_job('build_plan', current_user, request.get_json()))
+
+@job_handler('build_plan', 'The AI failed to generate a valid plan. Details: {error}', achievement='AI Architect')
+def run_build_plan(data, user, client):
     duration = data.get('duration', 'week')
     theme = data.get('theme')
     use_pantry = data.get('use_pantry', False)
@@ -216,7 +148,7 @@ def build_plan_api():
     takeout_days = int(data.get('takeout_days', 0))
     meal_slots_to_plan = data.get('meal_slots', ['Breakfast', 'Lunch', 'Dinner']) or ['Breakfast', 'Lunch', 'Dinner']
 
-    all_recipes = Recipe.query.filter_by(household_id=current_user.household_id).all()
+    all_recipes = Recipe.query.filter_by(household_id=user.household_id).all()
     
     prompt_sections = []
     if 'Breakfast' in meal_slots_to_plan:
@@ -233,10 +165,10 @@ def build_plan_api():
     
     prompt_context = ""
     if use_pantry:
-        pantry_items = PantryItem.query.filter(PantryItem.household_id == current_user.household_id, PantryItem.quantity > 0).all()
+        pantry_items = PantryItem.query.filter(PantryItem.household_id == user.household_id, PantryItem.quantity > 0).all()
         if pantry_items: prompt_context += f"\nCONTEXT: Prioritize recipes using: {', '.join([p.ingredient.name for p in pantry_items])}."
     if focus_favorites:
-        favorite_recipes = Recipe.query.filter(Recipe.household_id == current_user.household_id, Recipe.rating >= 4).all()
+        favorite_recipes = Recipe.query.filter(Recipe.household_id == user.household_id, Recipe.rating >= 4).all()
         if favorite_recipes: prompt_context += f"\nCONTEXT: The user enjoys these recipes: {', '.join([f'\"{r.name}\"' for r in favorite_recipes])}."
 
     if duration == 'month':
@@ -253,21 +185,11 @@ def build_plan_api():
 
     final_prompt = (f"Create a diverse and logical meal plan with theme: '{theme}'.\n{instruction}{prompt_context}\n\n{'\n\n'.join(prompt_sections)}\n\n{json_structure}")
     
-    try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        response = model.generate_content(final_prompt, generation_config=genai.types.GenerationConfig(response_mime_type="application/json"))
-        plan_data = json.loads(response.text.strip())
+    plan_data = json.loads(client.generate(final_prompt, task='meal_plan', json_response=True).strip())
 
-        response_payload = {'duration': duration, 'plan': plan_data}
-        if duration == 'month': response_payload.update({'year': year, 'month': month})
-        
-        deduct_ai_credit(current_user)
-        db.session.commit()
-        award_achievement(current_user, 'AI Architect')
-        return jsonify(response_payload)
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'The AI failed to generate a valid plan. Details: {str(e)}'}), 500
+    response_payload = {'duration': duration, 'plan': plan_data}
+    if duration == 'month': response_payload.update({'year': year, 'month': month})
+    return response_payload
 
 @api.route('/save-ai-plan', methods=['POST'])
 @login_required
@@ -280,30 +202,20 @@ def save_ai_plan():
         if duration == 'month':
             year, month = int(data.get('year')), int(data.get('month'))
             start_date, end_date = date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
-            MealPlan.query.filter(and_(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(start_date, end_date))).delete(synchronize_session=False)
-
-            for day_str, meals in plan_data.items():
-                current_date = date(year, month, int(day_str))
-                for slot, meal in meals.items():
-                    if meal and meal.get('name') and meal['name'] != 'Unplanned':
-                        db.session.add(MealPlan(household_id=current_user.household_id, meal_date=current_date, meal_slot=slot, recipe_id=meal.get('id'), custom_item_name=None if meal.get('id') else meal.get('name')))
-            
-            flash(f'Your AI-generated plan for {start_date.strftime("%B %Y")} has been saved!', 'success')
+            dates = {str(day): date(year, month, day) for day in range(1, end_date.day + 1)}
+            flash_message = f'Your AI-generated plan for {start_date.strftime("%B %Y")} has been saved!'
             redirect_url = url_for('main.monthly_plan', year=year, month=month)
         else: # week
             today = date.today()
-            start_of_week = today - timedelta(days=today.weekday())
-            MealPlan.query.filter(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(start_of_week, start_of_week + timedelta(days=6))).delete(synchronize_session=False)
-
-            for i, day_name in enumerate(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']):
-                current_date = start_of_week + timedelta(days=i)
-                for slot, meal in plan_data.get(day_name, {}).items():
-                    if meal and meal.get('name') and meal['name'] != 'Unplanned':
-                        db.session.add(MealPlan(household_id=current_user.household_id, meal_date=current_date, meal_slot=slot, recipe_id=meal.get('id'), custom_item_name=None if meal.get('id') else meal.get('name')))
-            
-            flash('Your AI-generated weekly plan has been saved!', 'success')
-            redirect_url = url_for('main.meal_plan', start_date=start_of_week.strftime('%Y-%m-%d'))
-        
+            start_date = today - timedelta(days=today.weekday())
+            end_date = start_date + timedelta(days=6)
+            dates = {day_name: start_date + timedelta(days=i) for i, day_name in enumerate(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])}
+            flash_message = 'Your AI-generated weekly plan has been saved!'
+            redirect_url = url_for('main.meal_plan', start_date=start_date.strftime('%Y-%m-%d'))
+
+        write_plan(current_user.household_id, start_date, end_date,
+                   entries_from_ai_plan(current_user.household_id, plan_data or {}, dates))
+        flash(flash_message, 'success')
         db.session.commit()
         return jsonify({'success': True, 'redirect_url': redirect_url})
     
@@ -337,16 +249,12 @@ def toggle_favorite(recipe_id):
 def generate_from_ingredients_api():
     ingredients_text = request.get_json().get('ingredients', '')
     if not ingredients_text.strip(): return jsonify({'error': 'Please enter some ingredients.'}), 400
-    prompt = f"You are a creative chef with: {ingredients_text}. Invent a practical recipe using them. Assume basic staples. Provide a complete recipe: name, ingredient list, and instructions."
-    try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        response = model.generate_content(prompt)
-        deduct_ai_credit(current_user)
-        db.session.commit()
-        return jsonify({'generated_recipe': response.text})
-    except Exception:
-        db.session.rollback()
-        return jsonify({'error': "Sorry, the AI assistant is unavailable."})
+    return accepted(enqueue_job('generate_from_ingredients', current_user, {'ingredients': ingredients_text}))
+
+@job_handler('generate_from_ingredients', "Sorry, the AI assistant is unavailable.")
+def run_generate_from_ingredients(payload, user, client):
+    prompt = f"You are a creative chef with: {payload['ingredients']}. Invent a practical recipe using them. Assume basic staples. Provide a complete recipe: name, ingredient list, and instructions."
+    return {'generated_recipe': client.generate(prompt, task='freeform')}
 
 @api.route('/remix-recipe', methods=['POST'])
 @login_required
@@ -355,22 +263,23 @@ def remix_recipe_api():
     data = request.get_json()
     recipe = Recipe.query.filter_by(id=data.get('recipe_id'), household_id=current_user.household_id).first()
     if not recipe: return jsonify({'error': 'Recipe not found'}), 404
-    
-    prompt = (f"Rewrite the recipe '{recipe.name}' to be '{data.get('remix_type')}'. "
+    return accepted(enqueue_job('remix_recipe', current_user, {'recipe_name': recipe.name, 'remix_type': data.get('remix_type')}))
+
+@job_handler('remix_recipe', 'Sorry, the AI could not generate a valid recipe remix.')
+def run_remix_recipe(payload, user, client):
+    prompt = (f"Rewrite the recipe '{payload['recipe_name']}' to be '{payload['remix_type']}'. "
               "Output a valid JSON object with keys: \"name\" (a creative new name), "
               "\"instructions\" (a single string with steps separated by '\\n'), "
               "\"ingredients\" (an array of objects with \"name\", \"quantity\", \"unit\").")
-    try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        response = model.generate_content(prompt, generation_config=genai.types.GenerationConfig(response_mime_type="application/json"))
-        remixed_data = json.loads(response.text)
-        if not all(k in remixed_data for k in ['name', 'instructions', 'ingredients']): raise ValueError("Missing keys.")
-        deduct_ai_credit(current_user)
-        db.session.commit()
-        return jsonify({'remixed_recipe': remixed_data})
-    except Exception:
-        db.session.rollback()
-        return jsonify({'error': 'Sorry, the AI could not generate a valid recipe remix.'})
+    remixed_data = json.loads(client.generate(prompt, task='remix', json_response=True))
+    if not all(k in remixed_data for k in ['name', 'instructions', 'ingredients']): raise ValueError("Missing keys.")
+    return {'remixed_recipe': remixed_data}
+
+@api.route('/jobs/<job_id>')
+@login_required
+def get_job(job_id):
+    job = AIJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    return jsonify(job_status(job))
 
 @api.route('/save-new-recipe', methods=['POST'])
 @login_required
@@ -384,16 +293,10 @@ def save_new_recipe():
         db.session.flush()
 
         if 'ingredients' in data and isinstance(data['ingredients'], list):
-            for ing_data in data['ingredients']:
-                ingredient_name = ing_data.get('name', '').strip()
-                if not ingredient_name: continue
-                ingredient_obj = Ingredient.query.filter(db.func.lower(Ingredient.name) == db.func.lower(ingredient_name)).first()
-                if not ingredient_obj:
-                    ingredient_obj = Ingredient(name=ingredient_name)
-                    db.session.add(ingredient_obj)
-                    db.session.flush()
-                
-                db.session.add(RecipeIngredient(recipe_id=new_recipe.id, ingredient_id=ingredient_obj.id, quantity=convert_quantity_to_float(ing_data.get('quantity', '0')), unit=ing_data.get('unit', '')))
+            ingredient_lines = [ing for ing in data['ingredients'] if ing.get('name', '').strip()]
+            ingredient_ids = resolve_ingredient_ids(ing['name'] for ing in ingredient_lines)
+            for ing_data in ingredient_lines:
+                db.session.add(RecipeIngredient(recipe_id=new_recipe.id, ingredient_id=ingredient_ids[ing_data['name'].strip().lower()], quantity=convert_quantity_to_float(ing_data.get('quantity', '0')), unit=ing_data.get('unit', '')))
         
         db.session.commit()
         flash(f'New recipe "{new_recipe.name}" saved successfully!', 'success')
@@ -414,46 +317,81 @@ def suggest_recipes():
 def search_recipes_api():
     query = request.args.get('query', '')
     if query:
-        results = Recipe.query.filter_by(household_id=current_user.household_id).filter(Recipe.name.ilike(f"%{query}%")).limit(10).all()
+        results = search_recipes(Recipe.query.filter_by(household_id=current_user.household_id), query, fields=('name',)).limit(10).all()
         return jsonify([{'id': r.id, 'name': r.name, 'meal_type': r.meal_type} for r in results])
     return jsonify([])
 
+@api.route('/cookable-recipes')
+@login_required
+def cookable_recipes_api():
+    try:
+        max_missing = max(0, min(int(request.args.get('max_missing', 2)), 10))
+        limit = max(1, min(int(request.args.get('limit', 5)), 50))
+    except ValueError:
+        return jsonify({'error': 'max_missing and limit must be integers.'}), 400
+
+    index = get_cookable_index(current_user.household_id)
+    pantry_ids = get_stocked_ingredient_ids(current_user.household_id)
+    cookable_ids = index.cookable(pantry_ids)
+    almost = index.missing_at_most(pantry_ids, max_missing) if max_missing else {}
+    unlocks = index.best_unlocks(pantry_ids, limit)
+
+    recipe_ids = cookable_ids | set(almost)
+    recipes = {r.id: r for r in Recipe.query.filter(Recipe.id.in_(recipe_ids)).all()} if recipe_ids else {}
+    ingredient_ids = set().union(*almost.values()) | {ing_id for ing_id, _ in unlocks}
+    ingredient_names = dict(db.session.query(Ingredient.id, Ingredient.name).filter(Ingredient.id.in_(ingredient_ids)).all()) if ingredient_ids else {}
+
+    almost_json = [
+        {'id': rid, 'name': recipes[rid].name, 'meal_type': recipes[rid].meal_type, 'missing': sorted(ingredient_names.get(i, '') for i in missing)}
+        for rid, missing in almost.items()
+    ]
+    return jsonify({
+        'cookable': [{'id': r.id, 'name': r.name, 'meal_type': r.meal_type} for r in sorted((recipes[rid] for rid in cookable_ids), key=lambda r: r.name)],
+        'almost': sorted(almost_json, key=lambda r: (len(r['missing']), r['name'])),
+        'best_unlocks': [{'ingredient_id': ing_id, 'name': ingredient_names.get(ing_id), 'unlocks': count} for ing_id, count in unlocks]
+    })
+
 @api.route('/get-saved-meals')
 @login_required
 def get_saved_meals():
-    return jsonify([{'id': meal.id, 'name': meal.name, 'recipes': [{'id': r.id, 'name': r.name, 'meal_type': r.meal_type} for r in meal.recipes]} for meal in SavedMeal.query.filter_by(household_id=current_user.household_id).all()])
+    saved_meals = SavedMeal.query.options(*load_profile('saved_meal_with_recipes')).filter_by(household_id=current_user.household_id).all()
+    return jsonify([{'id': meal.id, 'name': meal.name, 'recipes': [{'id': r.id, 'name': r.name, 'meal_type': r.meal_type} for r in meal.recipes]} for meal in saved_meals])
 
 @api.route('/mark-meal-eaten', methods=['POST'])
 @login_required
 def mark_meal_eaten():
+    # Marks one slot, or with no slot every meal of the day. An end_date extends it to a range (a week).
     data = request.get_json()
     try:
         meal_date = datetime.strptime(data.get('date'), '%Y-%m-%d').date()
+        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date() if data.get('end_date') else meal_date
         meal_slot = data.get('slot')
-        
-        meals_to_update = MealPlan.query.filter_by(
-            household_id=current_user.household_id,
-            meal_date=meal_date,
-            meal_slot=meal_slot
-        ).all()
+
+        query = MealPlan.query.filter(
+            MealPlan.household_id == current_user.household_id,
+            MealPlan.meal_date.between(meal_date, end_date)
+        )
+        if meal_slot:
+            query = query.filter(MealPlan.meal_slot == meal_slot)
+        meals_to_update = query.order_by(MealPlan.meal_date, MealPlan.id).all()
 
         if not meals_to_update:
             return jsonify({'success': True, 'message': 'No meals to mark.'})
 
-        new_status = not meals_to_update[0].is_eaten
-        
+        new_status = not all(meal.is_eaten for meal in meals_to_update)
+        # Meals already marked eaten were deducted then and are not deducted again.
+        newly_eaten = [meal for meal in meals_to_update if not meal.is_eaten]
+
         for meal in meals_to_update:
             meal.is_eaten = new_status
 
         if new_status:  # Only consume ingredients when marking as EATEN
-            all_updated_items = set()
-            all_skipped_items = set()
-            for meal in meals_to_update:
-                if meal.recipe:
-                    updated, skipped = consume_ingredients_from_recipe(current_user, meal.recipe)
-                    all_updated_items.update(updated)
-                    all_skipped_items.update(skipped)
-            
+            pantry = PantryLedger(current_user.household_id)
+            updated, skipped = pantry.deduct_recipes([meal.recipe_id for meal in newly_eaten if meal.recipe_id])
+            pantry.save()
+            all_updated_items = set(updated)
+            all_skipped_items = set(skipped)
+
             if all_updated_items:
                 flash(f'Pantry updated for: {", ".join(list(all_updated_items)[:5])}.', 'info')
             if all_skipped_items:
@@ -466,10 +404,31 @@ def mark_meal_eaten():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@api.route('/plan-totals')
+@login_required
+def get_plan_totals():
+    # Per-day, per-week and per-month macro totals of the plan between start and end (inclusive).
+    # period=days, weeks or months returns just that series, e.g. the 52 weeks of a year's trend chart.
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start and end must be dates (YYYY-MM-DD).'}), 400
+    max_days = current_app.config['PLAN_TOTALS_MAX_DAYS']
+    if not 0 <= (end - start).days < max_days:
+        return jsonify({'error': f'end must be on or after start, at most {max_days} days later.'}), 400
+    periods = ('days', 'weeks', 'months')
+    if request.args.get('period'):
+        if request.args['period'] not in periods:
+            return jsonify({'error': f"period must be one of {', '.join(periods)}."}), 400
+        periods = (request.args['period'],)
+    totals = plan_totals(current_user.household_id, start, end)
+    return jsonify({period: {day.isoformat(): values for day, values in totals[period].items()} for period in periods})
+
 @api.route('/load-historical-plan/<int:plan_id>', methods=['GET'])
 @login_required
 def load_historical_plan(plan_id):
-    plan = HistoricalPlan.query.filter_by(id=plan_id, household_id=current_user.household_id).first_or_404()
+    plan = HistoricalPlan.query.options(*load_profile('historical_plan_with_entries')).filter_by(id=plan_id, household_id=current_user.household_id).first_or_404()
     plan_data = {}
     for entry in plan.entries:
         day_key = str(entry.day_of_week)
@@ -487,44 +446,54 @@ def stock_pantry_from_list():
     items_to_add = data.get('items', [])
 
     try:
+        ingredient_ids = resolve_ingredient_ids(
+            (item_data['name'].strip().title() for item_data in items_to_add if item_data.get('name')), category='Other'
+        )
+        pantry_stock, pantry_names = {}, IngredientIndex()
+        for pantry_item, name in db.session.execute(
+            select(PantryItem, Ingredient.name).join(Ingredient, Ingredient.id == PantryItem.ingredient_id)
+            .where(PantryItem.household_id == current_user.household_id)
+        ) if ingredient_ids else ():
+            pantry_stock[pantry_item.ingredient_id] = pantry_item
+            pantry_names.add(pantry_item.ingredient_id, name)
+
         for item_data in items_to_add:
             item_name = item_data.get('name')
-            if not item_name: continue
-
-            ingredient = Ingredient.query.filter(db.func.lower(Ingredient.name) == db.func.lower(item_name)).first()
-            if not ingredient:
-                ingredient = Ingredient(name=item_name.title(), category='Other')
-                db.session.add(ingredient)
-                db.session.flush()
+            if not item_name or not item_name.strip(): continue
 
-            pantry_item = PantryItem.query.filter_by(
-                household_id=current_user.household_id,
-                ingredient_id=ingredient.id
-            ).first()
+            ingredient_id = ingredient_ids[item_name.strip().lower()]
+            pantry_item = pantry_stock.get(ingredient_id)
+            if not pantry_item:
+                # The pantry may already hold it under another name ("Green Onion" for "Scallions").
+                same = pantry_names.best(item_name, min_score=SAME_INGREDIENT)
+                if len(same) == 1:
+                    pantry_item = pantry_stock[same[0]]
 
             quantity_to_add = convert_quantity_to_float(item_data.get('quantity', '0'))
             unit_to_add = item_data.get('unit', '')
 
             if pantry_item:
                 try:
-                    with ureg.context('cooking', substance=ingredient.name.lower().replace(" ", "_")):
-                        existing_qty = pantry_item.quantity * ureg(sanitize_unit(pantry_item.unit))
-                        new_qty = quantity_to_add * ureg(sanitize_unit(unit_to_add))
-
-                        if existing_qty.is_compatible_with(new_qty):
-                            pantry_item.quantity = (existing_qty + new_qty.to(existing_qty.units)).magnitude
-                        else:
-                            pantry_item.quantity += quantity_to_add
+                    existing_qty, existing_units = parse_quantity(pantry_item.quantity, pantry_item.unit)
+                    new_qty, new_units = parse_quantity(quantity_to_add, unit_to_add)
+                    new_in_existing = convert(new_qty, new_units, existing_units)
+
+                    if new_in_existing is not None:
+                        pantry_item.quantity = existing_qty + new_in_existing
+                    else:
+                        pantry_item.quantity += quantity_to_add
                 except (pint.errors.DimensionalityError, pint.errors.UndefinedUnitError):
                     pantry_item.quantity += quantity_to_add
             else:
                 pantry_item = PantryItem(
                     household_id=current_user.household_id,
-                    ingredient_id=ingredient.id,
+                    ingredient_id=ingredient_id,
                     quantity=quantity_to_add,
                     unit=unit_to_add
                 )
                 db.session.add(pantry_item)
+                pantry_stock[ingredient_id] = pantry_item
+                pantry_names.add(ingredient_id, item_name)
 
             manual_id = item_data.get('manual_id')
             if manual_id:
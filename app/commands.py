@@ -1,7 +1,16 @@
 import click
+from flask import current_app
 from flask.cli import with_appcontext
+from sqlalchemy import select
 from . import db
-from .models import Achievement, Ingredient, RecipeIngredient, PantryItem
+from .models import Achievement, Household, Ingredient, RecipeIngredient, PantryItem, User
+from .dashboard import invalidate_household_stats
+from .ingredients import invalidate_ingredient_ids
+from .ai_cache import cache_summary, clear_cache
+from .csv_import import CSVImportError, import_csv
+from .nutrition import rebuild_nutrition_rollup
+from .search import reindex_recipes
+from .synthetic import SYNTHETIC_PASSWORD, generate_households
 
 @click.command('init-achievements')
 @with_appcontext
@@ -44,9 +53,14 @@ def nuke_ingredients_command():
     if click.confirm('Are you ABSOLUTELY SURE you want to delete ALL master ingredients, pantry items, and recipe-ingredient links? This cannot be undone.'):
         try:
             # Delete in the correct order to respect foreign key constraints
+            recipe_ids = db.session.scalars(select(RecipeIngredient.recipe_id).distinct()).all()
             num_recipe_links = db.session.query(RecipeIngredient).delete()
             num_pantry_items = db.session.query(PantryItem).delete()
             num_ingredients = db.session.query(Ingredient).delete()
+            invalidate_household_stats(recipes_changed=True)
+            invalidate_ingredient_ids()
+            # Bulk deletes bypass the flush hook that keeps the search index current.
+            reindex_recipes(recipe_ids)
             
             db.session.commit()
             
@@ -59,4 +73,78 @@ def nuke_ingredients_command():
             db.session.rollback()
             click.echo(f"An error occurred: {e}")
     else:
-        click.echo("Operation cancelled.")
\ No newline at end of file
+        click.echo("Operation cancelled.")
+
+@click.command('ai-cache-stats')
+@with_appcontext
+def ai_cache_stats_command():
+    """Shows how many AI responses are cached per task and how often they were reused."""
+    rows = cache_summary()
+    if not rows:
+        click.echo("The AI response cache is empty.")
+        return
+    for task, entries, hits in rows:
+        click.echo(f"{task:<15} {entries:>7} entries {hits:>9} hits")
+
+@click.command('ai-cache-clear')
+@with_appcontext
+def ai_cache_clear_command():
+    """Deletes every cached AI response."""
+    click.echo(f"Deleted {clear_cache()} cached AI responses.")
+
+@click.command('import-csv')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'email', required=True, help="Email of the user whose household gets the data.")
+@click.option('--type', 'upload_type', type=click.Choice(['recipes', 'recipe_ingredients']), default='recipes')
+@with_appcontext
+def import_csv_command(path, email, upload_type):
+    """Imports a recipes or recipe-ingredients CSV, for files too large to upload."""
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        click.echo(f"No user with email {email}.")
+        return
+    try:
+        with open(path, 'rb') as f:
+            report = import_csv(f, upload_type, user)
+    except CSVImportError as e:
+        click.echo(f"Import failed: {e}")
+        return
+    click.echo(f"{report.summary()}.")
+    for line, message in report.errors:
+        click.echo(f"  line {line}: {message}")
+    if report.rejected > len(report.errors):
+        click.echo(f"  ...and {report.rejected - len(report.errors)} more rejected rows.")
+
+@click.command('rebuild-nutrition-rollup')
+@click.option('--household', 'household_ids', type=int, multiple=True, help="Only this household; may be repeated.")
+@with_appcontext
+def rebuild_nutrition_rollup_command(household_ids):
+    """Recomputes the nutrition rollup from the meal plans, for all households or the ones given."""
+    rebuild_nutrition_rollup(*household_ids)
+    db.session.commit()
+    count = len(household_ids) or db.session.query(Household).count()
+    click.echo(f"Rebuilt the nutrition rollup of {count} households.")
+
+@click.command('generate-synthetic-data')
+@click.option('--households', type=int, default=10, show_default=True)
+@click.option('--recipes', type=int, default=150, show_default=True, help="Recipes per household.")
+@click.option('--ingredients', type=int, default=300, show_default=True, help="Master ingredients the households draw from.")
+@click.option('--pantry', type=int, default=60, show_default=True, help="Pantry items per household.")
+@click.option('--months', type=float, default=6, show_default=True, help="Months of meal plan history per household.")
+@click.option('--seed', type=int, default=None, help="Random seed, for the same data on every run.")
+@click.option('--shapes', 'shapes_folder', type=click.Path(exists=True, file_okay=False), default=None,
+              help="Folder of recipe and ingredient CSV files to imitate; defaults to the upload folder.")
+@with_appcontext
+def generate_synthetic_data_command(households, recipes, ingredients, pantry, months, seed, shapes_folder):
+    """Adds synthetic households with recipes, pantries and meal plan history, for load tests and benchmarks."""
+    try:
+        created = generate_households(households, recipes=recipes, ingredients=ingredients, pantry=pantry, months=months,
+                                      seed=seed, shapes_folder=shapes_folder or current_app.config['UPLOAD_FOLDER'])
+    except ValueError as e:
+        click.echo(f"Generation failed: {e}")
+        return
+    click.echo(f"Added {len(created)} households; members log in with password '{SYNTHETIC_PASSWORD}'.")
+    for household_id, email in created[:5]:
+        click.echo(f"  household {household_id}: {email}")
+    if len(created) > 5:
+        click.echo(f"  ...and {len(created) - 5} more.")
@@ -0,0 +1,108 @@
+import threading
+from collections import Counter, defaultdict
+
+from cachetools import LRUCache
+from sqlalchemy import select
+
+from . import db
+from .models import Recipe, RecipeIngredient, PantryItem, HouseholdStats
+
+
+class CookableIndex:
+    """
+    Inverted recipe <-> ingredient index for one household.
+
+    Queries only walk the postings of the ingredients that are in stock, so their
+    cost grows with the size of the pantry rather than with the number of recipes.
+    """
+
+    def __init__(self, recipe_ingredient_pairs):
+        self.postings = defaultdict(set)
+        requirements = defaultdict(set)
+        for recipe_id, ingredient_id in recipe_ingredient_pairs:
+            self.postings[ingredient_id].add(recipe_id)
+            requirements[recipe_id].add(ingredient_id)
+        self.requirements = {recipe_id: frozenset(ids) for recipe_id, ids in requirements.items()}
+        self.recipes_by_size = defaultdict(set)
+        for recipe_id, ids in self.requirements.items():
+            self.recipes_by_size[len(ids)].add(recipe_id)
+
+    def _hits(self, pantry_ids):
+        hits = Counter()
+        for ingredient_id in pantry_ids:
+            hits.update(self.postings.get(ingredient_id, ()))
+        return hits
+
+    def cookable(self, pantry_ids):
+        """Recipe ids whose every ingredient is in `pantry_ids`."""
+        return {recipe_id for recipe_id, count in self._hits(pantry_ids).items()
+                if count == len(self.requirements[recipe_id])}
+
+    def missing_at_most(self, pantry_ids, max_missing):
+        """Maps recipe ids missing between 1 and `max_missing` ingredients to the set they are missing."""
+        pantry_ids = set(pantry_ids)
+        hits = self._hits(pantry_ids)
+        candidates = {recipe_id for recipe_id, count in hits.items()
+                      if 0 < len(self.requirements[recipe_id]) - count <= max_missing}
+        # Small recipes sharing nothing with the pantry never show up in the postings walk.
+        for size in range(1, max_missing + 1):
+            candidates.update(recipe_id for recipe_id in self.recipes_by_size.get(size, ()) if recipe_id not in hits)
+        return {recipe_id: self.requirements[recipe_id] - pantry_ids for recipe_id in candidates}
+
+    def best_unlocks(self, pantry_ids, limit=5):
+        """The ingredients that would make the most additional recipes cookable, as (ingredient_id, count)."""
+        unlocks = Counter()
+        for missing in self.missing_at_most(pantry_ids, 1).values():
+            unlocks.update(missing)
+        return unlocks.most_common(limit)
+
+
+# --- Per-Household Cache ---
+# Indexes are cached per worker process and tagged with household_stats.recipe_index_version,
+# which the flush hooks in app/dashboard.py bump whenever a household's recipes or recipe
+# ingredients change. Only indexes of committed recipes are cached: a transaction that has
+# bumped the version builds its own. Pantry contents are read fresh on every lookup.
+_index_cache = LRUCache(maxsize=256)
+_index_cache_lock = threading.Lock()
+
+
+def _build_index(household_id):
+    rows = db.session.execute(
+        select(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id).join(
+            Recipe, Recipe.id == RecipeIngredient.recipe_id
+        ).where(Recipe.household_id == household_id)
+    )
+    return CookableIndex(rows)
+
+
+def get_cookable_index(household_id):
+    if db.session.info.get('recipe_indexes_changed'):
+        # This transaction has changed recipes without committing; if it rolls back, its version
+        # number will be bumped again by a later write with different contents.
+        return _build_index(household_id)
+    version = db.session.scalar(
+        select(HouseholdStats.recipe_index_version).where(HouseholdStats.household_id == household_id)
+    )
+    if version is None:
+        # No stats row yet, so there is nothing to tag a cached index with.
+        return _build_index(household_id)
+
+    with _index_cache_lock:
+        cached = _index_cache.get(household_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    index = _build_index(household_id)
+    with _index_cache_lock:
+        _index_cache[household_id] = (version, index)
+    return index
+
+
+def get_stocked_ingredient_ids(household_id):
+    return set(db.session.execute(
+        select(PantryItem.ingredient_id).where(PantryItem.household_id == household_id, PantryItem.quantity > 0)
+    ).scalars())
+
+
+def get_cookable_recipe_ids(household_id):
+    return get_cookable_index(household_id).cookable(get_stocked_ingredient_ids(household_id))
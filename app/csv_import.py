@@ -0,0 +1,401 @@
+import csv
+import io
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .dashboard import invalidate_household_stats
+from .ingredients import resolve_ingredient_ids
+from .models import Recipe, RecipeIngredient
+from .search import reindex_recipes
+from .utils import convert_quantity_to_float
+
+# --- CSV Import ---
+# Reads the files the CSV exports write, and the older RECIPE/INGREDIENT sheet format, row
+# by row from the uploaded stream. Valid rows are written CSV_IMPORT_CHUNK_ROWS at a time:
+# the chunk's ingredient names are resolved in one batch, its rows are inserted or updated
+# with single executemany statements, and the chunk is committed on its own. Memory and
+# transaction size stay the same whatever the file's length. A bad row is rejected rather
+# than the whole file. The report counts every rejection and keeps the first
+# CSV_IMPORT_MAX_ERRORS of them, with their line numbers.
+RECIPE_COLUMNS = ['id', 'name', 'instructions', 'servings', 'prep_time', 'cook_time', 'meal_type', 'is_favorite', 'rating', 'author_email']
+RECIPE_INGREDIENT_COLUMNS = ['recipe_id', 'ingredient_name', 'quantity', 'unit']
+SHEET_ROW_TYPES = ('RECIPE', 'INGREDIENT')
+DEFAULT_INSTRUCTIONS = "No instructions provided."
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+
+class CSVImportError(Exception):
+    """The file as a whole can't be imported; the message is shown to the user."""
+
+
+class RowError(ValueError):
+    """A single row is invalid; the message is shown to the user with its line number."""
+
+
+class ImportReport:
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.ingredient_links = 0
+        self.rejected = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    def summary(self):
+        parts = []
+        if self.created:
+            parts.append(f"{self.created} recipes added")
+        if self.updated:
+            parts.append(f"{self.updated} recipes updated")
+        if self.ingredient_links:
+            parts.append(f"{self.ingredient_links} ingredient lines saved")
+        if self.rejected:
+            parts.append(f"{self.rejected} of {self.rows} rows rejected")
+        return ', '.join(parts) or "Nothing to import"
+
+
+# --- Row Validation ---
+
+def _text(value, column, max_length=None, required=False):
+    value = (value or '').strip()
+    if required and not value:
+        raise RowError(f"{column} is required.")
+    if max_length and len(value) > max_length:
+        raise RowError(f"{column} is longer than {max_length} characters.")
+    return value
+
+
+def _integer(value, column, minimum=None, maximum=None):
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        number = int(float(value))
+    except ValueError:
+        raise RowError(f"{column} must be a whole number, not \"{value}\".")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise RowError(f"{column} must be between {minimum} and {maximum}.")
+    return number
+
+
+def _boolean(value, column):
+    value = (value or '').strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"{column} must be True or False.")
+
+
+def _quantity(value):
+    value = (value or '').strip()
+    if not value:
+        return 0.0
+    quantity = convert_quantity_to_float(value)
+    if quantity == 0 and value.strip('0. '):
+        raise RowError(f"quantity must be a number, not \"{value}\".")
+    return quantity
+
+
+def _recipe_values(row, columns):
+    # Only the columns present in the file, so a partial export updates just those fields.
+    values = {'name': _text(row.get('name'), 'name', 100, required=True)}
+    if 'instructions' in columns:
+        values['instructions'] = _text(row.get('instructions'), 'instructions') or DEFAULT_INSTRUCTIONS
+    if 'servings' in columns:
+        values['servings'] = _integer(row.get('servings'), 'servings', 1, 1000)
+    for column in ('prep_time', 'cook_time'):
+        if column in columns:
+            values[column] = _text(row.get(column), column, 50) or None
+    if 'meal_type' in columns:
+        values['meal_type'] = _text(row.get('meal_type'), 'meal_type', 50) or 'Main Course'
+    if 'is_favorite' in columns:
+        values['is_favorite'] = _boolean(row.get('is_favorite'), 'is_favorite')
+    if 'rating' in columns:
+        values['rating'] = _integer(row.get('rating'), 'rating', 0, 5) or 0
+    return values
+
+
+def _ingredient_values(name, quantity, unit):
+    return {
+        'ingredient_name': _text(name, 'ingredient_name', 100, required=True),
+        'quantity': _quantity(quantity),
+        'unit': _text(unit, 'unit', 50),
+    }
+
+
+# --- Chunked Writes ---
+
+def _household_recipe_ids(household_id, recipe_ids):
+    if not recipe_ids:
+        return set()
+    return set(db.session.scalars(
+        select(Recipe.id).where(Recipe.household_id == household_id, Recipe.id.in_(recipe_ids))
+    ))
+
+
+def _insert_recipes(rows, user):
+    """Inserts recipe value dicts in one executemany and returns their new ids, in order."""
+    if not rows:
+        return []
+    defaults = {'instructions': DEFAULT_INSTRUCTIONS, 'meal_type': 'Main Course', 'is_favorite': False, 'rating': 0}
+    params = [dict(defaults, **row, user_id=user.id, household_id=user.household_id) for row in rows]
+    return list(db.session.scalars(insert(Recipe).returning(Recipe.id, sort_by_parameter_order=True), params))
+
+
+def _insert_links(links):
+    """Inserts (recipe_id, ingredient values) pairs, resolving the chunk's ingredient names in one batch."""
+    if not links:
+        return
+    ingredient_ids = resolve_ingredient_ids(values['ingredient_name'] for _, values in links)
+    db.session.execute(insert(RecipeIngredient), [
+        {'recipe_id': recipe_id, 'ingredient_id': ingredient_ids[values['ingredient_name'].lower()],
+         'quantity': values['quantity'], 'unit': values['unit']}
+        for recipe_id, values in links
+    ])
+
+
+def _commit_chunk(report, lines, household_id, write):
+    """
+    Runs `write`, which returns the ids of the recipes it changed, and commits it as one
+    transaction. On a database error every row of the chunk is rejected.
+    """
+    if not lines:
+        return True
+    try:
+        recipe_ids = write()
+        # Core statements bypass the flush hooks that keep search and stats current.
+        invalidate_household_stats(household_id, recipes_changed=True)
+        reindex_recipes(recipe_ids)
+        db.session.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"CSV import chunk failed: {e}", exc_info=True)
+        for line in lines:
+            report.reject(line, "The row could not be saved.")
+        return False
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _import_recipes(reader, header, user, report, chunk_size):
+    unknown = [column for column in header if column not in RECIPE_COLUMNS]
+    if unknown or 'name' not in header:
+        raise CSVImportError(f"A recipes file needs a name column and only the export's columns "
+                             f"({', '.join(RECIPE_COLUMNS)}).")
+    columns = set(header)
+
+    def validated():
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            report.rows += 1
+            row = dict(zip(header, row))
+            try:
+                values = _recipe_values(row, columns)
+                recipe_id = _integer(row.get('id'), 'id', 1)
+            except RowError as e:
+                report.reject(reader.line_num, str(e))
+                continue
+            yield reader.line_num, recipe_id, values
+
+    for chunk in _chunks(validated(), chunk_size):
+        existing = _household_recipe_ids(user.household_id, [recipe_id for _, recipe_id, _ in chunk if recipe_id])
+        updates, inserts, lines = [], [], []
+        for line, recipe_id, values in chunk:
+            if recipe_id and recipe_id not in existing:
+                report.reject(line, f"Recipe {recipe_id} is not in your household. Leave id blank to add a new recipe.")
+            elif recipe_id:
+                updates.append(dict(values, id=recipe_id))
+                lines.append(line)
+            else:
+                inserts.append(values)
+                lines.append(line)
+
+        def write():
+            if updates:
+                db.session.execute(update(Recipe), updates)
+            return [row['id'] for row in updates] + _insert_recipes(inserts, user)
+
+        if _commit_chunk(report, lines, user.household_id, write):
+            report.updated += len(updates)
+            report.created += len(inserts)
+
+
+def _import_recipe_ingredients(reader, header, user, report, chunk_size):
+    missing = [column for column in RECIPE_INGREDIENT_COLUMNS[:2] if column not in header]
+    unknown = [column for column in header if column not in RECIPE_INGREDIENT_COLUMNS]
+    if missing or unknown:
+        raise CSVImportError(f"An ingredients file needs the export's columns: {', '.join(RECIPE_INGREDIENT_COLUMNS)}.")
+
+    def validated():
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            report.rows += 1
+            row = dict(zip(header, row))
+            try:
+                recipe_id = _integer(row.get('recipe_id'), 'recipe_id', 1)
+                if recipe_id is None:
+                    raise RowError("recipe_id is required.")
+                values = _ingredient_values(row.get('ingredient_name'), row.get('quantity'), row.get('unit'))
+            except RowError as e:
+                report.reject(reader.line_num, str(e))
+                continue
+            yield reader.line_num, recipe_id, values
+
+    cleared = set()
+    for chunk in _chunks(validated(), chunk_size):
+        existing = _household_recipe_ids(user.household_id, {recipe_id for _, recipe_id, _ in chunk})
+        links, lines = [], []
+        for line, recipe_id, values in chunk:
+            if recipe_id not in existing:
+                report.reject(line, f"Recipe {recipe_id} is not in your household.")
+            else:
+                links.append((recipe_id, values))
+                lines.append(line)
+        # A recipe's ingredient list is replaced the first time the file mentions it.
+        to_clear = {recipe_id for recipe_id, _ in links} - cleared
+
+        def write():
+            if to_clear:
+                db.session.execute(delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(to_clear)))
+            _insert_links(links)
+            return {recipe_id for recipe_id, _ in links}
+
+        if _commit_chunk(report, lines, user.household_id, write):
+            cleared |= to_clear
+            report.ingredient_links += len(links)
+
+
+def _import_sheet(rows, user, report, chunk_size):
+    # RECIPE,name,instructions,servings rows, each followed by its INGREDIENT,name,quantity,unit
+    # rows. Ingredients refer to their recipe by the RECIPE row's line number until it has an
+    # id, since a recipe's ingredients may run on into the next chunk.
+    state = {'recipe': None}
+
+    def validated():
+        for row in rows:
+            if not any(cell.strip() for cell in row):
+                continue
+            report.rows += 1
+            row_type = row[0].strip().upper()
+            cells = row[1:] + [''] * 3
+            try:
+                if row_type == 'RECIPE':
+                    state['recipe'] = None
+                    values = _recipe_values({'name': cells[0], 'instructions': cells[1], 'servings': cells[2]},
+                                            {'name', 'instructions', 'servings'})
+                    state['recipe'] = rows.line_num
+                    yield rows.line_num, row_type, state['recipe'], values
+                elif row_type == 'INGREDIENT':
+                    if state['recipe'] is None:
+                        raise RowError("This INGREDIENT row has no valid RECIPE row above it.")
+                    # Units written with commas in them spill over into extra columns.
+                    unit = ','.join(cells[2:]).strip(' ,"')
+                    yield rows.line_num, row_type, state['recipe'], _ingredient_values(cells[0], cells[1], unit)
+                else:
+                    raise RowError(f"The first column must be {' or '.join(SHEET_ROW_TYPES)}.")
+            except RowError as e:
+                report.reject(rows.line_num, str(e))
+
+    saved = {}
+    for chunk in _chunks(validated(), chunk_size):
+        recipes = [(recipe_line, values) for _, row_type, recipe_line, values in chunk if row_type == 'RECIPE']
+        chunk_recipe_lines = {recipe_line for recipe_line, _ in recipes}
+        links, lines = [], []
+        for line, row_type, recipe_line, values in chunk:
+            if row_type == 'INGREDIENT':
+                if recipe_line not in chunk_recipe_lines and recipe_line not in saved:
+                    report.reject(line, "The recipe this ingredient belongs to could not be saved.")
+                    continue
+                links.append((recipe_line, values))
+            lines.append(line)
+        new_ids = {}
+
+        def write():
+            new_ids.update(zip([recipe_line for recipe_line, _ in recipes], _insert_recipes([values for _, values in recipes], user)))
+            _insert_links([(saved.get(recipe_line) or new_ids[recipe_line], values) for recipe_line, values in links])
+            return set(new_ids.values()) | set(saved.values())
+
+        if _commit_chunk(report, lines, user.household_id, write):
+            report.created += len(recipes)
+            report.ingredient_links += len(links)
+            # Only the recipe still being read can have ingredients in a later chunk.
+            current = state['recipe']
+            recipe_id = new_ids.get(current) or saved.get(current)
+            saved = {current: recipe_id} if recipe_id else {}
+
+
+def import_csv(stream, upload_type, user):
+    """
+    Imports an uploaded CSV (a binary file object) for `user`'s household. `upload_type` is
+    'recipes' (the recipes export or a RECIPE/INGREDIENT sheet) or 'recipe_ingredients'.
+    Returns an ImportReport; raises CSVImportError when the file can't be read at all.
+    """
+    chunk_size = current_app.config['CSV_IMPORT_CHUNK_ROWS']
+    report = ImportReport(current_app.config['CSV_IMPORT_MAX_ERRORS'])
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    try:
+        first_row = next(reader, None)
+        if not first_row:
+            raise CSVImportError("The file is empty.")
+        header = [column.strip().lower() for column in first_row]
+        if upload_type == 'recipe_ingredients':
+            _import_recipe_ingredients(reader, header, user, report, chunk_size)
+        elif upload_type == 'recipes' and (header[0] == 'type' or header[0].upper() in SHEET_ROW_TYPES):
+            # Without a header row, the first row is already a RECIPE row.
+            _import_sheet(reader if header[0] == 'type' else _FirstRowReader(first_row, reader), user, report, chunk_size)
+        elif upload_type == 'recipes':
+            _import_recipes(reader, header, user, report, chunk_size)
+        else:
+            raise CSVImportError("Please choose what kind of file you are uploading.")
+    except UnicodeDecodeError:
+        db.session.rollback()
+        raise CSVImportError(f"Reading stopped at line {reader.line_num + 1}: the file isn't UTF-8 text. Rows above it were "
+                             f"imported; please save the file as \"CSV UTF-8\" and upload the rest.")
+    except csv.Error as e:
+        db.session.rollback()
+        raise CSVImportError(f"Reading stopped at line {reader.line_num}, which isn't valid CSV ({e}). Rows above it were imported.")
+    finally:
+        text.detach()
+    return report
+
+
+class _FirstRowReader:
+    # A csv.reader with a row it already read put back in front; line_num still counts from it.
+    def __init__(self, row, reader):
+        self.rows = chain([row], reader)
+        self.reader = reader
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.rows)
+
+    @property
+    def line_num(self):
+        return self.reader.line_num
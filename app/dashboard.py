@@ -0,0 +1,348 @@
+import calendar
+import itertools
+from collections import defaultdict
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import case, desc, event, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, joinedload
+
+from . import db
+from .cookable import get_cookable_recipe_ids
+from .shopping import compute_shopping_lists
+from .models import (Recipe, RecipeIngredient, MealPlan, PantryItem, ShoppingListItem,
+                     HouseholdStats, NutritionRollup)
+from .nutrition import NUTRIENTS
+
+
+def get_culinary_title(recipe_count, five_star_count):
+    if recipe_count >= 50 and five_star_count >= 5:
+        return "Michelin Star Chef"
+    elif recipe_count >= 30:
+        return "Head Chef"
+    elif recipe_count >= 10:
+        return "Sous Chef"
+    return "Kitchen Apprentice"
+
+
+def _dashboard_periods(today):
+    start_of_week = today - timedelta(days=today.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+    start_of_month = today.replace(day=1)
+    end_of_month = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    return start_of_week, end_of_week, start_of_month, end_of_month
+
+
+def _recipe_counts(household_id):
+    row = db.session.execute(
+        select(
+            func.count(Recipe.id),
+            func.coalesce(func.sum(case((Recipe.rating == 5, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Recipe.is_favorite.is_(True), 1), else_=0)), 0),
+        ).where(Recipe.household_id == household_id)
+    ).one()
+    return {'total': row[0], 'five_star': int(row[1]), 'favorite': int(row[2])}
+
+
+def _pantry_in_stock_count(household_id):
+    return db.session.scalar(
+        select(func.count(PantryItem.id)).where(PantryItem.household_id == household_id, PantryItem.quantity > 0)
+    )
+
+
+def _recipes_can_make_count(household_id):
+    return len(get_cookable_recipe_ids(household_id))
+
+
+def _items_to_buy_count(household_id, start, end):
+    """Entries on the household's shopping list for meals in [start, end], manual items included."""
+    grouped_list = compute_shopping_lists([household_id], start, end)[household_id]['grouped_list']
+    return sum(len(items) for items in grouped_list.values())
+
+
+def _macro_totals(household_id, periods):
+    """Scheduled and consumed macro sums for several date ranges in a single query over the nutrition rollup.
+
+    `periods` maps a label to a (start, end) tuple; the result maps each label to
+    {'scheduled': {...}, 'consumed': {...}} keyed by nutrient.
+    """
+    columns = []
+    for start, end in periods.values():
+        in_period = NutritionRollup.day.between(start, end)
+        for nutrient in NUTRIENTS:
+            for kind in ('scheduled', 'consumed'):
+                value = getattr(NutritionRollup, f'{kind}_{nutrient}')
+                columns.append(func.coalesce(func.sum(case((in_period, value), else_=0)), 0))
+
+    overall_start = min(start for start, _ in periods.values())
+    overall_end = max(end for _, end in periods.values())
+    row = db.session.execute(
+        select(*columns).where(
+            NutritionRollup.household_id == household_id,
+            NutritionRollup.day.between(overall_start, overall_end)
+        )
+    ).one()
+
+    totals, values = {}, iter(row)
+    for label in periods:
+        stats = {'scheduled': {}, 'consumed': {}}
+        for nutrient in NUTRIENTS:
+            stats['scheduled'][nutrient] = next(values)
+            stats['consumed'][nutrient] = next(values)
+        totals[label] = stats
+    return totals
+
+
+def get_most_made_recipes(household_id, limit=5):
+    return db.session.query(
+        Recipe,
+        func.count(MealPlan.recipe_id).label('meal_count')
+    ).join(MealPlan, Recipe.id == MealPlan.recipe_id)\
+    .filter(Recipe.household_id == household_id)\
+    .group_by(Recipe.id)\
+    .order_by(desc('meal_count'))\
+    .limit(limit).all()
+
+
+def get_dashboard_stats(household_id, today=None):
+    """
+    Computes every figure shown on the dashboard in a fixed number of SQL queries,
+    independent of how many recipes, pantry items or planned meals the household has.
+    """
+    today = today or date.today()
+    start_of_week, end_of_week, start_of_month, end_of_month = _dashboard_periods(today)
+
+    recipe_counts = _recipe_counts(household_id)
+    macros = _macro_totals(household_id, {
+        'week': (start_of_week, end_of_week),
+        'month': (start_of_month, end_of_month),
+    })
+
+    kitchen_stats = {
+        'total_recipes': recipe_counts['total'],
+        'pantry_items': _pantry_in_stock_count(household_id),
+        'favorite_recipes': recipe_counts['favorite'],
+        'recipes_can_make': _recipes_can_make_count(household_id),
+        'items_to_buy': _items_to_buy_count(household_id, today, end_of_week)
+    }
+
+    return {
+        'kitchen_stats': kitchen_stats,
+        'weekly_stats': macros['week'],
+        'monthly_stats': macros['month'],
+        'most_made_recipes': get_most_made_recipes(household_id),
+        'five_star_recipes': recipe_counts['five_star'],
+        'culinary_title': get_culinary_title(recipe_counts['total'], recipe_counts['five_star']),
+    }
+
+
+def get_todays_dinner(household_id, today=None):
+    return MealPlan.query.options(joinedload(MealPlan.recipe)).filter_by(
+        household_id=household_id,
+        meal_date=today or date.today(),
+        meal_slot='Dinner'
+    ).first()
+
+
+# --- Materialized Snapshot ---
+# The dashboard reads a single HouseholdStats row, kept in parts. A flushed write to a
+# model the dashboard depends on marks only the parts it can change as stale, inside the
+# same transaction; the next read recomputes those parts and keeps the others. Toggling a
+# favourite recounts recipes without rebuilding the shopping list. The whole row is
+# recomputed on the first read of a day, when the week, month and shopping windows move.
+RECIPE_COUNTS = 1   # total, five-star and favourite recipes
+PANTRY = 2          # in-stock pantry items and makeable recipes
+MACROS = 4          # weekly and monthly macro totals
+MOST_MADE = 8
+ITEMS_TO_BUY = 16
+ALL_PARTS = RECIPE_COUNTS | PANTRY | MACROS | MOST_MADE | ITEMS_TO_BUY
+
+# The parts a new or deleted row of each model can change.
+STATS_SOURCE_PARTS = {
+    Recipe: ALL_PARTS,
+    RecipeIngredient: PANTRY | ITEMS_TO_BUY,
+    MealPlan: MACROS | MOST_MADE | ITEMS_TO_BUY,
+    PantryItem: PANTRY | ITEMS_TO_BUY,
+    ShoppingListItem: ITEMS_TO_BUY,
+}
+# For updated rows, the parts each column can change; unlisted columns count as the whole model.
+STATS_SOURCE_COLUMN_PARTS = {
+    Recipe: {'rating': RECIPE_COUNTS, 'is_favorite': RECIPE_COUNTS, 'name': MOST_MADE,
+             'calories': MACROS, 'protein': MACROS, 'fat': MACROS, 'carbs': MACROS,
+             'instructions': 0, 'servings': 0, 'prep_time': 0, 'cook_time': 0, 'meal_type': 0},
+    MealPlan: {'is_eaten': MACROS},
+}
+
+
+def invalidate_household_stats(*household_ids, parts=ALL_PARTS, recipes_changed=False, bind=None):
+    """
+    Marks `parts` of the stats snapshot of the given households as stale. With no ids,
+    every snapshot is invalidated. `recipes_changed` also retires cached cookable-recipe
+    indexes. Call this after bulk query.update()/delete() statements, which bypass
+    the flush hooks.
+    """
+    table = HouseholdStats.__table__
+    values = {'is_stale': True, 'stale_parts': table.c.stale_parts.op('|')(parts), 'version': table.c.version + 1}
+    if recipes_changed:
+        values['recipe_index_version'] = table.c.recipe_index_version + 1
+    stmt = update(table).values(**values)
+    if household_ids:
+        stmt = stmt.where(table.c.household_id.in_(set(household_ids)))
+    (bind or db.session).execute(stmt)
+    if bind is None:
+        _mark_invalidated(db.session, recipes_changed)
+
+
+def _mark_invalidated(session, recipes_changed):
+    # Until the transaction ends: the snapshot row is locked by it, and a cookable index built
+    # from its recipes must not be cached under a version number a rollback would hand out again.
+    session.info['stats_invalidated'] = True
+    if recipes_changed:
+        session.info['recipe_indexes_changed'] = True
+
+
+def _changed_parts(session, obj):
+    parts = STATS_SOURCE_PARTS[type(obj)]
+    if obj not in session.dirty:
+        return parts
+    column_parts = STATS_SOURCE_COLUMN_PARTS.get(type(obj), {})
+    state = inspect(obj)
+    changed = 0
+    for attr in state.mapper.column_attrs:
+        if state.attrs[attr.key].history.has_changes():
+            changed |= column_parts.get(attr.key, parts)
+    return changed
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_stats_after_flush(session, flush_context):
+    stale, recipe_parts, recipe_household_ids = defaultdict(int), defaultdict(int), set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if type(obj) not in STATS_SOURCE_PARTS or (obj in session.dirty and not session.is_modified(obj)):
+            continue
+        parts = _changed_parts(session, obj)
+        if isinstance(obj, RecipeIngredient):
+            recipe_parts[obj.recipe_id] |= parts
+        else:
+            stale[obj.household_id] |= parts
+            if isinstance(obj, Recipe) and (obj in session.new or obj in session.deleted):
+                recipe_household_ids.add(obj.household_id)
+
+    if recipe_parts:
+        for recipe_id, household_id in session.connection().execute(
+            select(Recipe.id, Recipe.household_id).where(Recipe.id.in_(recipe_parts))
+        ):
+            stale[household_id] |= recipe_parts[recipe_id]
+            recipe_household_ids.add(household_id)
+    stale.pop(None, None)
+
+    groups = defaultdict(set)
+    for household_id, parts in stale.items():
+        if parts:
+            groups[parts, household_id in recipe_household_ids].add(household_id)
+    for (parts, recipes_changed), household_ids in groups.items():
+        invalidate_household_stats(*household_ids, parts=parts, recipes_changed=recipes_changed,
+                                   bind=session.connection())
+        _mark_invalidated(session, recipes_changed)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_stats_invalidation(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('stats_invalidated', None)
+        session.info.pop('recipe_indexes_changed', None)
+
+
+def _snapshot_parts(household_id, parts, today):
+    """Column values of the snapshot parts in `parts`, computed from the source tables."""
+    start_of_week, end_of_week, start_of_month, end_of_month = _dashboard_periods(today)
+    values = {}
+    if parts & RECIPE_COUNTS:
+        counts = _recipe_counts(household_id)
+        values.update(total_recipes=counts['total'], five_star_recipes=counts['five_star'],
+                      favorite_recipes=counts['favorite'])
+    if parts & PANTRY:
+        values.update(pantry_items=_pantry_in_stock_count(household_id),
+                      recipes_can_make=_recipes_can_make_count(household_id))
+    if parts & MACROS:
+        macros = _macro_totals(household_id, {
+            'week': (start_of_week, end_of_week),
+            'month': (start_of_month, end_of_month),
+        })
+        values.update(weekly_macros=macros['week'], monthly_macros=macros['month'])
+    if parts & MOST_MADE:
+        values['most_made_recipes'] = [[{'id': recipe.id, 'name': recipe.name}, count]
+                                       for recipe, count in get_most_made_recipes(household_id)]
+    if parts & ITEMS_TO_BUY:
+        values['items_to_buy'] = _items_to_buy_count(household_id, today, end_of_week)
+    return values
+
+
+def _create_stale_snapshot(household_id):
+    """Inserts the household's snapshot row with every part stale, unless another request has, and loads it."""
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(HouseholdStats.__table__).values(
+                household_id=household_id, is_stale=True, stale_parts=ALL_PARTS, version=0
+            ))
+    except IntegrityError:
+        pass
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"Creating the stats snapshot of household {household_id} failed: {e}")
+    return db.session.get(HouseholdStats, household_id, populate_existing=True)
+
+
+def _refresh_household_stats(household_id, snapshot, today):
+    # Written on a connection of its own, so that a page view never commits the request's
+    # session. When this transaction has invalidated the row itself, the row is locked by it
+    # and stale again once it commits, so the values are served without being stored.
+    store = not db.session.info.get('stats_invalidated')
+    if snapshot is None and store:
+        # The row exists before anything is computed, so that a write committed while we
+        # compute bumps its version and the guarded update below leaves it stale.
+        snapshot = _create_stale_snapshot(household_id)
+
+    whole = snapshot is None or snapshot.computed_on != today
+    values = _snapshot_parts(household_id, ALL_PARTS if whole else snapshot.stale_parts, today)
+    values.update(computed_on=today, is_stale=False, stale_parts=0)
+    table = HouseholdStats.__table__
+
+    if store and snapshot is not None:
+        try:
+            with db.engine.begin() as conn:
+                # Only store the parts if no write invalidated the row while we were computing.
+                conn.execute(update(table).where(
+                    table.c.household_id == household_id, table.c.version == snapshot.version
+                ).values(**values))
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f"Storing the stats snapshot of household {household_id} failed: {e}")
+
+    if snapshot is not None:
+        values = {**{column.key: getattr(snapshot, column.key) for column in table.columns}, **values}
+    return HouseholdStats(**{'household_id': household_id, **values})
+
+
+def get_household_stats(household_id, today=None):
+    """Returns the household's stats snapshot, recomputing its stale parts first, or all of it on a new day."""
+    today = today or date.today()
+    snapshot = db.session.get(HouseholdStats, household_id, populate_existing=True)
+    if snapshot is not None and not snapshot.is_stale and snapshot.computed_on == today:
+        return snapshot
+    return _refresh_household_stats(household_id, snapshot, today)
+
+
+def dashboard_context(snapshot):
+    return {
+        'kitchen_stats': {
+            'total_recipes': snapshot.total_recipes,
+            'pantry_items': snapshot.pantry_items,
+            'favorite_recipes': snapshot.favorite_recipes,
+            'recipes_can_make': snapshot.recipes_can_make,
+            'items_to_buy': snapshot.items_to_buy
+        },
+        'weekly_stats': snapshot.weekly_macros,
+        'monthly_stats': snapshot.monthly_macros,
+        'most_made_recipes': snapshot.most_made_recipes or [],
+        'culinary_title': get_culinary_title(snapshot.total_recipes, snapshot.five_star_recipes),
+    }
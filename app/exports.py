@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+import zipfile
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import select
+
+from . import db
+from .models import (Recipe, Ingredient, RecipeIngredient, MealPlan, PantryItem, SavedMeal,
+                     SavedMealRecipeLink, HistoricalPlan, HistoricalPlanEntry, User)
+
+# --- Household Exports ---
+# Every export is a single joined SELECT streamed out in batches of EXPORT_BATCH_ROWS. On
+# Postgres this uses a server-side cursor, and each batch is written out before the next
+# is fetched, so memory stays flat however large the household is. The recipes and
+# recipe_ingredients CSVs keep the columns the CSV import reads back.
+OUTPUT_CHUNK_BYTES = 64 * 1024
+
+
+def _recipes(household_id):
+    return select(
+        Recipe.id, Recipe.name, Recipe.instructions, Recipe.servings, Recipe.prep_time, Recipe.cook_time,
+        Recipe.meal_type, Recipe.is_favorite, Recipe.rating, User.email.label('author_email')
+    ).outerjoin(User, User.id == Recipe.user_id).where(Recipe.household_id == household_id).order_by(Recipe.id)
+
+
+def _recipe_ingredients(household_id):
+    return select(
+        RecipeIngredient.recipe_id, Ingredient.name.label('ingredient_name'), RecipeIngredient.quantity,
+        RecipeIngredient.unit
+    ).join(Recipe, Recipe.id == RecipeIngredient.recipe_id).join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id) \
+        .where(Recipe.household_id == household_id).order_by(RecipeIngredient.recipe_id, RecipeIngredient.id)
+
+
+def _meal_plans(household_id):
+    return select(
+        MealPlan.meal_date, MealPlan.meal_slot, MealPlan.recipe_id, Recipe.name.label('recipe_name'),
+        MealPlan.custom_item_name, MealPlan.is_eaten
+    ).outerjoin(Recipe, Recipe.id == MealPlan.recipe_id).where(MealPlan.household_id == household_id) \
+        .order_by(MealPlan.meal_date, MealPlan.meal_slot, MealPlan.id)
+
+
+def _pantry(household_id):
+    return select(
+        Ingredient.name.label('ingredient_name'), PantryItem.quantity, PantryItem.unit, PantryItem.date_updated
+    ).join(Ingredient, Ingredient.id == PantryItem.ingredient_id).where(PantryItem.household_id == household_id) \
+        .order_by(Ingredient.name)
+
+
+def _saved_meals(household_id):
+    return select(
+        SavedMeal.id.label('saved_meal_id'), SavedMeal.name.label('saved_meal_name'), Recipe.id.label('recipe_id'),
+        Recipe.name.label('recipe_name')
+    ).outerjoin(SavedMealRecipeLink, SavedMealRecipeLink.saved_meal_id == SavedMeal.id) \
+        .outerjoin(Recipe, Recipe.id == SavedMealRecipeLink.recipe_id) \
+        .where(SavedMeal.household_id == household_id).order_by(SavedMeal.id, Recipe.id)
+
+
+def _historical_plans(household_id):
+    return select(
+        HistoricalPlan.id.label('plan_id'), HistoricalPlan.name.label('plan_name'), HistoricalPlanEntry.day_of_week,
+        HistoricalPlanEntry.meal_slot, HistoricalPlanEntry.recipe_id, Recipe.name.label('recipe_name'),
+        HistoricalPlanEntry.custom_item_name
+    ).outerjoin(HistoricalPlanEntry, HistoricalPlanEntry.historical_plan_id == HistoricalPlan.id) \
+        .outerjoin(Recipe, Recipe.id == HistoricalPlanEntry.recipe_id) \
+        .where(HistoricalPlan.household_id == household_id) \
+        .order_by(HistoricalPlan.id, HistoricalPlanEntry.day_of_week, HistoricalPlanEntry.id)
+
+
+EXPORTS = {
+    'recipes': _recipes,
+    'recipe_ingredients': _recipe_ingredients,
+    'meal_plans': _meal_plans,
+    'pantry': _pantry,
+    'saved_meals': _saved_meals,
+    'historical_plans': _historical_plans,
+}
+
+
+def _stream(table, household_id):
+    """(column names, row iterator) for one export, fetched EXPORT_BATCH_ROWS at a time."""
+    stmt = EXPORTS[table](household_id).execution_options(yield_per=current_app.config['EXPORT_BATCH_ROWS'])
+    result = db.session.execute(stmt)
+    return list(result.keys()), (row for partition in result.partitions() for row in partition)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= OUTPUT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(columns, rows, table=None):
+    lines = []
+    size = 0
+    for row in rows:
+        record = dict(zip(columns, row))
+        line = json.dumps({'table': table, 'row': record} if table else record, default=_json_default) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= OUTPUT_CHUNK_BYTES:
+            yield ''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield ''.join(lines)
+
+
+def export_csv(table, household_id):
+    """The export as CSV text chunks."""
+    return _csv_chunks(*_stream(table, household_id))
+
+
+def export_ndjson(household_id, table=None):
+    """
+    One export as newline-delimited JSON objects, or with no `table`, every export in
+    turn, each line being {"table": ..., "row": {...}}.
+    """
+    for name in [table] if table else EXPORTS:
+        yield from _ndjson_chunks(*_stream(name, household_id), table=None if table else name)
+
+
+class _ZipOutput(io.RawIOBase):
+    # Write-only sink ZipFile writes into; whatever has been written is taken after each chunk.
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_zip(household_id):
+    """Every export as a CSV file in one zip archive, as byte chunks."""
+    output = _ZipOutput()
+    # The sink can't seek, so ZipFile writes each entry's sizes after its data.
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for table in EXPORTS:
+            with archive.open(f'{table}.csv', 'w', force_zip64=True) as entry:
+                for chunk in export_csv(table, household_id):
+                    entry.write(chunk.encode())
+                    compressed = output.take()
+                    if compressed:
+                        yield compressed
+    yield output.take()
@@ -0,0 +1,290 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup, UnicodeDammit
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from . import db
+from .ingredients import resolve_ingredient_ids
+from .jobs import JobError, report_progress, spend_ai_credit, timed_stage, used_ai_credit
+from .models import Recipe, RecipeIngredient
+from .structured_data import is_complete, scan_page
+from .utils import convert_quantity_to_float
+
+# --- Recipe Import Pipeline ---
+# A URL import runs in stages: fetch the page, scan it for a schema.org Recipe, reduce the
+# HTML to the recipe's text, extract the recipe and its per-serving nutrition in one
+# structured model call, then save. When the page's schema.org data has the whole recipe
+# the reduce and extract stages are skipped, and the model is only asked for nutrition the
+# page doesn't list. Nutrition used to be a second model call made after the first returned,
+# which doubled the wait; it is now only made when the extraction leaves the estimate out.
+# Each stage is timed into the job's timings. Pages are fetched through one pooled HTTP session per
+# process, at most IMPORT_CONCURRENCY at a time and at most one request per
+# IMPORT_HOST_INTERVAL seconds to any one host.
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+CONTENT_SELECTORS = ['article', 'main', '.recipe', '#recipe', '[class*="recipe-"]', '[id*="recipe-"]']
+NOISE_TAGS = ['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'footer', 'aside', 'form', 'button']
+NUTRITION_KEYS = ('calories', 'protein', 'fat', 'carbs')
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_cid|mc_eid)$', re.IGNORECASE)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least `interval` seconds apart, across threads."""
+    def __init__(self, interval):
+        self.interval = interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+            if len(self._next_slot) > 1024:
+                self._next_slot = {h: t for h, t in self._next_slot.items() if t > now}
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_http = None
+_fetch_slots = None
+_host_limiter = None
+_fetch_setup_lock = threading.Lock()
+
+
+def _fetch_setup():
+    # Created on first use, so each gunicorn worker gets its own connection pool.
+    global _http, _fetch_slots, _host_limiter
+    with _fetch_setup_lock:
+        if _http is None:
+            concurrency = current_app.config['IMPORT_CONCURRENCY']
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _fetch_slots = threading.BoundedSemaphore(concurrency)
+            _host_limiter = HostRateLimiter(current_app.config['IMPORT_HOST_INTERVAL'])
+            _http = session
+        return _http, _fetch_slots, _host_limiter
+
+
+def canonical_url(url):
+    """
+    The form two links to the same page share: lower-case scheme and host, no default
+    port, fragment, tracking parameters or trailing slash, sorted query. None when `url`
+    isn't an http(s) address.
+    """
+    parts = urlsplit((url or '').strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if parts.port and parts.port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{parts.port}'
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, host, parts.path.rstrip('/') or '/', query, ''))
+
+
+def fetch_page(url):
+    http, fetch_slots, host_limiter = _fetch_setup()
+    host_limiter.wait(urlsplit(url).hostname or '')
+    with fetch_slots:
+        try:
+            response = http.get(url, timeout=15)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            raise JobError('Failed to fetch the URL.')
+    return response.content
+
+
+def decode_page(content):
+    # Honours the page's declared charset, like BeautifulSoup does when given bytes.
+    return UnicodeDammit(content, is_html=True).unicode_markup or ''
+
+
+def reduce_html(soup):
+    for element in soup.find_all(NOISE_TAGS):
+        element.decompose()
+    main_content = next(filter(None, (soup.select_one(s) for s in CONTENT_SELECTORS)), soup.body)
+    page_text = ' '.join(main_content.get_text(separator=' ', strip=True).split()) if main_content else ''
+    if len(page_text) < 150:
+        raise JobError('Could not extract enough readable content.')
+    return page_text[:current_app.config['IMPORT_MAX_PAGE_CHARS']]
+
+
+def extract_recipe(client, page_text):
+    recipe_prompt = ("""
+        Analyze the following text from a recipe webpage and extract the recipe details.
+        Your output must be a single, valid JSON object with keys: "name", "servings", "instructions", "meal_type", "ingredients" and "nutrition".
+        "nutrition" is your estimate PER SERVING for the extracted ingredients and servings: an object with keys "calories", "protein", "fat", "carbs".
+    """)
+    recipe_data = json.loads(client.generate([recipe_prompt, page_text], task='import_recipe', json_response=True))
+    if not all(k in recipe_data for k in ['name', 'instructions', 'ingredients']):
+        raise JobError('The AI could not understand the recipe from that URL.')
+    return recipe_data
+
+
+def estimate_nutrition(client, recipe_data):
+    ingredient_list_for_nutrition = ", ".join([f"{ing.get('quantity', '')} {ing.get('unit', '')} {ing.get('name', '')}" for ing in recipe_data['ingredients']])
+    nutrition_prompt = f"""
+        Analyze the ingredient list: {ingredient_list_for_nutrition} for {recipe_data.get('servings', 1) or 1} servings.
+        Estimate nutritional info PER SERVING. Output a JSON object with keys: "calories", "protein", "fat", "carbs".
+    """
+    return json.loads(client.generate(nutrition_prompt, task='nutrition', json_response=True))
+
+
+def save_recipe(recipe_data, nutrition_data, user):
+    new_recipe = Recipe(
+        name=recipe_data['name'],
+        instructions=recipe_data['instructions'],
+        servings=recipe_data.get('servings'),
+        meal_type=recipe_data.get('meal_type', 'Main Course'),
+        author=user,
+        household_id=user.household_id,
+        calories=nutrition_data.get('calories'),
+        protein=nutrition_data.get('protein'),
+        fat=nutrition_data.get('fat'),
+        carbs=nutrition_data.get('carbs')
+    )
+    db.session.add(new_recipe)
+    db.session.flush()
+
+    ingredient_lines = [ing for ing in recipe_data['ingredients'] if ing.get('name', '').strip()]
+    ingredient_ids = resolve_ingredient_ids(ing['name'].strip().title() for ing in ingredient_lines)
+    for ing_data in ingredient_lines:
+        recipe_ingredient = RecipeIngredient(
+            recipe_id=new_recipe.id,
+            ingredient_id=ingredient_ids[ing_data['name'].strip().lower()],
+            quantity=convert_quantity_to_float(ing_data.get('quantity', '0')),
+            unit=ing_data.get('unit', '')
+        )
+        db.session.add(recipe_ingredient)
+    return new_recipe
+
+
+def recipe_from_page(client, markup, scanned):
+    """(recipe_data, nutrition_data) for a page, from its schema.org Recipe when that is complete."""
+    if is_complete(scanned):
+        recipe_data = scanned
+    else:
+        with timed_stage('reduce'):
+            page_text = reduce_html(BeautifulSoup(markup, 'html.parser'))
+            if scanned:
+                # A partial schema.org recipe still pins down what the page text leaves ambiguous.
+                page_text = f"Structured data from the page: {json.dumps(scanned)}\n\n{page_text}"
+        with timed_stage('extract'):
+            recipe_data = extract_recipe(client, page_text)
+    return recipe_data, _nutrition(client, recipe_data)
+
+
+def import_recipe(url, user, client):
+    with timed_stage('fetch'):
+        content = fetch_page(url)
+    with timed_stage('scan'):
+        markup = decode_page(content)
+        scanned = scan_page(markup).recipe
+    recipe_data, nutrition_data = recipe_from_page(client, markup, scanned)
+    with timed_stage('save'):
+        return save_recipe(recipe_data, nutrition_data, user)
+
+
+def _nutrition(client, recipe_data):
+    nutrition_data = recipe_data.get('nutrition')
+    if not isinstance(nutrition_data, dict) or not any(nutrition_data.get(k) is not None for k in NUTRITION_KEYS):
+        with timed_stage('nutrition'):
+            nutrition_data = estimate_nutrition(client, recipe_data)
+    return nutrition_data
+
+
+# --- Batch Import ---
+# Imports a list of URLs in one job. Pages are fetched and extracted on a pool of
+# IMPORT_CONCURRENCY threads, each in its own app context and without touching the job's
+# session; the job thread saves the extracted recipes IMPORT_COMMIT_BATCH at a time and
+# reports every URL's status on the job as it goes. URLs that lead to a page already seen
+# in the batch (by its rel="canonical" link, or by the URL itself) are skipped before the
+# model is called. Each imported recipe costs one credit, unless it was imported without
+# calling the model.
+
+def _extract_one(app, client, url, canonical, seen_pages, seen_lock):
+    with app.app_context():
+        markup = decode_page(fetch_page(url))
+        scanned = scan_page(markup)
+        page = canonical_url(scanned.canonical) or canonical
+        with seen_lock:
+            if page in seen_pages:
+                return None, False
+            seen_pages.add(page)
+        return recipe_from_page(client, markup, scanned.recipe), used_ai_credit()
+
+
+def _save_batch(extracted, progress, user):
+    for index, (recipe_data, nutrition_data), charged in extracted:
+        try:
+            with db.session.begin_nested():
+                recipe = save_recipe(recipe_data, nutrition_data, user)
+        except Exception as e:
+            current_app.logger.error(f"Batch import could not save {progress[index]['url']}: {e}", exc_info=True)
+            progress[index].update(status='failed', error='The recipe could not be saved.')
+            continue
+        if charged:
+            spend_ai_credit()
+        progress[index].update(status='imported', recipe_id=recipe.id, name=recipe.name)
+
+
+def import_batch(entries, user, client):
+    """
+    Imports every entry ({'url', 'canonical'}, canonical None for invalid addresses).
+    Returns the per-URL progress list, whose statuses end as imported, duplicate or failed.
+    """
+    app = current_app._get_current_object()
+    batch_size = app.config['IMPORT_COMMIT_BATCH']
+    progress, to_fetch, seen_pages = [], [], set()
+    for entry in entries:
+        progress.append({'url': entry['url'], 'status': 'queued'})
+        if entry['canonical'] is None:
+            progress[-1].update(status='failed', error='Not a valid web address.')
+        elif entry['canonical'] in seen_pages:
+            progress[-1]['status'] = 'duplicate'
+        else:
+            seen_pages.add(entry['canonical'])
+            to_fetch.append((len(progress) - 1, entry))
+    report_progress(progress)
+
+    # Page-level duplicates are caught by the pages' canonical links as they are fetched.
+    seen_pages, seen_lock, extracted = set(), threading.Lock(), []
+    with ThreadPoolExecutor(max_workers=app.config['IMPORT_CONCURRENCY'], thread_name_prefix='import') as pool:
+        futures = {
+            pool.submit(_extract_one, app, client, entry['url'], entry['canonical'], seen_pages, seen_lock): index
+            for index, entry in to_fetch
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                data, charged = future.result()
+            except JobError as e:
+                progress[index].update(status='failed', error=str(e))
+            except Exception as e:
+                current_app.logger.error(f"Batch import failed for {progress[index]['url']}: {e}", exc_info=True)
+                progress[index].update(status='failed', error='An unexpected error occurred during import.')
+            else:
+                if data is None:
+                    progress[index]['status'] = 'duplicate'
+                else:
+                    progress[index]['status'] = 'extracted'
+                    extracted.append((index, data, charged))
+            if len(extracted) >= batch_size:
+                _save_batch(extracted, progress, user)
+                extracted = []
+            report_progress(progress)
+    if extracted:
+        _save_batch(extracted, progress, user)
+        report_progress(progress)
+    return progress
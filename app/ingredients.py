@@ -0,0 +1,299 @@
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from cachetools import LRUCache
+from sqlalchemy import event, func, insert, inspect, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Ingredient, IngredientCatalogVersion
+
+# --- Ingredient Name Resolver ---
+# Ingredients are one global table matched case-insensitively by name. Resolved ids are
+# cached per worker process, tagged with ingredient_catalog_version. Deleting or renaming
+# an ingredient bumps that version (the flush hook below, or invalidate_ingredient_ids()
+# after bulk statements), which retires the ids every process has cached.
+_id_cache = LRUCache(maxsize=4096)
+_id_cache_lock = threading.Lock()
+_CHUNK = 500
+
+
+def _key(name):
+    return (name or '').strip().lower()
+
+
+def forget_ingredient_ids(*names):
+    """Drops this process's cached ids for the given names, or all of them when called without names."""
+    with _id_cache_lock:
+        if not names:
+            _id_cache.clear()
+        for name in names:
+            _id_cache.pop(_key(name), None)
+
+
+def invalidate_ingredient_ids(*names, bind=None):
+    """
+    Retires cached ingredient ids in every worker process. Call this after bulk
+    query.update()/delete() statements on ingredients, which bypass the flush hooks.
+    """
+    (bind or db.session).execute(update(IngredientCatalogVersion).values(version=IngredientCatalogVersion.version + 1))
+    forget_ingredient_ids(*names)
+
+
+def _catalog_version():
+    return db.session.scalar(select(IngredientCatalogVersion.version)) or 0
+
+
+@event.listens_for(Session, 'after_flush')
+def _forget_after_flush(session, flush_context):
+    names = [obj.name for obj in session.deleted if isinstance(obj, Ingredient)]
+    for obj in session.dirty:
+        if isinstance(obj, Ingredient):
+            names.extend(inspect(obj).attrs.name.history.deleted)
+    if names:
+        invalidate_ingredient_ids(*names, bind=session.connection())
+
+
+# Ids of ingredients inserted by the resolver only become cacheable once their transaction commits.
+@event.listens_for(Session, 'after_commit')
+def _cache_after_commit(session):
+    created = session.info.pop('created_ingredient_ids', None)
+    if created:
+        with _id_cache_lock:
+            _id_cache.update(created)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('created_ingredient_ids', None)
+
+
+def _lookup(wanted):
+    """
+    Maps the keys of `wanted` ({key: name as given}) to ingredient ids. Rows are matched
+    by lower(name) or by the exact name, and keyed by _key() of the stored name: SQLite's
+    lower() only folds ASCII, so it can disagree with str.lower(), and the exact match
+    still finds a non-ASCII name the resolver has just inserted.
+    """
+    found = {}
+    items = list(wanted.items())
+    for start in range(0, len(items), _CHUNK):
+        chunk = dict(items[start:start + _CHUNK])
+        for ingredient_id, name in db.session.execute(
+            select(Ingredient.id, Ingredient.name).where(or_(
+                func.lower(Ingredient.name).in_(list(chunk)), Ingredient.name.in_(list(chunk.values()))
+            )).order_by(Ingredient.id.desc())
+        ):
+            if _key(name) in chunk:
+                found[_key(name)] = ingredient_id
+    return found
+
+
+def _insert_missing(rows):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(postgresql.insert(Ingredient).on_conflict_do_nothing(index_elements=['name']), rows)
+    elif dialect == 'sqlite':
+        db.session.execute(sqlite.insert(Ingredient).on_conflict_do_nothing(index_elements=['name']), rows)
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Ingredient), rows)
+        except IntegrityError:
+            # Someone else created one of the names first; the lookup that follows picks it up.
+            pass
+
+
+def resolve_ingredient_ids(names, category=None):
+    """
+    Maps each name to the id of the ingredient with that name, ignoring case. Missing
+    ingredients are created with the name as given (and `category`, if provided) in a
+    single INSERT. The result is keyed by the stripped, lower-cased name.
+    """
+    wanted = {}
+    for name in names:
+        if name and name.strip():
+            wanted.setdefault(_key(name), name.strip())
+    if not wanted:
+        return {}
+
+    version = _catalog_version()
+    with _id_cache_lock:
+        cached = {key: _id_cache.get(key) for key in wanted}
+    resolved = {key: entry[1] for key, entry in cached.items() if entry and entry[0] == version}
+    missing = set(wanted) - set(resolved)
+
+    if missing:
+        resolved.update(_lookup({key: wanted[key] for key in missing}))
+        missing -= set(resolved)
+    with _id_cache_lock:
+        _id_cache.update((key, (version, ingredient_id)) for key, ingredient_id in resolved.items())
+
+    if missing:
+        rows = [{'name': wanted[key]} for key in missing]
+        if category:
+            for row in rows:
+                row['category'] = category
+        _insert_missing(rows)
+        created = _lookup({key: wanted[key] for key in missing})
+        db.session.info.setdefault('created_ingredient_ids', {}).update(
+            (key, (version, ingredient_id)) for key, ingredient_id in created.items()
+        )
+        resolved.update(created)
+    return resolved
+
+
+# --- Ingredient Similarity ---
+# Recipes, pantries and shopping lists name the same ingredient in different ways ("Scallions",
+# "green onion", "Chopped Green Onions"). canonical_name() reduces a name to lower-case
+# singular words without preparation words, with known aliases spelled one way. An
+# IngredientIndex holds the canonical names of a set of ingredients with postings per word
+# and per trigram, so a lookup only looks at ingredients sharing a word or trigram with the
+# name it is given, and ranks them:
+#   1.0         the same canonical name
+#   0.5 - 0.95  one name's words all appear in the other ("chicken" / "chicken breast"),
+#               higher the more words they share and when the last (head) word is the same
+#   below 0.5   a near spelling, by trigram similarity ("tomatoe" / "tomato")
+SAME_INGREDIENT = 1.0
+FUZZY_MIN_SIMILARITY = 0.8
+NAME_WORDS = re.compile(r"[a-z0-9]+")
+NAME_DESCRIPTORS = {
+    'fresh', 'freshly', 'chopped', 'diced', 'minced', 'sliced', 'grated', 'shredded', 'crushed', 'peeled',
+    'large', 'small', 'medium', 'whole', 'boneless', 'skinless', 'raw', 'ripe', 'organic', 'finely',
+    'roughly', 'thinly', 'ground', 'dried', 'frozen', 'cooked', 'packed', 'softened', 'melted', 'of',
+}
+IRREGULAR_SINGULARS = {
+    'leaves': 'leaf', 'loaves': 'loaf', 'halves': 'half', 'knives': 'knife', 'geese': 'goose',
+    'molasses': 'molasses', 'hummus': 'hummus', 'couscous': 'couscous', 'asparagus': 'asparagus',
+    'swiss': 'swiss', 'grits': 'grits', 'oats': 'oat', 'peas': 'pea',
+}
+INGREDIENT_ALIASES = {
+    'scallion': 'green onion',
+    'spring onion': 'green onion',
+    'cilantro': 'coriander',
+    'garbanzo bean': 'chickpea',
+    'garbanzo': 'chickpea',
+    'aubergine': 'eggplant',
+    'courgette': 'zucchini',
+    'capsicum': 'bell pepper',
+    'confectioner sugar': 'powdered sugar',
+    'icing sugar': 'powdered sugar',
+    'caster sugar': 'superfine sugar',
+    'bicarbonate of soda': 'baking soda',
+    'bicarbonate soda': 'baking soda',
+    'cornflour': 'cornstarch',
+    'corn starch': 'cornstarch',
+    'plain flour': 'all purpose flour',
+    'ap flour': 'all purpose flour',
+    'rocket': 'arugula',
+    'prawn': 'shrimp',
+    'beef mince': 'beef',
+    'evoo': 'extra virgin olive oil',
+    'coriander leaf': 'coriander',
+}
+
+
+def _singular(word):
+    if word in IRREGULAR_SINGULARS:
+        return IRREGULAR_SINGULARS[word]
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=8192)
+def canonical_name(name):
+    """`name` as lower-case, unaccented singular words without preparation words, with aliases spelled out."""
+    folded = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode()
+    words = NAME_WORDS.findall(folded.lower().replace("'", ''))
+    words = [_singular(word) for word in (w for w in words if w not in NAME_DESCRIPTORS)] or [_singular(w) for w in words]
+    canonical = ' '.join(words)
+    if canonical in INGREDIENT_ALIASES:
+        return INGREDIENT_ALIASES[canonical]
+    return ' '.join(INGREDIENT_ALIASES.get(word, word) for word in words)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class IngredientIndex:
+    """
+    Ranked lookups of ingredient names among a set of entries, each a (key, name) pair; keys
+    are whatever the caller identifies entries by (ingredient ids, pantry row ids).
+    """
+
+    def __init__(self, entries=()):
+        self.names = {}
+        self._words = {}
+        self._trigrams = {}
+        self._by_canonical = defaultdict(set)
+        self._word_postings = defaultdict(set)
+        self._trigram_postings = defaultdict(set)
+        for key, name in entries:
+            self.add(key, name)
+
+    def add(self, key, name):
+        canonical = canonical_name(name)
+        self.names[key] = name
+        self._words[key] = canonical.split()
+        self._trigrams[key] = _trigrams(canonical)
+        self._by_canonical[canonical].add(key)
+        for word in set(self._words[key]):
+            self._word_postings[word].add(key)
+        for trigram in self._trigrams[key]:
+            self._trigram_postings[trigram].add(key)
+
+    def remove(self, key):
+        if key not in self.names:
+            return
+        self._by_canonical[' '.join(self._words[key])].discard(key)
+        for word in self._words[key]:
+            self._word_postings[word].discard(key)
+        for trigram in self._trigrams[key]:
+            self._trigram_postings[trigram].discard(key)
+        del self.names[key], self._words[key], self._trigrams[key]
+
+    def ranked(self, name):
+        """[(key, score)] for every entry matching `name`, best first, ties by name."""
+        canonical = canonical_name(name)
+        words = canonical.split()
+        scores = {key: SAME_INGREDIENT for key in self._by_canonical.get(canonical, ())}
+
+        shared = Counter()
+        for word in set(words):
+            shared.update(self._word_postings.get(word, ()))
+        for key, count in shared.items():
+            entry_words = self._words[key]
+            if key in scores or (count < len(set(words)) and count < len(set(entry_words))):
+                continue
+            overlap = count / len(set(words) | set(entry_words))
+            scores[key] = 0.5 + 0.4 * overlap + (0.05 if entry_words[-1] == words[-1] else 0)
+
+        if not scores:
+            query_trigrams = _trigrams(canonical)
+            hits = Counter()
+            for trigram in query_trigrams:
+                hits.update(self._trigram_postings.get(trigram, ()))
+            for key, count in hits.items():
+                similarity = 2 * count / (len(query_trigrams) + len(self._trigrams[key]))
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    scores[key] = 0.5 * similarity
+        return sorted(scores.items(), key=lambda item: (-item[1], self.names[item[0]].lower(), str(item[0])))
+
+    def best(self, name, min_score=0.0):
+        """
+        The keys of the best match for `name` scoring at least `min_score`: one key when it
+        is a clear winner, every tied key when several rank equal, none when nothing matches.
+        """
+        ranked = [(key, round(score, 6)) for key, score in self.ranked(name) if score >= min_score]
+        return [key for key, score in ranked if score == ranked[0][1]]
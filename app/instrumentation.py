@@ -0,0 +1,199 @@
+import hmac
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from . import db
+from .ai_cache import CachingClient
+from .query_watch import query_shape
+
+# --- Request Instrumentation ---
+# With INSTRUMENTATION_ENABLED, every request records its wall time and the time spent in
+# the database (statement count too), rendering templates, Pint and model calls. The
+# figures go out with the response as a Server-Timing header, which browser dev tools
+# show per request, and are added to process-wide totals that GET /metrics serves in the
+# Prometheus text format. Each gunicorn worker keeps its own totals, so scrape every worker
+# or sum them. SLOW_QUERY_MS logs statements that run longer, normalized like the N+1
+# detector's shapes, whether or not the rest is enabled. Nothing is hooked in when both
+# are off. Code outside the hooked libraries reports time with `with timed(component):`,
+# which does nothing outside an instrumented request.
+TIMED_COMPONENTS = ('db', 'template', 'pint', 'ai')
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.seconds = dict.fromkeys(TIMED_COMPONENTS, 0.0)
+        self.rendering = []
+
+
+@contextmanager
+def timed(component):
+    """Adds the time spent in the block to the current request's `component` total."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.seconds[component] += time.perf_counter() - started
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Process-wide request totals, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.durations = Counter()
+        self.duration_buckets = Counter()
+        self.queries = Counter()
+        self.component_seconds = Counter()
+        self.slow_queries = 0
+
+    def observe(self, endpoint, method, status, timings, total):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.durations[endpoint] += total
+            for bound in DURATION_BUCKETS:
+                if total <= bound:
+                    self.duration_buckets[(endpoint, bound)] += 1
+            self.queries[endpoint] += timings.queries
+            for component, seconds in timings.seconds.items():
+                self.component_seconds[(endpoint, component)] += seconds
+
+    def slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def render(self, ai_cache_stats=None):
+        with self._lock:
+            lines = ['# HELP meal_engine_requests_total Requests handled, by endpoint, method and status.',
+                     '# TYPE meal_engine_requests_total counter']
+            lines += [f'meal_engine_requests_total{{endpoint="{_label(endpoint)}",method="{method}",status="{status}"}} {count}'
+                      for (endpoint, method, status), count in sorted(self.requests.items())]
+            lines += ['# HELP meal_engine_request_duration_seconds Wall time of requests, by endpoint.',
+                      '# TYPE meal_engine_request_duration_seconds histogram']
+            counts = Counter()
+            for (endpoint, method, status), count in self.requests.items():
+                counts[endpoint] += count
+            for endpoint in sorted(counts):
+                name = _label(endpoint)
+                for bound in DURATION_BUCKETS:
+                    lines.append(f'meal_engine_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} '
+                                 f'{self.duration_buckets[(endpoint, bound)]}')
+                lines.append(f'meal_engine_request_duration_seconds_bucket{{endpoint="{name}",le="+Inf"}} {counts[endpoint]}')
+                lines.append(f'meal_engine_request_duration_seconds_sum{{endpoint="{name}"}} {self.durations[endpoint]:.6f}')
+                lines.append(f'meal_engine_request_duration_seconds_count{{endpoint="{name}"}} {counts[endpoint]}')
+            lines += ['# HELP meal_engine_db_queries_total SQL statements sent while handling requests, by endpoint.',
+                      '# TYPE meal_engine_db_queries_total counter']
+            lines += [f'meal_engine_db_queries_total{{endpoint="{_label(endpoint)}"}} {count}'
+                      for endpoint, count in sorted(self.queries.items())]
+            lines += ['# HELP meal_engine_request_component_seconds_total Time requests spent in the database, '
+                      'templates, Pint and model calls, by endpoint.',
+                      '# TYPE meal_engine_request_component_seconds_total counter']
+            lines += [f'meal_engine_request_component_seconds_total{{endpoint="{_label(endpoint)}",component="{component}"}} {seconds:.6f}'
+                      for (endpoint, component), seconds in sorted(self.component_seconds.items())]
+            lines += ['# HELP meal_engine_slow_queries_total Statements slower than SLOW_QUERY_MS.',
+                      '# TYPE meal_engine_slow_queries_total counter',
+                      f'meal_engine_slow_queries_total {self.slow_queries}']
+        if ai_cache_stats is not None:
+            lines += ['# HELP meal_engine_ai_calls_total Model calls by task and cache outcome.',
+                      '# TYPE meal_engine_ai_calls_total counter']
+            for key, count in sorted(ai_cache_stats.items()):
+                task, outcome = key.rsplit('.', 1)
+                lines.append(f'meal_engine_ai_calls_total{{task="{_label(task)}",outcome="{outcome}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _server_timing(timings, total):
+    parts = [f'db;dur={timings.seconds["db"] * 1000:.1f};desc="{timings.queries} queries"']
+    parts += [f'{component};dur={timings.seconds[component] * 1000:.1f}' for component in TIMED_COMPONENTS[1:]]
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def init_instrumentation(app):
+    enabled = app.config['INSTRUMENTATION_ENABLED']
+    slow_seconds = app.config['SLOW_QUERY_MS'] / 1000
+    if not enabled and not slow_seconds:
+        return
+    metrics = app.extensions['metrics'] = Metrics()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._instrumentation_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._instrumentation_started
+        timings = _current.get()
+        if timings is not None:
+            timings.queries += 1
+            timings.seconds['db'] += elapsed
+        if slow_seconds and elapsed >= slow_seconds:
+            metrics.slow_query()
+            where = f" during {request.method} {request.path}" if has_request_context() else ""
+            app.logger.warning(f"Slow query ({elapsed * 1000:.1f} ms){where}: {query_shape(statement)[:2000]}")
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    if not enabled:
+        return
+
+    @app.before_request
+    def start_request_timings():
+        g.request_timings_token = _current.set(RequestTimings())
+
+    @app.after_request
+    def record_request_timings(response):
+        timings = _current.get()
+        if timings is not None:
+            total = time.perf_counter() - timings.started
+            response.headers['Server-Timing'] = _server_timing(timings, total)
+            endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+            metrics.observe(endpoint, request.method, response.status_code, timings, total)
+        return response
+
+    @app.teardown_request
+    def clear_request_timings(exc):
+        token = g.pop('request_timings_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    def template_started(sender, template, context, **extra):
+        timings = _current.get()
+        if timings is not None:
+            timings.rendering.append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        timings = _current.get()
+        if timings is not None and timings.rendering:
+            timings.seconds['template'] += time.perf_counter() - timings.rendering.pop()
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        token = current_app.config['METRICS_TOKEN']
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return 'Unauthorized', 401
+        client = current_app.extensions.get('ai_client')
+        body = metrics.render(client.stats_snapshot() if isinstance(client, CachingClient) else None)
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
@@ -0,0 +1,289 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app, flash, g, jsonify, url_for
+from sqlalchemy import func, select, update
+
+from . import db
+from .ai_client import get_model_client
+from .models import AIJob, User
+from .utils import achievement_message, award_achievement
+
+# --- AI Job Queue ---
+# Model calls take 20-60 seconds, far too long to hold a web worker. AI endpoints store an
+# AIJob row and return its id straight away; a thread pool in the same process runs the
+# registered handler for the job's kind in its own app context and records the result (or
+# error) on the row, which GET /api/jobs/<id> reports.
+# Credits are reserved when the job is queued, in the transaction that stores the row, so
+# a user can't queue more jobs than they have credits for. A job spends its reservation in
+# the transaction that stores its successful result, and the rest goes back to the user
+# when it finishes: a failed job, one that never reached the model, and one answered from
+# the response cache (unless AI_CACHE_HITS_CHARGE_CREDITS is set) cost nothing.
+# Achievements are only awarded with a successful result.
+# While a process holds queued or running jobs, a heartbeat thread refreshes their
+# heartbeat_at, as does report_progress(). A job whose heartbeat is older than
+# AI_JOB_STALE_AFTER was lost with its process: the status check fails it and returns its
+# credits, and the job thread, should it still be running, stores nothing over that.
+# With AI_JOBS_INLINE set, jobs run to completion before enqueue_job() returns.
+JOB_INTERRUPTED = 'The request was interrupted. Please try again.'
+_handlers = {}
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_held_jobs = set()
+
+
+class JobError(Exception):
+    """A failure whose message is shown to the user as is. No credit is charged."""
+
+
+class InsufficientCredits(Exception):
+    """The user doesn't have the credits a job needs to be queued."""
+
+
+def job_handler(kind, failure_message, success_message=None, achievement=None, charges_credit=True):
+    """
+    Registers `fn(payload, user, client)` as the handler for jobs of `kind`; it returns
+    the job's JSON result. `failure_message` is shown for unexpected errors and may use
+    {error}; `success_message` is flashed on success, formatted with the result. Jobs of
+    handlers registered with charges_credit=False are queued with the credits they may
+    need, and the handler calls spend_ai_credit() for each one it uses.
+    """
+    def register(fn):
+        _handlers[kind] = (fn, failure_message, success_message, achievement, charges_credit)
+        return fn
+    return register
+
+
+def report_progress(progress):
+    """
+    Stores `progress` on the running job and commits, along with anything else pending in
+    the session. Raises JobError, discarding what's pending, when the job was expired.
+    """
+    running = db.session.execute(
+        update(AIJob).where(AIJob.id == g.job.id, AIJob.status == 'running')
+        .values(progress=[dict(entry) for entry in progress], heartbeat_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if not running:
+        db.session.rollback()
+        raise JobError(JOB_INTERRUPTED)
+    db.session.commit()
+
+
+def used_ai_credit():
+    """Whether the model calls made in this app context cost a credit."""
+    return bool(g.get('ai_model_calls') or (g.get('ai_cache_hits') and current_app.config['AI_CACHE_HITS_CHARGE_CREDITS']))
+
+
+def spend_ai_credit():
+    """Spends one of the running job's reserved credits, in the session's current transaction."""
+    db.session.execute(
+        update(AIJob).where(AIJob.id == g.job.id, AIJob.reserved_credits > 0)
+        .values(reserved_credits=AIJob.reserved_credits - 1),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def release_credits(job_id):
+    """Returns the credits still reserved for a job to its user; the caller commits."""
+    reserved = db.session.scalar(select(AIJob.reserved_credits).where(AIJob.id == job_id))
+    if not reserved:
+        return
+    # Only one of the job thread and a stale-job check can release the same reservation.
+    released = db.session.execute(
+        update(AIJob).where(AIJob.id == job_id, AIJob.reserved_credits == reserved).values(reserved_credits=0),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if released:
+        user_id = db.session.scalar(select(AIJob.user_id).where(AIJob.id == job_id))
+        db.session.execute(update(User).where(User.id == user_id).values(ai_credits=User.ai_credits + reserved))
+
+
+@contextmanager
+def timed_stage(name):
+    """Records how long the enclosed block took, in ms, in the running job's timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.setdefault('job_timings', {})[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _heartbeat(app):
+    """Keeps the heartbeat of the jobs this process holds fresh, for as long as it lives."""
+    while True:
+        time.sleep(max(app.config['AI_JOB_STALE_AFTER'] / 4, 1))
+        with _executor_lock:
+            held = list(_held_jobs)
+        if not held:
+            continue
+        try:
+            with app.app_context():
+                db.session.execute(
+                    update(AIJob).where(AIJob.id.in_(held), AIJob.status.in_(('queued', 'running')))
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.session.commit()
+        except Exception as e:
+            app.logger.warning(f"Could not refresh the heartbeat of AI jobs {held}. Error: {e}")
+
+
+def _get_executor(app):
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Gunicorn forks workers after import; each process needs its own threads.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=app.config['AI_JOB_WORKERS'], thread_name_prefix='ai-job')
+            _executor_pid = os.getpid()
+            _held_jobs.clear()
+            threading.Thread(target=_heartbeat, args=(app,), name='ai-job-heartbeat', daemon=True).start()
+        return _executor
+
+
+def enqueue_job(kind, user, payload, credits=None):
+    """
+    Stores a queued job and reserves its credits: one for handlers that charge a credit,
+    or `credits`. Raises InsufficientCredits, queueing nothing, when the user has fewer.
+    """
+    if credits is None:
+        credits = 1 if _handlers[kind][4] else 0
+    if user.subscription_plan == 'elite':
+        credits = 0
+    if credits:
+        reserved = db.session.execute(
+            update(User).where(User.id == user.id, User.ai_credits >= credits)
+            .values(ai_credits=User.ai_credits - credits)
+        ).rowcount
+        if not reserved:
+            db.session.rollback()
+            raise InsufficientCredits('You have run out of AI credits for this month.')
+    job = AIJob(id=uuid.uuid4().hex, user_id=user.id, kind=kind, payload=payload, status='queued',
+                reserved_credits=credits, heartbeat_at=datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+    app = current_app._get_current_object()
+    if app.config['AI_JOBS_INLINE']:
+        run_job(app, job.id)
+    else:
+        executor = _get_executor(app)
+        with _executor_lock:
+            _held_jobs.add(job.id)
+        executor.submit(run_job, app, job.id)
+    return job
+
+
+def _finish_job(job_id, **values):
+    """Stores the outcome of a running job; False, storing nothing, when it was expired meanwhile."""
+    return bool(db.session.execute(
+        update(AIJob).where(AIJob.id == job_id, AIJob.status == 'running')
+        .values(finished_at=datetime.utcnow(), **values),
+        execution_options={'synchronize_session': False}
+    ).rowcount)
+
+
+def run_job(app, job_id):
+    try:
+        with app.app_context():
+            _run_job(job_id)
+    finally:
+        with _executor_lock:
+            _held_jobs.discard(job_id)
+
+
+def _run_job(job_id):
+    now = datetime.utcnow()
+    # Only one thread can claim a job, and not once the status check has expired it.
+    started = db.session.execute(
+        update(AIJob).where(AIJob.id == job_id, AIJob.status == 'queued')
+        .values(status='running', started_at=now, heartbeat_at=now),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.commit()
+    if not started:
+        return
+    job = db.session.get(AIJob, job_id)
+
+    handler, failure_message, success_message, achievement, charges_credit = _handlers[job.kind]
+    user = db.session.get(User, job.user_id)
+    g.job = job
+    messages = []
+    try:
+        result = handler(job.payload, user, get_model_client())
+        if charges_credit and used_ai_credit():
+            spend_ai_credit()
+        if success_message:
+            messages.append(['success', success_message.format(**result)])
+        outcome = {'status': 'succeeded', 'result': result}
+    except JobError as e:
+        db.session.rollback()
+        outcome = {'status': 'failed', 'error': str(e)}
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"AI job {job_id} ({job.kind}) failed for user {job.user_id}. Error: {e}", exc_info=True)
+        outcome = {'status': 'failed', 'error': failure_message.format(error=e)}
+
+    timings = g.get('job_timings')
+    if not _finish_job(job_id, timings=timings, messages=messages or None, **outcome):
+        # Its credits went back with the expiry, so nothing it did is kept.
+        db.session.rollback()
+        current_app.logger.warning(f"AI job {job_id} ({job.kind}) was expired before it finished; dropping its {outcome['status']} outcome.")
+        return
+    release_credits(job_id)
+    if outcome['status'] == 'succeeded' and achievement:
+        # Commits the result along with the unlock.
+        unlocked = award_achievement(user, achievement, notify=False)
+        if unlocked:
+            db.session.execute(
+                update(AIJob).where(AIJob.id == job_id)
+                .values(messages=messages + [['success', achievement_message(unlocked)]]),
+                execution_options={'synchronize_session': False}
+            )
+    db.session.commit()
+    if timings:
+        current_app.logger.info(f"AI job {job_id} ({job.kind}) {outcome['status']}; stage timings (ms): {timings}")
+
+
+def job_status(job):
+    """
+    The JSON body for GET /api/jobs/<id>. Flashes the job's messages the first time a
+    finished job is reported, so they show on the page the client moves on to.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['AI_JOB_STALE_AFTER'])
+    if job.status in ('queued', 'running') and (job.heartbeat_at or job.created_at) < stale_before:
+        # The process holding it went away before it finished.
+        expired = db.session.execute(
+            update(AIJob).where(
+                AIJob.id == job.id, AIJob.status.in_(('queued', 'running')),
+                func.coalesce(AIJob.heartbeat_at, AIJob.created_at) < stale_before
+            ).values(status='failed', error=JOB_INTERRUPTED, finished_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if expired:
+            release_credits(job.id)
+        db.session.commit()
+        db.session.refresh(job)
+    if job.messages:
+        for category, message in job.messages:
+            flash(message, category)
+        job.messages = None
+        db.session.commit()
+
+    body = {'job_id': job.id, 'kind': job.kind, 'status': job.status}
+    if job.progress is not None:
+        body['progress'] = job.progress
+    if job.status == 'succeeded':
+        body['result'] = job.result
+    elif job.status == 'failed':
+        body['error'] = job.error
+    return body
+
+
+def accepted(job):
+    """The 202 response an AI endpoint returns for a job it queued."""
+    return jsonify({'job_id': job.id, 'status': 'queued', 'status_url': url_for('api.get_job', job_id=job.id)}), 202
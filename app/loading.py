@@ -0,0 +1,26 @@
+from functools import lru_cache
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import HistoricalPlan, HistoricalPlanEntry, MealPlan, PantryItem, Recipe, RecipeIngredient, SavedMeal
+
+# --- Loading Profiles ---
+# Named eager-loading options for the object graphs that pages and JSON views walk. A route
+# whose template reads relationships of the rows it loads applies the matching profile,
+# query.options(*load_profile('plan_with_recipe')), so the page costs the same few queries
+# however many rows it shows. Collections are loaded with selectinload (one more query per
+# collection), single related rows with joinedload. Profiles are built on first use, once
+# the mappers (and their backrefs) are configured.
+LOADING_PROFILES = {
+    'recipe_with_ingredients': lambda: (selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),),
+    'plan_with_recipe': lambda: (joinedload(MealPlan.recipe),),
+    'pantry_with_ingredient': lambda: (joinedload(PantryItem.ingredient, innerjoin=True),),
+    'saved_meal_with_recipes': lambda: (selectinload(SavedMeal.recipes),),
+    'historical_plan_with_entries': lambda: (selectinload(HistoricalPlan.entries).joinedload(HistoricalPlanEntry.recipe),),
+}
+
+
+@lru_cache(maxsize=None)
+def load_profile(*names):
+    """The loader options of the named profiles, to pass to query.options()."""
+    return tuple(option for name in names for option in LOADING_PROFILES[name]())
@@ -1,21 +1,28 @@
 import calendar
 import random
 import uuid
-import io
-import csv
 from datetime import date, timedelta, datetime
 
 from flask import (Blueprint, render_template, request, redirect, url_for,
-                   flash, current_app, jsonify, Response)
+                   flash, current_app, jsonify, Response, stream_with_context)
 from flask_login import login_required, current_user
-from sqlalchemy import desc, func, or_
+from sqlalchemy import desc, func, select
 
 from . import db
 from .models import (Recipe, Ingredient, RecipeIngredient, MealPlan, PantryItem,
                      ShoppingListItem, SavedMeal, HistoricalPlan,
-                     HistoricalPlanEntry, GroceryStore, HouseholdInvitation, User,
+                     GroceryStore, HouseholdInvitation, User,
                      Household, Achievement, UserAchievement)
-from .utils import award_achievement, ureg, sanitize_unit, pint
+from .utils import award_achievement
+from .csv_import import CSVImportError, import_csv
+from .exports import export_csv, export_ndjson, export_zip
+from .meal_plans import entries_from_form, plan_totals, snapshot_week, write_plan
+from .shopping import get_shopping_list
+from .cookable import get_cookable_recipe_ids
+from .search import search_recipes, reindex_recipes
+from .loading import load_profile
+from .dashboard import (get_household_stats, dashboard_context, get_todays_dinner,
+                        invalidate_household_stats)
 
 main = Blueprint('main', __name__)
 
@@ -24,105 +31,10 @@ def index():
     if not current_user.is_authenticated:
         return render_template('landing_page.html')
     
-    recipe_count = Recipe.query.filter_by(household_id=current_user.household_id).count()
-    five_star_count = Recipe.query.filter_by(household_id=current_user.household_id, rating=5).count()
-
-    culinary_title = "Kitchen Apprentice"
-    if recipe_count >= 50 and five_star_count >= 5:
-        culinary_title = "Michelin Star Chef"
-    elif recipe_count >= 30:
-        culinary_title = "Head Chef"
-    elif recipe_count >= 10:
-        culinary_title = "Sous Chef"
-    
-    today = date.today()
-    start_of_week = today - timedelta(days=today.weekday())
-    end_of_week = start_of_week + timedelta(days=6)
-    
-    start_of_month = today.replace(day=1)
-    _, days_in_month = calendar.monthrange(today.year, today.month)
-    end_of_month = today.replace(day=days_in_month)
-
-    all_user_recipes = Recipe.query.filter_by(household_id=current_user.household_id).all()
-    pantry_items_in_stock = PantryItem.query.filter_by(household_id=current_user.household_id).filter(PantryItem.quantity > 0).all()
-    pantry_ingredient_ids = {item.ingredient_id for item in pantry_items_in_stock}
-    recipes_can_make_count = 0
-    for recipe in all_user_recipes:
-        required_ingredient_ids = {ri.ingredient_id for ri in recipe.ingredients}
-        if required_ingredient_ids and required_ingredient_ids.issubset(pantry_ingredient_ids):
-            recipes_can_make_count += 1
-
-    planned_meals_for_shopping = MealPlan.query.filter(
-        MealPlan.household_id == current_user.household_id,
-        MealPlan.recipe_id.isnot(None),
-        MealPlan.meal_date.between(today, end_of_week)
-    ).all()
-    required = {}
-    for meal in planned_meals_for_shopping:
-        if not meal.recipe: continue
-        for item in meal.recipe.ingredients:
-            if not item.quantity or item.quantity == 0: continue
-            required[item.ingredient.id] = required.get(item.ingredient.id, 0) + item.quantity
-    
-    items_to_buy_count = 0
-    for ing_id, needed_qty in required.items():
-        pantry_item = PantryItem.query.filter_by(household_id=current_user.household_id, ingredient_id=ing_id).first()
-        if not pantry_item or pantry_item.quantity < needed_qty:
-            items_to_buy_count += 1
-    
-    manual_shopping_items = ShoppingListItem.query.filter_by(household_id=current_user.household_id).count()
-    items_to_buy_count += manual_shopping_items
-
-    most_made_recipes = db.session.query(
-        Recipe,
-        func.count(MealPlan.recipe_id).label('meal_count')
-    ).join(MealPlan, Recipe.id == MealPlan.recipe_id)\
-    .filter(Recipe.household_id == current_user.household_id)\
-    .group_by(Recipe.id)\
-    .order_by(desc('meal_count'))\
-    .limit(5).all()
-
-    kitchen_stats = {
-        'total_recipes': len(all_user_recipes),
-        'pantry_items': len(pantry_items_in_stock),
-        'favorite_recipes': Recipe.query.filter_by(household_id=current_user.household_id, is_favorite=True).count(),
-        'recipes_can_make': recipes_can_make_count,
-        'items_to_buy': items_to_buy_count
-    }
+    stats = dashboard_context(get_household_stats(current_user.household_id))
+    todays_meal_plan = get_todays_dinner(current_user.household_id)
 
-    todays_meal_plan = MealPlan.query.filter_by(
-        household_id=current_user.household_id,
-        meal_date=today,
-        meal_slot='Dinner'
-    ).first()
-
-    weekly_planned_meals = MealPlan.query.filter(
-        MealPlan.household_id == current_user.household_id,
-        MealPlan.meal_date.between(start_of_week, end_of_week),
-        MealPlan.recipe_id.isnot(None)
-    ).all()
-    
-    monthly_planned_meals = MealPlan.query.filter(
-        MealPlan.household_id == current_user.household_id,
-        MealPlan.meal_date.between(start_of_month, end_of_month),
-        MealPlan.recipe_id.isnot(None)
-    ).all()
-
-    weekly_stats = {'scheduled': {}, 'consumed': {}}
-    monthly_stats = {'scheduled': {}, 'consumed': {}}
-    for nutrient in ['calories', 'protein', 'fat', 'carbs']:
-        weekly_stats['scheduled'][nutrient] = sum(getattr(m.recipe, nutrient) or 0 for m in weekly_planned_meals if m.recipe)
-        weekly_stats['consumed'][nutrient] = sum(getattr(m.recipe, nutrient) or 0 for m in weekly_planned_meals if m.recipe and m.is_eaten)
-        monthly_stats['scheduled'][nutrient] = sum(getattr(m.recipe, nutrient) or 0 for m in monthly_planned_meals if m.recipe)
-        monthly_stats['consumed'][nutrient] = sum(getattr(m.recipe, nutrient) or 0 for m in monthly_planned_meals if m.recipe and m.is_eaten)
-
-    return render_template('index.html',
-                           todays_meal_plan=todays_meal_plan,
-                           weekly_stats=weekly_stats,
-                           monthly_stats=monthly_stats,
-                           kitchen_stats=kitchen_stats,
-                           most_made_recipes=most_made_recipes,
-                           culinary_title=culinary_title)
+    return render_template('index.html', todays_meal_plan=todays_meal_plan, **stats)
 
 @main.route('/recipes')
 @login_required
@@ -133,7 +45,15 @@ def list_recipes():
     sort_order = request.args.get('sort', 'asc')
     
     base_query = Recipe.query.filter_by(household_id=current_user.household_id)
-    
+
+    if pantry_filter_active:
+        cookable_ids = get_cookable_recipe_ids(current_user.household_id)
+        base_query = base_query.filter(Recipe.id.in_(cookable_ids))
+    elif favorites_filter_active:
+        base_query = base_query.filter_by(is_favorite=True)
+    elif query:
+        base_query = search_recipes(base_query, query)
+
     if sort_order == 'desc':
         base_query = base_query.order_by(desc(Recipe.name))
     elif sort_order == 'rating':
@@ -141,18 +61,7 @@ def list_recipes():
     else:
         base_query = base_query.order_by(Recipe.name)
 
-    if pantry_filter_active:
-        pantry_items_in_stock = PantryItem.query.filter_by(household_id=current_user.household_id).filter(PantryItem.quantity > 0).all()
-        pantry_ingredient_ids = {item.ingredient_id for item in pantry_items_in_stock}
-        all_user_recipes = base_query.all()
-        recipes = [r for r in all_user_recipes if r.ingredients and {ri.ingredient_id for ri in r.ingredients}.issubset(pantry_ingredient_ids)]
-    elif favorites_filter_active:
-        recipes = base_query.filter_by(is_favorite=True).all()
-    elif query:
-        search_term = f"%{query}%"
-        recipes = base_query.filter(or_(Recipe.name.ilike(search_term), Recipe.instructions.ilike(search_term))).all()
-    else:
-        recipes = base_query.all()
+    recipes = base_query.all()
         
     return render_template('recipes.html', page_class='page-recipes', recipes=recipes, query=query, pantry_filter_active=pantry_filter_active, favorites_filter_active=favorites_filter_active, sort_order=sort_order)
 
@@ -192,7 +101,7 @@ def pantry():
         db.session.commit()
         return redirect(url_for('main.pantry'))
 
-    pantry_items = PantryItem.query.join(Ingredient).filter(
+    pantry_items = PantryItem.query.join(Ingredient).options(*load_profile('pantry_with_ingredient')).filter(
         PantryItem.household_id == current_user.household_id
     ).order_by(Ingredient.category, Ingredient.name).all()
     
@@ -247,6 +156,9 @@ def delete_ingredient(ingredient_id):
 
     try:
         household_recipe_ids = [recipe.id for recipe in current_user.household.recipes]
+        affected_recipe_ids = db.session.scalars(
+            select(RecipeIngredient.recipe_id).where(RecipeIngredient.ingredient_id == ingredient_id)
+        ).all()
         
         RecipeIngredient.query.filter(
             RecipeIngredient.ingredient_id == ingredient_id,
@@ -257,8 +169,11 @@ def delete_ingredient(ingredient_id):
             ingredient_id=ingredient_id,
             household_id=current_user.household_id
         ).delete(synchronize_session=False)
+        invalidate_household_stats(current_user.household_id, recipes_changed=True)
 
         db.session.delete(ingredient)
+        db.session.flush()
+        reindex_recipes(affected_recipe_ids)
         
         db.session.commit()
         flash(f'Successfully deleted "{ingredient.name}" and all its associations in your household.', 'success')
@@ -283,7 +198,7 @@ def add_recipe():
 @main.route('/recipe/<int:recipe_id>')
 @login_required
 def view_recipe(recipe_id):
-    recipe = Recipe.query.filter_by(id=recipe_id, household_id=current_user.household_id).first_or_404()
+    recipe = Recipe.query.options(*load_profile('recipe_with_ingredients')).filter_by(id=recipe_id, household_id=current_user.household_id).first_or_404()
     return render_template('view_recipe.html', recipe=recipe)
 
 @main.route('/recipe/<int:recipe_id>/cook')
@@ -296,7 +211,7 @@ def cook_recipe(recipe_id):
 @main.route('/recipe/<int:recipe_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_recipe(recipe_id):
-    recipe = Recipe.query.filter_by(id=recipe_id, household_id=current_user.household_id).first_or_404()
+    recipe = Recipe.query.options(*load_profile('recipe_with_ingredients')).filter_by(id=recipe_id, household_id=current_user.household_id).first_or_404()
     ingredients = Ingredient.query.order_by(Ingredient.name).all()
     if request.method == 'POST':
         recipe.name = request.form.get('name')
@@ -310,6 +225,8 @@ def edit_recipe(recipe_id):
         recipe.fat = float(request.form.get('fat')) if request.form.get('fat') else None
         recipe.carbs = float(request.form.get('carbs')) if request.form.get('carbs') else None
         RecipeIngredient.query.filter_by(recipe_id=recipe.id).delete()
+        invalidate_household_stats(current_user.household_id, recipes_changed=True)
+        reindex_recipes([recipe.id])
         for i in range(len(request.form.getlist('ingredient[]'))):
             ing_id = request.form.getlist('ingredient[]')[i]
             qty = request.form.getlist('quantity[]')[i]
@@ -339,7 +256,7 @@ def saved_meals():
             db.session.commit()
             flash(f'Saved Meal "{name}" created. Now add recipes to it.', 'success')
             return redirect(url_for('main.edit_saved_meal', saved_meal_id=new_saved_meal.id))
-    all_saved_meals = SavedMeal.query.filter_by(household_id=current_user.household_id).order_by(SavedMeal.name).all()
+    all_saved_meals = SavedMeal.query.options(*load_profile('saved_meal_with_recipes')).filter_by(household_id=current_user.household_id).order_by(SavedMeal.name).all()
     return render_template('saved_meals.html', saved_meals=all_saved_meals)
 
 @main.route('/saved-meal/<int:saved_meal_id>/edit', methods=['GET', 'POST'])
@@ -395,16 +312,17 @@ def monthly_plan():
     month_days = cal.monthdatescalendar(year, month)
     first_day, last_day = month_days[0][0], month_days[-1][-1]
     
-    all_meals_in_view = MealPlan.query.filter(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(first_day, last_day)).all()
-
-    daily_summaries = {day.strftime('%Y-%m-%d'): {'calories': 0, 'meals': []} for week in month_days for day in week}
-    for meal in all_meals_in_view:
-        day_str = meal.meal_date.strftime('%Y-%m-%d')
-        meal_name = meal.recipe.name if meal.recipe else meal.custom_item_name
+    totals = plan_totals(current_user.household_id, first_day, last_day)
+    daily_summaries = {day.isoformat(): {'calories': totals['days'][day]['scheduled']['calories'], 'meals': []}
+                       for week in month_days for day in week}
+    for meal_date, meal_slot, meal_name in db.session.execute(
+        select(MealPlan.meal_date, MealPlan.meal_slot, func.coalesce(Recipe.name, MealPlan.custom_item_name))
+        .outerjoin(Recipe, Recipe.id == MealPlan.recipe_id)
+        .where(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(first_day, last_day))
+        .order_by(MealPlan.meal_date, MealPlan.id)
+    ):
         if meal_name:
-            daily_summaries[day_str]['meals'].append(f"{meal.meal_slot}: {meal_name}")
-            if meal.recipe and meal.recipe.calories:
-                daily_summaries[day_str]['calories'] += meal.recipe.calories
+            daily_summaries[meal_date.isoformat()]['meals'].append(f"{meal_slot}: {meal_name}")
     
     current_month_date = date(year, month, 1)
     nav = {
@@ -413,24 +331,8 @@ def monthly_plan():
         'next': current_month_date + timedelta(days=32)
     }
     
-    start_of_month = date(year, month, 1)
-    end_of_month = date(year, month, calendar.monthrange(year, month)[1])
-    all_meals_this_month = [m for m in all_meals_in_view if start_of_month <= m.meal_date <= end_of_month and m.recipe]
-    
-    monthly_stats = {'scheduled': {}, 'consumed': {}}
-    for nutrient in ['calories', 'protein', 'fat', 'carbs']:
-        monthly_stats['scheduled'][nutrient] = sum(getattr(m.recipe, nutrient) or 0 for m in all_meals_this_month)
-        monthly_stats['consumed'][nutrient] = sum(getattr(m.recipe, nutrient) or 0 for m in all_meals_this_month if m.is_eaten)
-        
-    weekly_summaries = []
-    for week in month_days:
-        week_stats = {'scheduled': {'calories': 0}, 'consumed': {'calories': 0}}
-        for day in week:
-            for meal in all_meals_in_view:
-                if meal.meal_date == day and meal.recipe and meal.recipe.calories:
-                    week_stats['scheduled']['calories'] += meal.recipe.calories
-                    if meal.is_eaten: week_stats['consumed']['calories'] += meal.recipe.calories
-        weekly_summaries.append(week_stats)
+    monthly_stats = totals['months'][current_month_date]
+    weekly_summaries = [totals['weeks'][week[0]] for week in month_days]
     
     return render_template('monthly_plan.html', page_class='page-monthly-plan', calendar_data=month_days, daily_summaries=daily_summaries, nav=nav, monthly_stats=monthly_stats, weekly_summaries=weekly_summaries)
 
@@ -541,23 +443,10 @@ def meal_plan():
     if request.method == 'POST':
         week_start_date = datetime.strptime(request.form.get('week_start_date'), '%Y-%m-%d').date()
         end_of_week = week_start_date + timedelta(days=6)
-        MealPlan.query.filter(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(week_start_date, end_of_week)).delete(synchronize_session=False)
-
-        for i in range(7):
-            current_day = week_start_date + timedelta(days=i)
-            day_str = current_day.strftime('%Y-%m-%d')
-            for slot in ['Breakfast', 'Lunch', 'Dinner', 'Snack']:
-                for recipe_id in request.form.getlist(f'day-{day_str}-{slot}-recipe[]'):
-                    if recipe_id.isdigit(): db.session.add(MealPlan(meal_date=current_day, recipe_id=int(recipe_id), household_id=current_user.household_id, meal_slot=slot))
-                for item_name in request.form.getlist(f'day-{day_str}-{slot}-custom[]'):
-                    if item_name: db.session.add(MealPlan(meal_date=current_day, custom_item_name=item_name, household_id=current_user.household_id, meal_slot=slot))
-        
+        write_plan(current_user.household_id, week_start_date, end_of_week, entries_from_form(request.form, week_start_date))
+
         if historical_plan_name := request.form.get('historical_plan_name'):
-            new_hist_plan = HistoricalPlan(name=historical_plan_name, household_id=current_user.household_id)
-            db.session.add(new_hist_plan)
-            db.session.flush()
-            for entry in MealPlan.query.filter(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(week_start_date, end_of_week)).all():
-                db.session.add(HistoricalPlanEntry(historical_plan_id=new_hist_plan.id, day_of_week=entry.meal_date.weekday(), meal_slot=entry.meal_slot, recipe_id=entry.recipe_id, custom_item_name=entry.custom_item_name))
+            snapshot_week(current_user.household_id, historical_plan_name, week_start_date)
             flash(f'Meal plan saved and also stored as "{historical_plan_name}"!', 'success')
             award_achievement(current_user, 'Weekly Planner')
         else:
@@ -568,7 +457,7 @@ def meal_plan():
 
     end_of_week = start_of_week + timedelta(days=6)
     days_of_week = [start_of_week + timedelta(days=i) for i in range(7)]
-    all_meals = MealPlan.query.filter(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(start_of_week, end_of_week)).all()
+    all_meals = MealPlan.query.options(*load_profile('plan_with_recipe')).filter(MealPlan.household_id == current_user.household_id, MealPlan.meal_date.between(start_of_week, end_of_week)).all()
     planned_meals = {day.strftime('%Y-%m-%d'): {slot: [] for slot in ['Breakfast', 'Lunch', 'Dinner', 'Snack']} for day in days_of_week}
     for meal in all_meals:
         if meal.meal_date.strftime('%Y-%m-%d') in planned_meals:
@@ -588,18 +477,10 @@ def meal_plan():
     
     historical_plans = HistoricalPlan.query.filter_by(household_id=current_user.household_id).order_by(HistoricalPlan.name).all()
     
-    daily_stats = {day.strftime('%Y-%m-%d'): {'scheduled': {'calories': 0}, 'consumed': {'calories': 0}} for day in days_of_week}
-    weekly_stats = {'scheduled': {'calories': 0}, 'consumed': {'calories': 0}}
-    for meal in all_meals:
-        if meal.recipe and meal.recipe.calories:
-            day_str = meal.meal_date.strftime('%Y-%m-%d')
-            calories = meal.recipe.calories
-            if day_str in daily_stats:
-                daily_stats[day_str]['scheduled']['calories'] += calories
-                weekly_stats['scheduled']['calories'] += calories
-                if meal.is_eaten:
-                    daily_stats[day_str]['consumed']['calories'] += calories
-                    weekly_stats['consumed']['calories'] += calories
+    day_totals = plan_totals(current_user.household_id, start_of_week, end_of_week)['days']
+    daily_stats = {day.strftime('%Y-%m-%d'): day_totals[day] for day in days_of_week}
+    weekly_stats = {kind: {'calories': sum(totals[kind]['calories'] for totals in day_totals.values())}
+                    for kind in ('scheduled', 'consumed')}
 
     return render_template('meal_plan.html',
                            page_class='page-meal-plan',
@@ -633,69 +514,42 @@ def shopping_list():
         db.session.commit()
         return redirect(url_for('main.shopping_list'))
 
-    end_date = date.today() + timedelta(days=6)
-    planned_meals = MealPlan.query.filter(MealPlan.household_id == current_user.household_id, MealPlan.recipe_id.isnot(None), MealPlan.meal_date.between(date.today(), end_date)).all()
-    required = {}
-    for meal in planned_meals:
-        for item in meal.recipe.ingredients:
-            if not item.quantity: continue
-            key = (item.ingredient.id, item.ingredient.name, item.ingredient.category)
-            required.setdefault(key, {'quantity': 0, 'units': set()})['quantity'] += item.quantity
-            required[key]['units'].add(item.unit)
-
-    pantry_stock = {item.ingredient_id: item for item in PantryItem.query.filter_by(household_id=current_user.household_id).all()}
-    to_buy, in_pantry = {}, {}
-    for (ing_id, name, cat), details in required.items():
-        needed_qty_val = details['quantity']
-        recipe_unit_str = sanitize_unit(next(iter(details['units'])) if details['units'] else '')
-        buy_details = {'quantity': needed_qty_val, 'units': details['units'], 'note': "Not in pantry", 'category': cat or 'Other'}
-        should_buy = True
-        if ing_id in pantry_stock:
-            pantry_item = pantry_stock[ing_id]
-            in_pantry[name] = pantry_item
-            try:
-                required_qty = needed_qty_val * ureg(recipe_unit_str)
-                pantry_qty = pantry_item.quantity * ureg(sanitize_unit(pantry_item.unit))
-                if required_qty.is_compatible_with(pantry_qty):
-                    if pantry_qty.to(required_qty.units) >= required_qty:
-                        should_buy = False
-                    else:
-                        amount_to_buy = required_qty - pantry_qty.to(required_qty.units)
-                        buy_details = {'quantity': amount_to_buy.magnitude, 'units': {str(amount_to_buy.units)}, 'note': None, 'category': cat or 'Other'}
-            except (pint.errors.DimensionalityError, pint.errors.UndefinedUnitError):
-                buy_details['note'] = f"Unit Mismatch! Check pantry: you have {pantry_item.quantity} {pantry_item.unit or ''}"
-        if should_buy: to_buy[name] = buy_details
-    
-    grouped_list = {}
-    for name, details in to_buy.items():
-        grouped_list.setdefault(details.get('category', 'Other'), {})[name] = details
-    for item in ShoppingListItem.query.filter_by(household_id=current_user.household_id).all():
-        grouped_list.setdefault(item.category, {})[item.name] = {'quantity': None, 'units': [], 'note': 'Manually added', 'manual_id': item.id}
-    
+    shopping = get_shopping_list(current_user.household_id)
     stores = GroceryStore.query.filter_by(household_id=current_user.household_id).order_by(GroceryStore.name).all()
-    return render_template('shopping_list.html', page_class='page-shopping-list', grouped_list=grouped_list, ingredients_in_pantry=in_pantry, stores=stores)
+    return render_template('shopping_list.html', page_class='page-shopping-list', grouped_list=shopping['grouped_list'], ingredients_in_pantry=shopping['ingredients_in_pantry'], stores=stores)
+
+@main.route('/export/<any(recipes, recipe_ingredients, meal_plans, pantry, saved_meals, historical_plans):table>')
+@login_required
+def export_table(table):
+    if request.args.get('format') == 'ndjson':
+        chunks, mimetype, filename = export_ndjson(current_user.household_id, table), 'application/x-ndjson', f'{table}.ndjson'
+    else:
+        chunks, mimetype, filename = export_csv(table, current_user.household_id), 'text/csv', f'{table}.csv'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={"Content-Disposition": f"attachment;filename={filename}"})
 
-@main.route('/export/recipes')
+@main.route('/export/household.<any(zip, ndjson):fmt>')
 @login_required
-def export_recipes():
-    recipes = Recipe.query.filter_by(household_id=current_user.household_id).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['id', 'name', 'instructions', 'servings', 'prep_time', 'cook_time', 'meal_type', 'is_favorite', 'rating', 'author_email'])
-    for r in recipes:
-        writer.writerow([r.id, r.name, r.instructions, r.servings, r.prep_time, r.cook_time, r.meal_type, r.is_favorite, r.rating, r.author.email])
-    output.seek(0)
-    return Response(output, mimetype="text/csv", headers={"Content-Disposition":"attachment;filename=recipes.csv"})
-
-@main.route('/export/recipe_ingredients')
+def export_household(fmt):
+    if fmt == 'zip':
+        chunks, mimetype = export_zip(current_user.household_id), 'application/zip'
+    else:
+        chunks, mimetype = export_ndjson(current_user.household_id), 'application/x-ndjson'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={"Content-Disposition": f"attachment;filename=household.{fmt}"})
+
+@main.route('/upload', methods=['GET', 'POST'])
 @login_required
-def export_recipe_ingredients():
-    recipe_ids = [r.id for r in current_user.household.recipes]
-    recipe_ingredients = RecipeIngredient.query.filter(RecipeIngredient.recipe_id.in_(recipe_ids)).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['recipe_id', 'ingredient_name', 'quantity', 'unit'])
-    for ri in recipe_ingredients:
-        writer.writerow([ri.recipe_id, ri.ingredient.name, ri.quantity, ri.unit])
-    output.seek(0)
-    return Response(output, mimetype="text/csv", headers={"Content-Disposition":"attachment;filename=recipe_ingredients.csv"})
\ No newline at end of file
+def upload_csv():
+    report = None
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Please choose a CSV file to upload.', 'warning')
+            return redirect(url_for('main.upload_csv'))
+        try:
+            # Read straight from the upload stream, which Werkzeug spools to disk for large files.
+            report = import_csv(file.stream, request.form.get('upload_type'), current_user)
+        except CSVImportError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('main.upload_csv'))
+        flash(f'{report.summary()}.', 'warning' if report.rejected else 'success')
+    return render_template('upload.html', report=report)
\ No newline at end of file
@@ -0,0 +1,183 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import case, delete, insert, literal, select
+
+from . import db
+from .dashboard import STATS_SOURCE_PARTS, invalidate_household_stats
+from .models import HistoricalPlan, HistoricalPlanEntry, MealPlan, Recipe
+from .nutrition import NUTRIENTS, RollupDelta, recipe_macros, rollup_rows
+
+MEAL_SLOTS = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+
+# --- Meal Plan Writer ---
+# Saving a stretch of the plan only writes what changed. The stretch's rows are read once
+# and matched to the submitted entries cell by cell (date and slot). An entry matching an
+# existing row keeps that row, is_eaten flag and all; rows matching no entry are deleted
+# with one DELETE ... IN, and entries matching no row are inserted with one multi-row
+# INSERT. Saving an unchanged week writes nothing, a save costs the same few statements
+# however many meals it changes, and two members saving different days don't touch each
+# other's rows.
+
+
+def plan_entry(meal_date, meal_slot, recipe_id=None, custom_item_name=None):
+    return {'meal_date': meal_date, 'meal_slot': meal_slot, 'recipe_id': recipe_id, 'custom_item_name': custom_item_name}
+
+
+def entries_from_form(form, week_start):
+    """The entries of the meal plan form's day-<date>-<slot>-recipe[] and -custom[] fields."""
+    entries = []
+    for i in range(7):
+        current_day = week_start + timedelta(days=i)
+        day_str = current_day.strftime('%Y-%m-%d')
+        for slot in MEAL_SLOTS:
+            for recipe_id in form.getlist(f'day-{day_str}-{slot}-recipe[]'):
+                if recipe_id.isdigit():
+                    entries.append(plan_entry(current_day, slot, recipe_id=int(recipe_id)))
+            for item_name in form.getlist(f'day-{day_str}-{slot}-custom[]'):
+                if item_name:
+                    entries.append(plan_entry(current_day, slot, custom_item_name=item_name))
+    return entries
+
+
+def _as_recipe_id(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+def household_recipe_ids(household_id, recipe_ids):
+    """The ids among `recipe_ids` that are recipes of the household, checked in one query."""
+    recipe_ids = {recipe_id for recipe_id in map(_as_recipe_id, recipe_ids) if recipe_id is not None}
+    if not recipe_ids:
+        return set()
+    return set(db.session.scalars(
+        select(Recipe.id).where(Recipe.household_id == household_id, Recipe.id.in_(recipe_ids))
+    ))
+
+
+def entries_from_ai_plan(household_id, plan_data, dates):
+    """
+    The entries of a generated plan ({day key: {slot: {'id', 'name'}}}), with `dates` mapping
+    its day keys to dates; other keys are ignored. A meal whose id isn't one of the
+    household's recipes (the model's takeout nights and leftovers have none) is kept as a
+    custom item under its name.
+    """
+    meals = [(dates[day], slot, meal) for day, slots in plan_data.items() if day in dates and isinstance(slots, dict)
+             for slot, meal in slots.items()
+             if isinstance(meal, dict) and meal.get('name') and meal['name'] != 'Unplanned']
+    valid_ids = household_recipe_ids(household_id, (meal.get('id') for _, _, meal in meals))
+    entries = []
+    for meal_date, slot, meal in meals:
+        recipe_id = _as_recipe_id(meal.get('id'))
+        if recipe_id in valid_ids:
+            entries.append(plan_entry(meal_date, slot, recipe_id=recipe_id))
+        else:
+            entries.append(plan_entry(meal_date, slot, custom_item_name=str(meal['name'])[:150]))
+    return entries
+
+
+def write_plan(household_id, start, end, entries):
+    """
+    Makes the household's plan from `start` to `end` inclusive hold exactly `entries`
+    (see plan_entry). Returns the number of rows (inserted, deleted); the caller commits.
+    """
+    existing = defaultdict(list)
+    for row in db.session.execute(
+        select(MealPlan.id, MealPlan.meal_date, MealPlan.meal_slot, MealPlan.recipe_id, MealPlan.custom_item_name,
+               MealPlan.is_eaten, *(getattr(Recipe, nutrient) for nutrient in NUTRIENTS))
+        .outerjoin(Recipe, Recipe.id == MealPlan.recipe_id)
+        .where(MealPlan.household_id == household_id, MealPlan.meal_date.between(start, end))
+        .order_by(MealPlan.id)
+    ):
+        existing[(row.meal_date, row.meal_slot)].append(row)
+    wanted = defaultdict(list)
+    for entry in entries:
+        wanted[(entry['meal_date'], entry['meal_slot'])].append(entry)
+
+    inserts, deletes = [], []
+    rollup = RollupDelta()
+    for cell in dict.fromkeys([*wanted, *existing]):
+        rows = list(existing.get(cell, ()))
+        for entry in wanted.get(cell, ()):
+            match = next((row for row in rows if (row.recipe_id, row.custom_item_name) == (entry['recipe_id'], entry['custom_item_name'])), None)
+            if match:
+                rows.remove(match)
+            else:
+                inserts.append({**entry, 'household_id': household_id, 'is_eaten': False})
+        for row in rows:
+            deletes.append(row.id)
+            rollup.add_meal(household_id, *cell, row.is_eaten, tuple(getattr(row, nutrient) for nutrient in NUTRIENTS), sign=-1)
+
+    if inserts:
+        # A Core insert sends every row in one executemany; the ORM bulk insert would split
+        # the rows into runs by which of recipe_id and custom_item_name is None.
+        db.session.execute(insert(MealPlan.__table__), inserts)
+    if deletes:
+        db.session.execute(delete(MealPlan).where(MealPlan.id.in_(deletes)), execution_options={'synchronize_session': False})
+    if inserts or deletes:
+        # Bulk statements bypass the flush hooks that mark the stats stale and keep the rollup.
+        macros = recipe_macros(entry['recipe_id'] for entry in inserts)
+        for entry in inserts:
+            rollup.add_meal(household_id, entry['meal_date'], entry['meal_slot'], False, macros.get(entry['recipe_id']))
+        rollup.apply()
+        invalidate_household_stats(household_id, parts=STATS_SOURCE_PARTS[MealPlan])
+    return len(inserts), len(deletes)
+
+
+def snapshot_week(household_id, name, week_start):
+    """Stores the week starting `week_start` as a HistoricalPlan, copying its meals with one INSERT ... SELECT."""
+    plan = HistoricalPlan(name=name, household_id=household_id)
+    db.session.add(plan)
+    db.session.flush()
+    days = [week_start + timedelta(days=i) for i in range(7)]
+    day_of_week = case({day: day.weekday() for day in days}, value=MealPlan.meal_date)
+    db.session.execute(insert(HistoricalPlanEntry).from_select(
+        ['historical_plan_id', 'day_of_week', 'meal_slot', 'recipe_id', 'custom_item_name'],
+        select(literal(plan.id), day_of_week, MealPlan.meal_slot, MealPlan.recipe_id, MealPlan.custom_item_name)
+        .where(MealPlan.household_id == household_id, MealPlan.meal_date.between(days[0], days[-1]))
+        .order_by(MealPlan.meal_date, MealPlan.id)
+    ))
+    return plan
+
+
+# --- Calendar Totals ---
+# Macro totals of the plan per day are read from the nutrition rollup, one row per day of
+# the range; weeks (keyed by their Monday) and months (keyed by their first day) are
+# rolled up from the days in one pass. "scheduled" counts every planned recipe, "consumed"
+# the ones marked eaten; custom items count as meals but carry no macros.
+
+
+def _empty_totals():
+    return {'meals': 0, 'eaten_meals': 0, 'scheduled': dict.fromkeys(NUTRIENTS, 0), 'consumed': dict.fromkeys(NUTRIENTS, 0)}
+
+
+def _add_totals(target, source):
+    target['meals'] += source['meals']
+    target['eaten_meals'] += source['eaten_meals']
+    for kind in ('scheduled', 'consumed'):
+        for nutrient in NUTRIENTS:
+            target[kind][nutrient] += source[kind][nutrient]
+
+
+def plan_totals(household_id, start, end):
+    """
+    Macro totals of the household's plan from `start` to `end` inclusive, as
+    {'days': {date: totals}, 'weeks': {monday: totals}, 'months': {first of month: totals}}
+    where totals is {'meals': count, 'eaten_meals': count, 'scheduled': {nutrient: sum},
+    'consumed': {...}}. Every day, week and month touching the range has an entry; weeks
+    and months that stick out of it only count the days inside.
+    """
+    days = {start + timedelta(days=i): _empty_totals() for i in range((end - start).days + 1)}
+    for day, meals, eaten_meals, *sums in rollup_rows(household_id, start, end):
+        days[day].update(meals=meals, eaten_meals=eaten_meals,
+                         scheduled=dict(zip(NUTRIENTS, sums[:len(NUTRIENTS)])),
+                         consumed=dict(zip(NUTRIENTS, sums[len(NUTRIENTS):])))
+
+    weeks, months = {}, {}
+    for day, totals in days.items():
+        _add_totals(weeks.setdefault(day - timedelta(days=day.weekday()), _empty_totals()), totals)
+        _add_totals(months.setdefault(day.replace(day=1), _empty_totals()), totals)
+    return {'days': days, 'weeks': weeks, 'months': months}
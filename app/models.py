@@ -14,10 +14,29 @@ class Household(db.Model):
     historical_plans = db.relationship('HistoricalPlan', backref='household', lazy=True, cascade="all, delete-orphan")
     grocery_stores = db.relationship('GroceryStore', backref='household', lazy=True, cascade="all, delete-orphan")
     shopping_list_items = db.relationship('ShoppingListItem', backref='household', lazy=True, cascade="all, delete-orphan")
+    stats = db.relationship('HouseholdStats', backref='household', uselist=False, cascade="all, delete-orphan")
+    nutrition_rollups = db.relationship('NutritionRollup', backref='household', lazy=True, cascade="all, delete-orphan")
+
+class HouseholdStats(db.Model):
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), primary_key=True)
+    is_stale = db.Column(db.Boolean, nullable=False, default=True)
+    stale_parts = db.Column(db.Integer, nullable=False, default=0, server_default='31')
+    version = db.Column(db.Integer, nullable=False, default=0)
+    recipe_index_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    computed_on = db.Column(db.Date, nullable=True)
+    total_recipes = db.Column(db.Integer, nullable=False, default=0)
+    five_star_recipes = db.Column(db.Integer, nullable=False, default=0)
+    favorite_recipes = db.Column(db.Integer, nullable=False, default=0)
+    pantry_items = db.Column(db.Integer, nullable=False, default=0)
+    recipes_can_make = db.Column(db.Integer, nullable=False, default=0)
+    items_to_buy = db.Column(db.Integer, nullable=False, default=0)
+    weekly_macros = db.Column(db.JSON, nullable=True)
+    monthly_macros = db.Column(db.JSON, nullable=True)
+    most_made_recipes = db.Column(db.JSON, nullable=True)
 
 class HouseholdInvitation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False)
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False, index=True)
     token = db.Column(db.String(100), unique=True, nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
 
@@ -25,7 +44,7 @@ class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(150), unique=True, nullable=False)
     password = db.Column(db.String(150), nullable=False)
-    household_id = db.Column(db.Integer, db.ForeignKey('household.id'))
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), index=True)
     household = db.relationship('Household', backref='members')
     recipes = db.relationship('Recipe', backref='author', lazy=True)
     
@@ -40,13 +59,13 @@ class User(db.Model, UserMixin):
 
 class GroceryStore(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False)
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     search_url = db.Column(db.String(500), nullable=False)
 
 class ShoppingListItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False)
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False, index=True)
     name = db.Column(db.String(150), nullable=False)
     category = db.Column(db.String(100), nullable=False, default='Other')
     is_checked = db.Column(db.Boolean, default=False)
@@ -69,6 +88,8 @@ class Recipe(db.Model):
     fat = db.Column(db.Float, nullable=True)
     carbs = db.Column(db.Float, nullable=True)
 
+    __table_args__ = (db.Index('ix_recipe_household_id_name', 'household_id', 'name'),)
+
 class Ingredient(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
@@ -80,6 +101,14 @@ class Ingredient(db.Model):
     consumable_unit = db.Column(db.String(50), nullable=True)
     container_prompt = db.Column(db.String(255), nullable=True)
 
+    __table_args__ = (db.Index('ix_ingredient_lower_name', db.func.lower(name)),)
+
+class IngredientCatalogVersion(db.Model):
+    # A single row, bumped whenever ingredients are deleted or renamed; worker processes
+    # compare it with the version their cached name -> id mappings were read at.
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class RecipeIngredient(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=False)
@@ -87,6 +116,11 @@ class RecipeIngredient(db.Model):
     quantity = db.Column(db.Float, nullable=False, default=0)
     unit = db.Column(db.String(50), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_recipe_ingredient_recipe_id_ingredient_id', 'recipe_id', 'ingredient_id'),
+        db.Index('ix_recipe_ingredient_ingredient_id', 'ingredient_id'),
+    )
+
 class MealPlan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False)
@@ -97,6 +131,26 @@ class MealPlan(db.Model):
     meal_slot = db.Column(db.String(50), nullable=False, default='Dinner')
     is_eaten = db.Column(db.Boolean, default=False, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_meal_plan_household_id_meal_date_meal_slot', 'household_id', 'meal_date', 'meal_slot'),
+        db.Index('ix_meal_plan_recipe_id', 'recipe_id'),
+    )
+
+class NutritionRollup(db.Model):
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    meal_slot = db.Column(db.String(50), primary_key=True)
+    meals = db.Column(db.Integer, nullable=False, default=0)
+    eaten_meals = db.Column(db.Integer, nullable=False, default=0)
+    scheduled_calories = db.Column(db.Float, nullable=False, default=0)
+    scheduled_protein = db.Column(db.Float, nullable=False, default=0)
+    scheduled_fat = db.Column(db.Float, nullable=False, default=0)
+    scheduled_carbs = db.Column(db.Float, nullable=False, default=0)
+    consumed_calories = db.Column(db.Float, nullable=False, default=0)
+    consumed_protein = db.Column(db.Float, nullable=False, default=0)
+    consumed_fat = db.Column(db.Float, nullable=False, default=0)
+    consumed_carbs = db.Column(db.Float, nullable=False, default=0)
+
 class PantryItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False)
@@ -105,26 +159,28 @@ class PantryItem(db.Model):
     unit = db.Column(db.String(50), nullable=True)
     date_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (UniqueConstraint('household_id', 'ingredient_id', name='_household_ingredient_uc'),)
+
 class SavedMeal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False)
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False, index=True)
     recipes = db.relationship('Recipe', secondary='saved_meal_recipe_link')
 
 class SavedMealRecipeLink(db.Model):
     __tablename__ = 'saved_meal_recipe_link'
     saved_meal_id = db.Column(db.Integer, db.ForeignKey('saved_meal.id'), primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True, index=True)
 
 class HistoricalPlan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False)
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id'), nullable=False, index=True)
     entries = db.relationship('HistoricalPlanEntry', backref='historical_plan', lazy=True, cascade="all, delete-orphan")
 
 class HistoricalPlanEntry(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    historical_plan_id = db.Column(db.Integer, db.ForeignKey('historical_plan.id'), nullable=False)
+    historical_plan_id = db.Column(db.Integer, db.ForeignKey('historical_plan.id'), nullable=False, index=True)
     day_of_week = db.Column(db.Integer, nullable=False)
     meal_slot = db.Column(db.String(50), nullable=False)
     recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=True)
@@ -146,4 +202,36 @@ class UserAchievement(db.Model):
     user = db.relationship('User', backref=db.backref('achievements', cascade="all, delete-orphan"))
     achievement = db.relationship('Achievement')
     
-    __table_args__ = (UniqueConstraint('user_id', 'achievement_id', name='_user_achievement_uc'),)
\ No newline at end of file
+    __table_args__ = (UniqueConstraint('user_id', 'achievement_id', name='_user_achievement_uc'),)
+
+class AIJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    payload = db.Column(db.JSON, nullable=False)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    messages = db.Column(db.JSON, nullable=True)
+    timings = db.Column(db.JSON, nullable=True)
+    progress = db.Column(db.JSON, nullable=True)
+    # Credits taken from the user when the job was queued and not yet spent or given back.
+    reserved_credits = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    # Refreshed while the process holding a queued or running job is alive, and on progress.
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User', backref=db.backref('ai_jobs', lazy=True, cascade="all, delete-orphan"))
+
+    __table_args__ = (db.Index('ix_ai_job_user_id_created_at', 'user_id', 'created_at'),)
+
+class AIResponseCache(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    model = db.Column(db.String(100), nullable=False)
+    task = db.Column(db.String(50), nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
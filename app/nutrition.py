@@ -0,0 +1,181 @@
+from collections import defaultdict
+
+from sqlalchemy import case, delete, event, func, insert, inspect, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Household, MealPlan, NutritionRollup, Recipe
+
+NUTRIENTS = ('calories', 'protein', 'fat', 'carbs')
+ROLLUP_COLUMNS = ('meals', 'eaten_meals', *(f'scheduled_{nutrient}' for nutrient in NUTRIENTS),
+                  *(f'consumed_{nutrient}' for nutrient in NUTRIENTS))
+ROLLUP_KEY = ('household_id', 'day', 'meal_slot')
+
+# --- Nutrition Rollup ---
+# NutritionRollup keeps the plan's totals per household, day and slot: the meal count, how
+# many are eaten, and the scheduled and consumed macros. Reports read these rows instead
+# of joining every planned meal to its recipe, so a year of totals is a few hundred rows
+# however busy the plan is. The rows are kept up to date by adding deltas, never by
+# recomputing: a write takes away the old contribution of the meals it touches and adds
+# their new one, with one upsert that adds onto whatever the row holds. Two members
+# changing the same day both land. ORM flushes are covered by the hooks below; code
+# writing MealPlan rows with bulk statements builds a RollupDelta itself. Recipes count
+# with the macros they have now, so editing a recipe's macros moves every day it is
+# planned on. rebuild_nutrition_rollup() recomputes households from scratch.
+
+
+def _plan_cells(where):
+    """The rollup values of the plan rows matching `where`, grouped by rollup key."""
+    eaten = MealPlan.is_eaten.is_(True)
+    return select(
+        MealPlan.household_id, MealPlan.meal_date, MealPlan.meal_slot,
+        func.count(MealPlan.id),
+        func.coalesce(func.sum(case((eaten, 1), else_=0)), 0),
+        *(func.coalesce(func.sum(getattr(Recipe, nutrient)), 0) for nutrient in NUTRIENTS),
+        *(func.coalesce(func.sum(case((eaten, getattr(Recipe, nutrient)), else_=0)), 0) for nutrient in NUTRIENTS),
+    ).outerjoin(Recipe, Recipe.id == MealPlan.recipe_id).where(where) \
+        .group_by(MealPlan.household_id, MealPlan.meal_date, MealPlan.meal_slot)
+
+
+def recipe_macros(recipe_ids, bind=None):
+    """{recipe id: (calories, protein, fat, carbs)} for the given recipes, in one query."""
+    recipe_ids = set(recipe_ids) - {None}
+    if not recipe_ids:
+        return {}
+    rows = (bind or db.session).execute(
+        select(Recipe.id, *(getattr(Recipe, nutrient) for nutrient in NUTRIENTS)).where(Recipe.id.in_(recipe_ids))
+    )
+    return {recipe_id: tuple(macros) for recipe_id, *macros in rows}
+
+
+class RollupDelta:
+    """Changes to the rollup, gathered per key and written with one upsert by apply()."""
+
+    def __init__(self):
+        self.cells = defaultdict(lambda: [0] * len(ROLLUP_COLUMNS))
+
+    def add_meal(self, household_id, day, meal_slot, is_eaten, macros=None, sign=1):
+        """Counts one planned meal, or takes it away with sign=-1; `macros` as from recipe_macros()."""
+        values = self.cells[(household_id, day, meal_slot)]
+        values[0] += sign
+        if is_eaten:
+            values[1] += sign
+        for i, amount in enumerate(macros or ()):
+            values[2 + i] += sign * (amount or 0)
+            if is_eaten:
+                values[2 + len(NUTRIENTS) + i] += sign * (amount or 0)
+
+    def add_plan(self, where, sign=1, bind=None):
+        """Counts every plan row matching `where`, as it stands in the database, with one grouped query."""
+        for household_id, day, meal_slot, *values in (bind or db.session).execute(_plan_cells(where)):
+            cell = self.cells[(household_id, day, meal_slot)]
+            for i, value in enumerate(values):
+                cell[i] += sign * value
+
+    def apply(self, bind=None, skip_households=()):
+        """Adds the gathered changes onto the rollup; the caller commits."""
+        rows = [dict(zip(ROLLUP_KEY, key), **dict(zip(ROLLUP_COLUMNS, values)))
+                for key, values in self.cells.items() if key[0] not in skip_households and any(values)]
+        self.cells.clear()
+        if not rows:
+            return
+        dialect = (bind if bind is not None else db.session.get_bind()).dialect.name
+        bind = db.session if bind is None else bind
+        table = NutritionRollup.__table__
+        if dialect in ('postgresql', 'sqlite'):
+            stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+            bind.execute(stmt.on_conflict_do_update(
+                index_elements=list(ROLLUP_KEY),
+                set_={column: table.c[column] + stmt.excluded[column] for column in ROLLUP_COLUMNS}
+            ), rows)
+        else:
+            for row in rows:
+                key = [table.c[column] == row[column] for column in ROLLUP_KEY]
+                added = bind.execute(update(table).where(*key).values(
+                    {column: table.c[column] + row[column] for column in ROLLUP_COLUMNS}
+                ))
+                if not added.rowcount:
+                    bind.execute(insert(table).values(row))
+        emptied = [row for row in rows if row['meals'] < 0]
+        if emptied:
+            bind.execute(delete(table).where(
+                table.c.household_id.in_({row['household_id'] for row in emptied}),
+                table.c.day.in_({row['day'] for row in emptied}),
+                table.c.meals <= 0
+            ))
+
+
+def rebuild_nutrition_rollup(*household_ids):
+    """Recomputes the rollup of the given households, or of every household, from the plan; the caller commits."""
+    table = NutritionRollup.__table__
+    clear, where = delete(table), MealPlan.id.isnot(None)
+    if household_ids:
+        clear = clear.where(table.c.household_id.in_(household_ids))
+        where = MealPlan.household_id.in_(household_ids)
+    db.session.execute(clear)
+    db.session.execute(insert(table).from_select([*ROLLUP_KEY, *ROLLUP_COLUMNS], _plan_cells(where)))
+
+
+def rollup_rows(household_id, start, end, by_slot=False):
+    """
+    The rollup from `start` to `end` inclusive, summed per day (or per day and slot), as
+    (day[, meal_slot], meals, eaten_meals, scheduled..., consumed...) rows in date order.
+    """
+    keys = [NutritionRollup.day, NutritionRollup.meal_slot] if by_slot else [NutritionRollup.day]
+    return db.session.execute(
+        select(*keys, *(func.sum(getattr(NutritionRollup, column)) for column in ROLLUP_COLUMNS))
+        .where(NutritionRollup.household_id == household_id, NutritionRollup.day.between(start, end))
+        .group_by(*keys).order_by(*keys)
+    ).all()
+
+
+# --- Flush Hooks ---
+# before_flush takes away what the meals and recipes about to change contribute now, and
+# after_flush adds back what they contribute once written, both read with the same
+# grouped query. Only changes to a meal's household, date, slot, recipe or eaten flag, and
+# to a recipe's macros, touch the rollup.
+PLAN_ATTRIBUTES = ('household_id', 'household', 'meal_date', 'meal_slot', 'recipe_id', 'recipe', 'is_eaten')
+
+
+def _changed(obj, attributes):
+    state = inspect(obj)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+def _scope(plan_ids, recipe_ids):
+    return or_(MealPlan.id.in_(plan_ids), MealPlan.recipe_id.in_(recipe_ids))
+
+
+@event.listens_for(Session, 'before_flush')
+def _rollup_before_flush(session, flush_context, instances):
+    plan_ids, recipe_ids = set(), set()
+    for obj in session.deleted:
+        if isinstance(obj, MealPlan):
+            plan_ids.add(obj.id)
+        elif isinstance(obj, Recipe):
+            recipe_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, MealPlan) and _changed(obj, PLAN_ATTRIBUTES):
+            plan_ids.add(obj.id)
+        elif isinstance(obj, Recipe) and _changed(obj, NUTRIENTS):
+            recipe_ids.add(obj.id)
+    new_plans = [obj for obj in session.new if isinstance(obj, MealPlan)]
+    if not (plan_ids or recipe_ids or new_plans):
+        return
+    delta = RollupDelta()
+    if plan_ids or recipe_ids:
+        delta.add_plan(_scope(plan_ids, recipe_ids), sign=-1, bind=session.connection())
+    flush_context.attributes['nutrition_rollup'] = (delta, plan_ids, recipe_ids, new_plans)
+
+
+@event.listens_for(Session, 'after_flush')
+def _rollup_after_flush(session, flush_context):
+    pending = flush_context.attributes.pop('nutrition_rollup', None)
+    if pending is None:
+        return
+    delta, plan_ids, recipe_ids, new_plans = pending
+    plan_ids = plan_ids | {obj.id for obj in new_plans}
+    delta.add_plan(_scope(plan_ids, recipe_ids), bind=session.connection())
+    removed = {obj.id for obj in session.deleted if isinstance(obj, Household)}
+    delta.apply(bind=session.connection(), skip_households=removed)
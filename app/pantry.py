@@ -0,0 +1,109 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+import pint
+from sqlalchemy import select, update
+
+from . import db
+from .dashboard import STATS_SOURCE_PARTS, invalidate_household_stats
+from .ingredients import IngredientIndex
+from .models import Ingredient, PantryItem, RecipeIngredient
+from .units import parse_quantity, convert
+
+# --- Pantry Deduction ---
+# Marking meals eaten takes their recipes' ingredients out of the pantry. The household's
+# pantry is loaded once into a PantryLedger, keyed by ingredient id, with an IngredientIndex
+# over the names for recipe ingredients the pantry holds under another name ("Chicken" for
+# "Chicken Breast", "Green Onion" for "Scallions"). Any number of recipes are deducted in
+# memory, one after another, and save() writes the changed rows back in a single bulk UPDATE.
+
+
+class PantryLedger:
+    def __init__(self, household_id):
+        self.household_id = household_id
+        self.items = {}
+        self.changed = {}
+        self._names = IngredientIndex()
+        self._substitutes = {}
+        rows = db.session.execute(
+            select(PantryItem.id, PantryItem.ingredient_id, PantryItem.quantity, PantryItem.unit, Ingredient.name)
+            .join(Ingredient, Ingredient.id == PantryItem.ingredient_id)
+            .where(PantryItem.household_id == household_id).order_by(PantryItem.id)
+        )
+        for item_id, ingredient_id, quantity, unit, name in rows:
+            self.items[ingredient_id] = {'id': item_id, 'name': name, 'quantity': quantity, 'unit': unit}
+            self._names.add(ingredient_id, name)
+
+    def substitutes(self, name):
+        """The pantry items best standing in for `name`; more than one when they rank equal."""
+        if name not in self._substitutes:
+            self._substitutes[name] = [self.items[ingredient_id] for ingredient_id in self._names.best(name)]
+        return self._substitutes[name]
+
+    def deduct(self, ingredient_id, ingredient_name, quantity, unit, updated, skipped):
+        """Takes one recipe line out of the pantry, adding the outcome to the `updated` and `skipped` lists."""
+        if not quantity or quantity <= 0:
+            return
+        item = self.items.get(ingredient_id)
+        if not item:
+            substitutes = self.substitutes(ingredient_name)
+            if len(substitutes) == 1:
+                item = substitutes[0]
+            elif len(substitutes) > 1:
+                sub_names = ", ".join([s['name'] for s in substitutes])
+                skipped.append(f"{ingredient_name} (Multiple substitutes found: {sub_names})")
+                return
+        if not item:
+            return
+
+        try:
+            recipe_qty, recipe_units = parse_quantity(quantity, unit)
+            pantry_qty, pantry_units = parse_quantity(item['quantity'], item['unit'])
+
+            recipe_in_pantry_units = convert(recipe_qty, recipe_units, pantry_units)
+            if recipe_in_pantry_units is None:
+                raise pint.errors.DimensionalityError(pantry_units, recipe_units)
+
+            item['quantity'] = max(0, pantry_qty - recipe_in_pantry_units)
+            self.changed[item['id']] = item
+            updated.append(item['name'])
+
+        except pint.errors.DimensionalityError as e:
+            skipped.append(f"{item['name']} (Cannot convert pantry unit '{e.units1}' to recipe unit '{e.units2}')")
+        except pint.errors.UndefinedUnitError as e:
+            skipped.append(f"{item['name']} (The unit '{', '.join(e.unit_names)}' is not recognized)")
+        except Exception as e:
+            logging.error(f"An unexpected error occurred during pantry deduction for item '{item['name']}': {e}", exc_info=True)
+            skipped.append(f"{item['name']} (An unexpected error occurred: {repr(e)})")
+
+    def deduct_recipes(self, recipe_ids):
+        """
+        Deducts each recipe in `recipe_ids`, once per occurrence and in order. Returns the
+        (updated, skipped) lists of pantry item names and skip reasons.
+        """
+        lines = defaultdict(list)
+        for recipe_id, ingredient_id, quantity, unit, name in db.session.execute(
+            select(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id, RecipeIngredient.quantity,
+                   RecipeIngredient.unit, Ingredient.name)
+            .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+            .where(RecipeIngredient.recipe_id.in_(set(recipe_ids))).order_by(RecipeIngredient.id)
+        ):
+            lines[recipe_id].append((ingredient_id, name, quantity, unit))
+        updated, skipped = [], []
+        for recipe_id in recipe_ids:
+            for ingredient_id, name, quantity, unit in lines[recipe_id]:
+                self.deduct(ingredient_id, name, quantity, unit, updated, skipped)
+        return updated, skipped
+
+    def save(self):
+        """Writes every changed quantity in one executemany UPDATE; the caller commits."""
+        if not self.changed:
+            return
+        now = datetime.utcnow()
+        db.session.execute(update(PantryItem), [
+            {'id': item['id'], 'quantity': item['quantity'], 'date_updated': now} for item in self.changed.values()
+        ])
+        # Bulk UPDATEs bypass the flush hook that marks the stats stale.
+        invalidate_household_stats(self.household_id, parts=STATS_SOURCE_PARTS[PantryItem])
+        self.changed = {}
@@ -0,0 +1,56 @@
+import re
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# --- N+1 Detection ---
+# Every statement a request sends is counted by its shape: the SQL with parameter
+# placeholders, and IN lists of any length, folded together. A shape run more than
+# N_PLUS_ONE_THRESHOLD times in one request is almost always a relationship loaded row by
+# row from a loop or template; it is logged once per request with the stack that ran it.
+# With N_PLUS_ONE_RAISE set (as in tests), the request fails with RepeatedQueryError
+# instead, naming every offending shape.
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+class RepeatedQueryError(Exception):
+    """A request ran the same query shape more often than N_PLUS_ONE_THRESHOLD allows."""
+
+
+def query_shape(statement):
+    """`statement` with its placeholders, and runs of them, reduced to a single '?'."""
+    return _PLACEHOLDER_LIST.sub('?', _PLACEHOLDER.sub('?', ' '.join(statement.split())))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query_shape(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or 'query_shapes' not in g:
+        return
+    shape = query_shape(statement)
+    g.query_shapes[shape] += 1
+    threshold = current_app.config['N_PLUS_ONE_THRESHOLD']
+    if g.query_shapes[shape] == threshold + 1:
+        current_app.logger.warning(f"Possible N+1: {request.method} {request.path} ran this query more than "
+                                   f"{threshold} times: {shape[:500]}", stack_info=True)
+
+
+def init_query_watch(app):
+    if not app.config['N_PLUS_ONE_THRESHOLD']:
+        return
+
+    @app.before_request
+    def start_counting_queries():
+        g.query_shapes = Counter()
+
+    @app.after_request
+    def check_repeated_queries(response):
+        shapes = g.pop('query_shapes', None) or {}
+        threshold = current_app.config['N_PLUS_ONE_THRESHOLD']
+        repeated = {shape: count for shape, count in shapes.items() if count > threshold}
+        if repeated and current_app.config['N_PLUS_ONE_RAISE']:
+            raise RepeatedQueryError(f"{request.method} {request.path} ran " + "; ".join(
+                f"{count}x {shape[:200]}" for shape, count in repeated.items()))
+        return response
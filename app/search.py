@@ -0,0 +1,155 @@
+import itertools
+import re
+
+from sqlalchemy import bindparam, column, event, func, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Recipe, RecipeIngredient
+
+# --- Full-Text Recipe Search ---
+# SQLite keeps an FTS5 table (recipe_fts, rowid = recipe.id) and Postgres keeps a weighted
+# tsvector column (recipe.search_vector) behind a GIN index. Both are created by the
+# "Add recipe full-text search" migration and are refreshed from the flush hook below.
+# Databases created without that migration fall back to ILIKE scans.
+
+SEARCH_FIELDS = ('name', 'instructions', 'ingredients')
+_backend_cache = {}
+
+_SQLITE_DELETE = text("DELETE FROM recipe_fts WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True))
+_SQLITE_INSERT = text("""
+    INSERT INTO recipe_fts (rowid, name, instructions, ingredients)
+    SELECT recipe.id, recipe.name, recipe.instructions, COALESCE(group_concat(ingredient.name, ' '), '')
+    FROM recipe
+    LEFT JOIN recipe_ingredient ON recipe_ingredient.recipe_id = recipe.id
+    LEFT JOIN ingredient ON ingredient.id = recipe_ingredient.ingredient_id
+    WHERE recipe.id IN :ids
+    GROUP BY recipe.id
+""").bindparams(bindparam('ids', expanding=True))
+_POSTGRES_UPDATE = text("""
+    UPDATE recipe SET search_vector =
+        setweight(to_tsvector('english', coalesce(recipe.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(names.ingredients, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(recipe.instructions, '')), 'C')
+    FROM (
+        SELECT recipe.id AS recipe_id, string_agg(ingredient.name, ' ') AS ingredients
+        FROM recipe
+        LEFT JOIN recipe_ingredient ON recipe_ingredient.recipe_id = recipe.id
+        LEFT JOIN ingredient ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe.id IN :ids
+        GROUP BY recipe.id
+    ) AS names
+    WHERE recipe.id = names.recipe_id
+""").bindparams(bindparam('ids', expanding=True))
+
+
+def get_search_backend(bind=None):
+    """Returns 'sqlite', 'postgresql' or None when the full-text structures are missing."""
+    bind = bind or db.session
+    engine = bind.engine if isinstance(bind, Connection) else bind.get_bind()
+    key = str(engine.url)
+    if key not in _backend_cache:
+        dialect = engine.dialect.name
+        if dialect == 'sqlite':
+            exists = bind.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipe_fts'")).first()
+        elif dialect == 'postgresql':
+            exists = bind.execute(text(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = 'recipe' AND column_name = 'search_vector'"
+            )).first()
+        else:
+            exists = None
+        _backend_cache[key] = dialect if exists else None
+    return _backend_cache[key]
+
+
+def reindex_recipes(recipe_ids, bind=None):
+    """Refreshes the search entries of the given recipes; ids of deleted recipes are dropped."""
+    recipe_ids = [rid for rid in set(recipe_ids) if rid is not None]
+    bind = bind or db.session
+    backend = get_search_backend(bind)
+    if not recipe_ids or backend is None:
+        return
+    for chunk_start in range(0, len(recipe_ids), 500):
+        chunk = recipe_ids[chunk_start:chunk_start + 500]
+        if backend == 'sqlite':
+            bind.execute(_SQLITE_DELETE, {'ids': chunk})
+            bind.execute(_SQLITE_INSERT, {'ids': chunk})
+        else:
+            bind.execute(_POSTGRES_UPDATE, {'ids': chunk})
+
+
+@event.listens_for(Session, 'after_flush')
+def _reindex_after_flush(session, flush_context):
+    recipe_ids = set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, RecipeIngredient):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            recipe_ids.add(obj.recipe_id)
+        elif isinstance(obj, Recipe):
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            recipe_ids.add(obj.id)
+    if recipe_ids:
+        reindex_recipes(recipe_ids, bind=session.connection())
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _sqlite_match_expression(terms, fields, prefix):
+    phrases = ' '.join(f'"{term}"' + ('*' if prefix else '') for term in terms)
+    columns = ' '.join(fields)
+    return f'{{{columns}}} : ({phrases})'
+
+
+def _postgres_tsquery(terms, fields, prefix):
+    # Postgres stores name/ingredients/instructions as weights A/B/C of one vector;
+    # weight labels on each term restrict the match while still using the GIN index.
+    weights = '' if set(fields) == set(SEARCH_FIELDS) else ''.join({'name': 'A', 'ingredients': 'B', 'instructions': 'C'}[f] for f in fields)
+    suffix = ('*' if prefix else '') + weights
+    return ' & '.join(term + (':' + suffix if suffix else '') for term in terms)
+
+
+def ranked_recipe_matches(query, fields=SEARCH_FIELDS, prefix=True, bind=None):
+    """
+    Returns a subquery of (recipe_id, rank) for recipes matching every term of `query`
+    in any of `fields`, where a lower rank is a better match. Returns None when the
+    query has no searchable terms or full-text search isn't available.
+    """
+    terms = _terms(query)
+    backend = get_search_backend(bind)
+    if not terms or backend is None:
+        return None
+
+    if backend == 'sqlite':
+        fts = table('recipe_fts', column('rowid'))
+        weights = {'name': 10.0, 'instructions': 1.0, 'ingredients': 5.0}
+        rank = func.bm25(literal_column('recipe_fts'), *[weights[f] for f in SEARCH_FIELDS])
+        return select(
+            fts.c.rowid.label('recipe_id'),
+            rank.label('rank')
+        ).select_from(fts).where(
+            literal_column('recipe_fts').op('MATCH')(_sqlite_match_expression(terms, fields, prefix))
+        ).subquery()
+
+    tsquery = func.to_tsquery('english', _postgres_tsquery(terms, fields, prefix))
+    return select(
+        Recipe.id.label('recipe_id'),
+        (-func.ts_rank(literal_column('recipe.search_vector'), tsquery)).label('rank')
+    ).where(literal_column('recipe.search_vector').op('@@')(tsquery)).subquery()
+
+
+def search_recipes(base_query, query, fields=SEARCH_FIELDS, prefix=True):
+    """
+    Filters a Recipe query to full-text matches of `query`, best matches first. Any
+    ordering applied to the returned query afterwards only breaks ties.
+    """
+    matches = ranked_recipe_matches(query, fields, prefix)
+    if matches is None:
+        search_term = f"%{query}%"
+        columns = {'name': Recipe.name, 'instructions': Recipe.instructions}
+        return base_query.filter(db.or_(*[columns[f].ilike(search_term) for f in fields if f in columns]))
+    return base_query.join(matches, matches.c.recipe_id == Recipe.id).order_by(matches.c.rank)
@@ -0,0 +1,214 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+import pint
+from sqlalchemy import select
+
+from . import db
+from .ingredients import IngredientIndex
+from .models import Ingredient, MealPlan, PantryItem, RecipeIngredient, ShoppingListItem
+from .units import parse_quantity, base_unit_factor
+
+# --- Shopping List Engine ---
+# Builds the shopping lists of any number of households for a date window from three
+# queries (planned recipe lines, pantry rows, manual items). Every unit string is compiled
+# once; recipe lines are then summed per (household, ingredient, dimension) in the
+# registry's base units (mass, volume, count, ...) and reconciled against the pantry in one
+# vectorized pass. Units Pint can't parse are summed per raw unit string instead. An
+# ingredient the pantry doesn't hold by id is reconciled against the pantry row that best
+# stands in for it (IngredientIndex.best), if that row isn't needed under its own name.
+
+# Shortfalls smaller than this fraction of the requirement are float noise from the
+# round trip through base units, e.g. 16 tbsp needed against 1 cup stocked.
+_TOLERANCE = 1e-9
+
+
+def _unit_tables(unit_strings):
+    """
+    Per distinct unit string: the factor taking a quantity in it to base units, a
+    dimension code shared by all units of the same dimension (unparseable strings each
+    get their own), and a display label with the factor for showing base amounts in it.
+    A string like "10 oz" parses to 10 ounces, so it differs from its label's factor.
+    """
+    to_base = np.ones(len(unit_strings))
+    label_to_base = np.ones(len(unit_strings))
+    dimension_codes = np.zeros(len(unit_strings), dtype=np.int64)
+    labels, dimensions = [], {}
+    for code, unit_str in enumerate(unit_strings):
+        try:
+            magnitude, units = parse_quantity(1.0, unit_str)
+        except (pint.errors.DimensionalityError, pint.errors.UndefinedUnitError):
+            dimension, label = ('raw', unit_str), unit_str
+        else:
+            factor, dimension = base_unit_factor(units)
+            to_base[code] = magnitude * factor
+            label_to_base[code] = factor
+            label = '' if str(units) == 'dimensionless' else str(units)
+        dimension_codes[code] = dimensions.setdefault(dimension, len(dimensions))
+        labels.append(label)
+    return to_base, dimension_codes, labels, label_to_base
+
+
+def _encode_units(raw_units, unit_index):
+    return np.fromiter((unit_index.setdefault(unit or '', len(unit_index)) for unit in raw_units),
+                       dtype=np.int64, count=len(raw_units))
+
+
+def compute_shopping_lists(household_ids, start, end):
+    """
+    Returns {household_id: {'grouped_list': ..., 'ingredients_in_pantry': ...}} for meals
+    planned between `start` and `end` inclusive, in the shape shopping_list.html expects.
+    """
+    household_ids = list(dict.fromkeys(household_ids))
+    results = {hid: {'grouped_list': {}, 'ingredients_in_pantry': {}} for hid in household_ids}
+    if not household_ids:
+        return results
+
+    lines = db.session.execute(
+        select(MealPlan.household_id, RecipeIngredient.ingredient_id, RecipeIngredient.quantity, RecipeIngredient.unit,
+               Ingredient.name, Ingredient.category)
+        .join(RecipeIngredient, RecipeIngredient.recipe_id == MealPlan.recipe_id)
+        .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .where(MealPlan.household_id.in_(household_ids), MealPlan.meal_date.between(start, end),
+               RecipeIngredient.quantity != 0)
+        .order_by(MealPlan.id, RecipeIngredient.id)
+    ).all()
+
+    if lines:
+        _reconcile(lines, household_ids, results)
+
+    for item in db.session.scalars(
+        select(ShoppingListItem).where(ShoppingListItem.household_id.in_(household_ids)).order_by(ShoppingListItem.id)
+    ):
+        results[item.household_id]['grouped_list'].setdefault(item.category, {})[item.name] = {
+            'quantity': None, 'units': [], 'note': 'Manually added', 'manual_id': item.id
+        }
+    return results
+
+
+def _format_amount(quantity, label):
+    return f"{quantity:.2f} {label}".rstrip()
+
+
+def _pantry_rows(lines, household_ids):
+    """
+    The pantry rows reconciled against the needed ingredients, as (household, ingredient,
+    quantity, unit, pantry name); a row standing in for another ingredient carries that
+    ingredient's id. Each row is used for one ingredient at most.
+    """
+    needed = {}
+    for household_id, ingredient_id, _, _, name, _ in lines:
+        needed.setdefault((household_id, ingredient_id), name)
+    rows, spare = [], defaultdict(dict)
+    for row in db.session.execute(
+        select(PantryItem.household_id, PantryItem.ingredient_id, PantryItem.quantity, PantryItem.unit, Ingredient.name)
+        .join(Ingredient, Ingredient.id == PantryItem.ingredient_id)
+        .where(PantryItem.household_id.in_(household_ids)).order_by(PantryItem.id)
+    ):
+        if (row.household_id, row.ingredient_id) in needed:
+            rows.append(tuple(row))
+        else:
+            spare[row.household_id][row.ingredient_id] = row
+
+    stocked = {(row[0], row[1]) for row in rows}
+    indexes = {}
+    for (household_id, ingredient_id), name in needed.items():
+        if (household_id, ingredient_id) in stocked or not spare.get(household_id):
+            continue
+        if household_id not in indexes:
+            indexes[household_id] = IngredientIndex((key, row.name) for key, row in spare[household_id].items())
+        match = indexes[household_id].best(name)
+        if len(match) == 1:
+            row = spare[household_id].pop(match[0])
+            indexes[household_id].remove(match[0])
+            rows.append((household_id, ingredient_id, row.quantity, row.unit, row.name))
+    return rows
+
+
+def _reconcile(lines, household_ids, results):
+    line_households, line_ingredients, line_quantities, line_units, names, categories = zip(*lines)
+    line_households = np.array(line_households, dtype=np.int64)
+    line_ingredients = np.array(line_ingredients, dtype=np.int64)
+    unit_index = {}
+    line_unit_codes = _encode_units(line_units, unit_index)
+
+    pantry = _pantry_rows(lines, household_ids)
+    pantry_households, pantry_ingredients, pantry_quantities, pantry_units, pantry_names = zip(*pantry) if pantry else ((),) * 5
+    pantry_unit_codes = _encode_units(pantry_units, unit_index)
+    to_base, dimension_codes, labels, label_to_base = _unit_tables(list(unit_index))
+
+    # One group per (household, ingredient) and one bucket per (group, dimension), each
+    # numbered in order of first appearance.
+    stride = int(line_ingredients.max()) + 1
+    keys, first_line, group_of_line = np.unique(line_households * stride + line_ingredients,
+                                                return_index=True, return_inverse=True)
+    dimension_count = int(dimension_codes.max()) + 1
+    bucket_keys, bucket_first_line, bucket_of_line = np.unique(
+        group_of_line * dimension_count + dimension_codes[line_unit_codes], return_index=True, return_inverse=True
+    )
+    required = np.bincount(bucket_of_line, weights=np.array(line_quantities, dtype=float) * to_base[line_unit_codes],
+                           minlength=len(bucket_keys))
+    # Each bucket is shown in the first unit it was asked for in.
+    display_codes = line_unit_codes[bucket_first_line]
+
+    # Take each pantry row off the bucket of its own dimension, if the group has one.
+    pantry_keys = np.array(pantry_households, dtype=np.int64) * stride + np.array(pantry_ingredients, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(keys, pantry_keys), len(keys) - 1)
+    matched = keys[positions] == pantry_keys
+    pantry_row = np.full(len(keys), -1, dtype=np.int64)
+    pantry_row[positions[matched]] = np.flatnonzero(matched)
+
+    pantry_bucket_keys = positions * dimension_count + dimension_codes[pantry_unit_codes]
+    bucket_positions = np.minimum(np.searchsorted(bucket_keys, pantry_bucket_keys), len(bucket_keys) - 1)
+    covers = matched & (bucket_keys[bucket_positions] == pantry_bucket_keys)
+    stocked = np.zeros(len(bucket_keys))
+    stocked[bucket_positions[covers]] = (np.array(pantry_quantities, dtype=float) * to_base[pantry_unit_codes])[covers]
+    group_stock_matched = np.zeros(len(keys), dtype=bool)
+    group_stock_matched[positions[covers]] = True
+
+    shortfall = required - stocked
+    to_buy = shortfall > np.abs(required) * _TOLERANCE
+    display_quantity = shortfall / label_to_base[display_codes]
+
+    buckets_by_group = [[] for _ in keys]
+    for bucket in np.argsort(bucket_first_line):
+        if to_buy[bucket]:
+            buckets_by_group[bucket_keys[bucket] // dimension_count].append(bucket)
+
+    for group in np.argsort(first_line):
+        line = first_line[group]
+        household = results[int(line_households[line])]
+        name, category = names[line], categories[line] or 'Other'
+        row = pantry_row[group]
+        if row >= 0:
+            household['ingredients_in_pantry'][pantry_names[row]] = {'quantity': float(pantry_quantities[row]), 'unit': pantry_units[row]}
+
+        buckets = buckets_by_group[group]
+        if not buckets:
+            continue
+        primary, extra = buckets[0], buckets[1:]
+        notes = []
+        if row < 0:
+            notes.append("Not in pantry")
+        elif not group_stock_matched[group]:
+            notes.append(f"Unit Mismatch! Check pantry: you have {float(pantry_quantities[row])} {pantry_units[row] or ''}")
+        if row >= 0 and pantry_names[row] != name:
+            notes.append(f"Counting the {pantry_names[row]} in your pantry")
+        if extra:
+            notes.append("Also needed: " + ", ".join(
+                _format_amount(display_quantity[bucket], labels[display_codes[bucket]]) for bucket in extra
+            ))
+        household['grouped_list'].setdefault(category, {})[name] = {
+            'quantity': float(display_quantity[primary]),
+            'units': [labels[display_codes[primary]]],
+            'note': '. '.join(notes) or None,
+            'category': category,
+        }
+
+
+def get_shopping_list(household_id, start=None, end=None):
+    """The shopping list for one household; defaults to the coming week, as on the shopping list page."""
+    start = start or date.today()
+    end = end or start + timedelta(days=6)
+    return compute_shopping_lists([household_id], start, end)[household_id]
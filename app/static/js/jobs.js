@@ -0,0 +1,37 @@
+// static/js/jobs.js
+
+// AI requests run as background jobs: the endpoint answers 202 with a status_url,
+// which is polled until the job has succeeded or failed. onUpdate, if given, receives
+// every status response (batch imports report per-URL progress in them).
+function pollJob(statusUrl, intervalMs = 2000, onUpdate = null) {
+  return new Promise((resolve, reject) => {
+    const check = () => {
+      fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => {
+          if (!response.ok) throw new Error(`Job status request failed (${response.status})`);
+          return response.json();
+        })
+        .then(job => {
+          if (onUpdate) onUpdate(job);
+          if (job.status === 'succeeded' || job.status === 'failed') {
+            resolve(job);
+          } else {
+            setTimeout(check, intervalMs);
+          }
+        })
+        .catch(reject);
+    };
+    setTimeout(check, 500);
+  });
+}
+
+// Posts to an AI endpoint and resolves with the finished job's result, or with
+// { error, redirect_url } when the request is refused or the job fails.
+function runAIJob(url, options, onUpdate = null) {
+  return fetch(url, options)
+    .then(response => response.json())
+    .then(data => {
+      if (!data.status_url) return data;
+      return pollJob(data.status_url, 2000, onUpdate).then(job => job.status === 'succeeded' ? job.result : { error: job.error });
+    });
+}
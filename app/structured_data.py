@@ -0,0 +1,286 @@
+import html
+import json
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+# --- schema.org Recipe Extraction ---
+# Most recipe sites publish their recipe as schema.org data for search engines, either as
+# JSON-LD in a <script type="application/ld+json"> block or as microdata itemprop attributes
+# on the page's own markup. scan_page() reads both in one streaming pass with the standard
+# library's HTMLParser, without building a document tree, and turns the first Recipe it
+# finds into the same dict the import prompt asks the model for.
+ScannedPage = namedtuple('ScannedPage', ['canonical', 'recipe'])
+
+# Elements whose end tag may be left out: a new <li> closes the open <li>, and so on.
+IMPLIED_END_TAGS = {'li', 'p', 'dt', 'dd', 'option', 'tr', 'td', 'th'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+URL_ATTRIBUTES = {'a': 'href', 'area': 'href', 'link': 'href', 'audio': 'src', 'embed': 'src', 'iframe': 'src',
+                  'img': 'src', 'source': 'src', 'track': 'src', 'video': 'src', 'object': 'data'}
+MEAL_TYPES = [('dessert', 'Dessert'), ('side', 'Side Dish'), ('snack', 'Snack'), ('appetizer', 'Snack'),
+              ('meal prep', 'Meal Prep')]
+NUTRITION_PROPERTIES = {'calories': 'calories', 'protein': 'proteinContent', 'fat': 'fatContent',
+                        'carbs': 'carbohydrateContent'}
+
+# --- Ingredient Lines ---
+# schema.org lists ingredients as free text ("1 1/2 cups flour, sifted"); parse_ingredient_line
+# splits a line into the quantity, unit and name the model would have returned.
+FRACTIONS = {'½': 1 / 2, '⅓': 1 / 3, '⅔': 2 / 3, '¼': 1 / 4, '¾': 3 / 4, '⅕': 1 / 5, '⅖': 2 / 5, '⅗': 3 / 5,
+             '⅘': 4 / 5, '⅙': 1 / 6, '⅚': 5 / 6, '⅛': 1 / 8, '⅜': 3 / 8, '⅝': 5 / 8, '⅞': 7 / 8}
+_NUMBER = rf'(?:\d+\s*[{"".join(FRACTIONS)}]|[{"".join(FRACTIONS)}]|\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)'
+QUANTITY_PATTERN = re.compile(rf'^(?P<quantity>{_NUMBER})(?:\s*(?:-|–|to)\s*{_NUMBER})?\s*')
+UNIT_ALIASES = {
+    'cup': 'cup', 'cups': 'cup', 'c': 'cup',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbsp': 'tbsp', 'tbsps': 'tbsp', 'tbs': 'tbsp', 'tbl': 'tbsp', 'T': 'tbsp',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp', 'tsp': 'tsp', 'tsps': 'tsp', 't': 'tsp',
+    'ounce': 'oz', 'ounces': 'oz', 'oz': 'oz', 'pound': 'lb', 'pounds': 'lb', 'lb': 'lb', 'lbs': 'lb',
+    'gram': 'g', 'grams': 'g', 'g': 'g', 'kilogram': 'kg', 'kilograms': 'kg', 'kg': 'kg',
+    'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml', 'ml': 'ml',
+    'liter': 'liter', 'liters': 'liter', 'litre': 'liter', 'litres': 'liter', 'l': 'liter',
+    'pint': 'pint', 'pints': 'pint', 'quart': 'quart', 'quarts': 'quart', 'gallon': 'gallon', 'gallons': 'gallon',
+    'clove': 'clove', 'cloves': 'clove', 'slice': 'slice', 'slices': 'slice', 'stick': 'stick', 'sticks': 'stick',
+    'sprig': 'sprig', 'sprigs': 'sprig', 'bunch': 'bunch', 'bunches': 'bunch', 'stalk': 'stalk', 'stalks': 'stalk',
+    'piece': 'piece', 'pieces': 'piece', 'head': 'head', 'heads': 'head', 'fillet': 'fillet', 'fillets': 'fillet',
+    'leaf': 'leaf', 'leaves': 'leaf', 'pinch': 'pinch', 'pinches': 'pinch', 'dash': 'dash', 'dashes': 'dash',
+    'can': 'can', 'cans': 'can', 'jar': 'jar', 'jars': 'jar', 'package': 'package', 'packages': 'package',
+    'pkg': 'package',
+}
+UNIT_PATTERN = re.compile(r'^(?P<unit>fl\.?\s*oz|fluid\s+ounces?|[A-Za-z]+)\.?(?=\s|$)\s*')
+PARENTHESES = re.compile(r'\([^)]*\)')
+TAGS = re.compile(r'<[^>]+>')
+FIRST_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _to_number(text):
+    text = text.strip()
+    for char, value in FRACTIONS.items():
+        if char in text:
+            whole = text.replace(char, '').strip()
+            return (float(whole) if whole else 0.0) + value
+    if '/' in text:
+        whole, _, fraction = text.rpartition(' ')
+        numerator, denominator = fraction.split('/')
+        return (float(whole) if whole else 0.0) + float(numerator) / float(denominator)
+    return float(text)
+
+
+def parse_ingredient_line(line):
+    """{'name', 'quantity', 'unit'} for a free-text ingredient line; quantity is '' when the line has none."""
+    line = ' '.join(_text(line).replace('⁄', '/').split())
+    quantity, unit = '', ''
+    match = QUANTITY_PATTERN.match(line)
+    if match:
+        try:
+            quantity = f"{round(_to_number(match.group('quantity')), 3):g}"
+        except (ValueError, ZeroDivisionError):
+            quantity = ''
+        line = PARENTHESES.sub('', line[match.end():], count=1).strip()
+        unit_match = UNIT_PATTERN.match(line)
+        if unit_match:
+            word = unit_match.group('unit')
+            if word.lower().startswith(('fl', 'fluid')):
+                unit = 'fl oz'
+            else:
+                unit = UNIT_ALIASES.get(word) if len(word) == 1 else UNIT_ALIASES.get(word.lower())
+            if unit:
+                line = line[unit_match.end():]
+            else:
+                unit = ''
+    name = PARENTHESES.sub('', line).split(',')[0].strip()
+    if name.lower().startswith('of '):
+        name = name[3:].strip()
+    return {'name': name, 'quantity': quantity, 'unit': unit}
+
+
+# --- Page Scanning ---
+
+class _PageScanner(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.canonical = None
+        self.json_ld = []
+        self.items = []
+        self._script = None
+        self._skip_depth = 0
+        self._open = []
+        self._scopes = []
+        self._captures = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in IMPLIED_END_TAGS and self._open and self._open[-1][0] == tag:
+            self.handle_endtag(tag)
+        attrs = dict(attrs)
+        if tag == 'link' and self.canonical is None and 'canonical' in (attrs.get('rel') or '').lower().split():
+            self.canonical = attrs.get('href')
+        if tag == 'script' and 'ld+json' in (attrs.get('type') or '').lower():
+            self._script = []
+        elif tag in ('script', 'style'):
+            self._skip_depth += 1
+
+        props = (attrs.get('itemprop') or '').split()
+        opened_scope = capture = False
+        if 'itemscope' in attrs:
+            item = {'@type': (attrs.get('itemtype') or '').split()}
+            if props and self._scopes:
+                for prop in props:
+                    self._scopes[-1].setdefault(prop, []).append(item)
+            else:
+                self.items.append(item)
+            self._scopes.append(item)
+            opened_scope = True
+        elif props and self._scopes:
+            value = attrs.get('content')
+            if value is None and tag in URL_ATTRIBUTES:
+                value = attrs.get(URL_ATTRIBUTES[tag])
+            if value is None and tag in ('data', 'meter'):
+                value = attrs.get('value')
+            if value is None and tag == 'time':
+                value = attrs.get('datetime')
+            if value is not None:
+                for prop in props:
+                    self._scopes[-1].setdefault(prop, []).append(value)
+            elif tag not in VOID_TAGS:
+                self._captures.append((self._scopes[-1], props, []))
+                capture = True
+        if tag not in VOID_TAGS:
+            self._open.append((tag, opened_scope, capture))
+
+    def handle_endtag(self, tag):
+        if tag == 'script' and self._script is not None:
+            self.json_ld.append(''.join(self._script))
+            self._script = None
+        elif tag in ('script', 'style') and self._skip_depth:
+            self._skip_depth -= 1
+        # Browsers close any elements left open inside this one; stray end tags are ignored.
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._open) > index:
+            _, opened_scope, capture = self._open.pop()
+            if capture:
+                scope, props, chunks = self._captures.pop()
+                value = ' '.join(''.join(chunks).split())
+                for prop in props:
+                    scope.setdefault(prop, []).append(value)
+            if opened_scope:
+                self._scopes.pop()
+
+    def handle_data(self, data):
+        if self._script is not None:
+            self._script.append(data)
+        elif not self._skip_depth:
+            for _, _, chunks in self._captures:
+                chunks.append(data)
+
+
+def _values(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _first(value):
+    values = _values(value)
+    return values[0] if values else None
+
+
+def _text(value):
+    if isinstance(value, dict):
+        value = value.get('text') or value.get('name') or value.get('@value') or ''
+    return ' '.join(TAGS.sub(' ', html.unescape(str(value or ''))).split())
+
+
+def _is_recipe(node):
+    return any(str(t).rstrip('/').rsplit('/', 1)[-1] == 'Recipe' for t in _values(node.get('@type')))
+
+
+def _find_recipe(node, depth=0):
+    # JSON-LD nests recipes in @graph lists, mainEntity and the like; microdata in item properties.
+    if depth > 8:
+        return None
+    if isinstance(node, list):
+        return next((found for found in (_find_recipe(child, depth + 1) for child in node) if found), None)
+    if isinstance(node, dict):
+        if _is_recipe(node):
+            return node
+        return next((found for found in (_find_recipe(child, depth + 1) for child in node.values()) if found), None)
+    return None
+
+
+def _instruction_steps(value):
+    steps = []
+    for step in _values(value):
+        if isinstance(step, dict):
+            if step.get('itemListElement'):
+                steps.extend(_instruction_steps(step['itemListElement']))
+            else:
+                steps.append(_text(step))
+        elif isinstance(step, str):
+            steps.extend(_text(line) for line in re.split(r'\n|<br\s*/?>|</p>|</li>', step, flags=re.IGNORECASE))
+    return [step for step in steps if step]
+
+
+def _servings(value):
+    for candidate in _values(value):
+        if isinstance(candidate, (int, float)) and not isinstance(candidate, bool):
+            return int(candidate) or None
+        match = FIRST_NUMBER.search(_text(candidate))
+        if match:
+            return int(float(match.group())) or None
+    return None
+
+
+def _meal_type(value):
+    categories = ' '.join(_text(category) for category in _values(value)).lower()
+    return next((meal_type for keyword, meal_type in MEAL_TYPES if keyword in categories), 'Main Course')
+
+
+def _nutrition(value):
+    node = _first(value)
+    if not isinstance(node, dict):
+        return None
+    nutrition = {}
+    for key, prop in NUTRITION_PROPERTIES.items():
+        match = FIRST_NUMBER.search(_text(_first(node.get(prop))))
+        if match:
+            nutrition[key] = float(match.group())
+    return nutrition or None
+
+
+def _recipe_data(node):
+    ingredients = [parse_ingredient_line(line) for line in _values(node.get('recipeIngredient') or node.get('ingredients'))]
+    return {
+        'name': _text(_first(node.get('name'))),
+        'servings': _servings(node.get('recipeYield')),
+        'instructions': '\n'.join(_instruction_steps(node.get('recipeInstructions'))),
+        'meal_type': _meal_type(node.get('recipeCategory')),
+        'ingredients': [ing for ing in ingredients if ing['name']],
+        'nutrition': _nutrition(node.get('nutrition')),
+    }
+
+
+def scan_page(markup):
+    """
+    The page's rel="canonical" href and its schema.org Recipe as import data (name, servings,
+    instructions, meal_type, ingredients, nutrition), or None when it has neither JSON-LD
+    nor microdata for a recipe. JSON-LD wins when a page has both.
+    """
+    scanner = _PageScanner()
+    scanner.feed(markup)
+    scanner.close()
+    for block in scanner.json_ld:
+        try:
+            recipe = _find_recipe(json.loads(block.strip().rstrip(';'), strict=False))
+        except ValueError:
+            continue
+        if recipe:
+            return ScannedPage(scanner.canonical, _recipe_data(recipe))
+    recipe = _find_recipe(scanner.items)
+    return ScannedPage(scanner.canonical, _recipe_data(recipe) if recipe else None)
+
+
+def is_complete(recipe_data):
+    """Whether a scanned recipe has everything an import needs without asking the model."""
+    return bool(recipe_data and recipe_data['name'] and recipe_data['instructions'] and recipe_data['ingredients'])
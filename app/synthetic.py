@@ -0,0 +1,170 @@
+import csv
+import glob
+import os
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select
+
+from . import bcrypt, db
+from .dashboard import invalidate_household_stats
+from .ingredients import resolve_ingredient_ids
+from .models import Household, MealPlan, PantryItem, Recipe, RecipeIngredient, User
+from .nutrition import rebuild_nutrition_rollup
+from .search import reindex_recipes
+
+SYNTHETIC_PASSWORD = 'synthetic'
+
+# --- Synthetic Data ---
+# generate_households() fills the database with households shaped like real ones, for load
+# tests and benchmarks: recipe and ingredient names, and the quantities and units recipes
+# use, are drawn from the CSV files in the uploads folder (both the export format and the
+# older RECIPE/INGREDIENT sheets), varied with qualifiers once the files run out. Each
+# household gets one member (synthetic-<household id>@example.com, password
+# SYNTHETIC_PASSWORD), recipes with macros and ingredients, a pantry biased towards what
+# its recipes use, and a meal plan running from `months` back to two weeks ahead, with the
+# past mostly eaten. Rows are written with executemany inserts and one commit per
+# household; the search index, nutrition rollup and stats are brought up to date at the end.
+MEAL_TYPES = [('Main Course', 55), ('Side Dish', 15), ('Breakfast', 10), ('Snack', 8), ('Dessert', 7), ('Meal Prep', 5)]
+SLOT_ODDS = {'Breakfast': 0.5, 'Lunch': 0.6, 'Dinner': 0.9, 'Snack': 0.2}
+CUSTOM_ITEMS = ['Takeout Night', 'Leftovers', 'Eating Out', 'Frozen Pizza']
+NAME_QUALIFIERS = ['', 'Organic', 'Fresh', 'Frozen', 'Low-Fat', 'Store Brand']
+RECIPE_STYLES = ['', 'Weeknight', 'Slow Cooker', 'Sheet Pan', 'Spicy', 'Family-Style', 'Quick']
+DAYS_AHEAD = 13
+
+
+class DataShapes:
+    """Ingredient names, recipe names and (quantity, unit) pairs read from CSV files."""
+
+    def __init__(self, folder):
+        self.ingredient_names, self.recipe_names, self.amounts = {}, {}, []
+        for path in sorted(glob.glob(os.path.join(folder, '*.csv'))):
+            with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+                self._read(list(csv.reader(f)))
+        if not (self.ingredient_names and self.recipe_names and self.amounts):
+            raise ValueError(f"{folder} has no recipe and ingredient CSV files to take the data's shape from.")
+        self.ingredient_names, self.recipe_names = list(self.ingredient_names.values()), list(self.recipe_names.values())
+
+    def _read(self, rows):
+        rows = [[cell.strip() for cell in row] for row in rows if any(cell.strip() for cell in row)]
+        if not rows:
+            return
+        header = [cell.lower() for cell in rows[0]]
+        if header[0] == 'type':
+            for row in rows[1:]:
+                if row[0] == 'RECIPE' and len(row) > 1:
+                    self.recipe_names.setdefault(row[1].lower(), row[1])
+                elif row[0] == 'INGREDIENT' and len(row) > 1:
+                    self.ingredient_names.setdefault(row[1].lower(), row[1])
+        elif 'ingredient_name' in header:
+            name, quantity, unit = (header.index(column) for column in ('ingredient_name', 'quantity', 'unit'))
+            for row in rows[1:]:
+                if len(row) > max(name, quantity, unit):
+                    self.ingredient_names.setdefault(row[name].lower(), row[name])
+                    try:
+                        self.amounts.append((float(row[quantity]), row[unit]))
+                    except ValueError:
+                        pass
+        elif 'instructions' in header and 'name' in header:
+            for row in rows[1:]:
+                if len(row) > header.index('name'):
+                    self.recipe_names.setdefault(row[header.index('name')].lower(), row[header.index('name')])
+        elif len(header) == 1:
+            for row in rows[1:] if header == ['name'] else rows:
+                self.ingredient_names.setdefault(row[0].lower(), row[0])
+
+
+def _varied(names, count, qualifiers):
+    """`count` distinct names: `names` as they are, then with each qualifier, then numbered."""
+    result = []
+    for round_number in range(count // max(len(names) * len(qualifiers), 1) + 1):
+        for qualifier in qualifiers:
+            for name in names:
+                label = f"{qualifier} {name}".strip()
+                result.append(f"{label} {round_number + 1}" if round_number else label)
+                if len(result) == count:
+                    return result
+    return result
+
+
+def _meal_plan(rng, household_id, recipes, start, today, end):
+    rows = []
+    day = start
+    while day <= end:
+        for slot, odds in SLOT_ODDS.items():
+            if rng.random() >= odds:
+                continue
+            custom = not recipes or rng.random() < 0.1
+            rows.append({'household_id': household_id, 'meal_date': day, 'meal_slot': slot,
+                         'recipe_id': None if custom else rng.choice(recipes),
+                         'custom_item_name': rng.choice(CUSTOM_ITEMS) if custom else None,
+                         'is_eaten': day < today and rng.random() < 0.8})
+        day += timedelta(days=1)
+    return rows
+
+
+def generate_households(households, recipes=150, ingredients=300, pantry=60, months=6, seed=None, shapes_folder='uploads'):
+    """Adds `households` synthetic households and commits; returns their (household id, member email) pairs."""
+    rng = random.Random(seed)
+    shapes = DataShapes(shapes_folder)
+    ingredient_ids = list(resolve_ingredient_ids(_varied(shapes.ingredient_names, ingredients, NAME_QUALIFIERS)).values())
+    recipe_names = _varied(shapes.recipe_names, recipes, RECIPE_STYLES)
+    password = bcrypt.generate_password_hash(SYNTHETIC_PASSWORD).decode('utf-8')
+    meal_types, weights = zip(*MEAL_TYPES)
+    today = date.today()
+    start = today - timedelta(days=round(months * 30.44))
+
+    created = []
+    for _ in range(households):
+        household_id = db.session.execute(insert(Household).values(name='Synthetic Household')).inserted_primary_key[0]
+        email = f'synthetic-{household_id}@example.com'
+        user_id = db.session.execute(insert(User).values(
+            email=email, password=password, household_id=household_id, subscription_plan='free', ai_credits=0
+        )).inserted_primary_key[0]
+
+        recipe_rows = []
+        for name in recipe_names:
+            calories = rng.uniform(150, 950) if rng.random() < 0.9 else None
+            recipe_rows.append({
+                'user_id': user_id, 'household_id': household_id, 'name': name[:100], 'instructions': 'Prep, cook and serve.',
+                'servings': rng.choice([2, 4, 4, 6, 8]), 'is_favorite': rng.random() < 0.15,
+                'meal_type': rng.choices(meal_types, weights)[0], 'rating': rng.choice([0, 0, 3, 4, 5]),
+                'calories': calories, 'protein': calories and calories * rng.uniform(0.02, 0.09),
+                'fat': calories and calories * rng.uniform(0.02, 0.05), 'carbs': calories and calories * rng.uniform(0.05, 0.15),
+            })
+        if recipe_rows:
+            db.session.execute(insert(Recipe.__table__), recipe_rows)
+        recipe_ids = list(db.session.scalars(select(Recipe.id).where(Recipe.household_id == household_id).order_by(Recipe.id)))
+
+        links, used = [], set()
+        for recipe_id in recipe_ids:
+            for ingredient_id in rng.sample(ingredient_ids, min(rng.randint(3, 12), len(ingredient_ids))):
+                quantity, unit = rng.choice(shapes.amounts)
+                links.append({'recipe_id': recipe_id, 'ingredient_id': ingredient_id, 'quantity': quantity, 'unit': unit})
+                used.add(ingredient_id)
+        if links:
+            db.session.execute(insert(RecipeIngredient.__table__), links)
+
+        stocked = rng.sample(sorted(used), min(int(pantry * 0.7), len(used)))
+        others = sorted(set(ingredient_ids) - set(stocked))
+        stocked += rng.sample(others, min(pantry - len(stocked), len(others)))
+        if stocked:
+            db.session.execute(insert(PantryItem.__table__), [
+                {'household_id': household_id, 'ingredient_id': ingredient_id, 'quantity': quantity, 'unit': unit}
+                for ingredient_id, (quantity, unit) in zip(stocked, (rng.choice(shapes.amounts) for _ in stocked))
+            ])
+
+        plan = _meal_plan(rng, household_id, recipe_ids, start, today, today + timedelta(days=DAYS_AHEAD))
+        if plan:
+            db.session.execute(insert(MealPlan.__table__), plan)
+        reindex_recipes(recipe_ids)
+        db.session.commit()
+        created.append((household_id, email))
+
+    household_ids = [household_id for household_id, _ in created]
+    if household_ids:
+        # The inserts above bypass the flush hooks that keep the rollup and stats.
+        rebuild_nutrition_rollup(*household_ids)
+        invalidate_household_stats(*household_ids)
+        db.session.commit()
+    return created
@@ -0,0 +1,98 @@
+from functools import lru_cache
+
+import pint
+
+from .instrumentation import timed
+
+# --- Unit Conversion (Pint) Setup ---
+ureg = pint.UnitRegistry()
+ureg.load_definitions('app/unit_definitions.txt')
+
+def sanitize_unit(unit_str):
+    if not unit_str:
+        return "dimensionless"
+    cleaned_unit = unit_str.lower().strip().rstrip('s')
+    if not cleaned_unit:
+        return "dimensionless"
+    unit_map = {
+        'oz': 'fluid_ounce', 'ounce': 'fluid_ounce', 'lb': 'pound', 'cup': 'cup',
+        'tsp': 'teaspoon', 'teaspoon': 'teaspoon', 'tbsp': 'tablespoon', 'tablespoon': 'tablespoon',
+        'g': 'gram', 'gram': 'gram', 'kg': 'kilogram', 'ml': 'milliliter', 'stick': 'stick_of_butter',
+        'slice': 'slice', 'each': 'each', 'clove': 'clove', 'head': 'head', 'sprig': 'sprig',
+        'bunch': 'bunch', 'stalk': 'stalk', 'ear': 'ear', 'fillet': 'fillet', 'leaf': 'leaf',
+        'piece': 'piece', 'pat': 'pat', 'link': 'link', 'strip': 'strip', 'sheet': 'sheet',
+    }
+    return unit_map.get(cleaned_unit, cleaned_unit)
+
+# --- Compiled Unit Conversions ---
+# Pint parses unit strings and builds Quantity objects on every call, which dominates the
+# shopping list and pantry deduction loops. Each raw unit string is parsed once into a
+# (magnitude, units) pair and each pair of units into a float factor, so per-line work is
+# plain float arithmetic that gives the same results as `value * ureg(sanitize_unit(unit))`
+# followed by `.to()`. Only the cache misses reach Pint, and they are timed as 'pint'.
+
+
+class _ParseFailure(tuple):
+    """The type and args of the error Pint raised for a unit string, cached in place of the error itself."""
+
+
+@lru_cache(maxsize=1024)
+def _compile_unit(unit_str):
+    try:
+        with timed('pint'):
+            parsed = ureg(sanitize_unit(unit_str))
+    except (pint.errors.UndefinedUnitError, pint.errors.DimensionalityError) as e:
+        # Unknown names, or expressions like "1-2 cups" that Pint rejects while parsing.
+        return _ParseFailure((type(e), e.args))
+    if not isinstance(parsed, ureg.Quantity):
+        # A bare number such as "2": a dimensionless multiplier.
+        return float(parsed), ureg.dimensionless
+    return parsed.magnitude, parsed.units
+
+
+def parse_quantity(value, unit_str):
+    """
+    Returns (magnitude, units) for `value` in the raw unit string `unit_str`, the same
+    quantity Pint gives for `value * ureg(sanitize_unit(unit_str))`, and raises the same
+    UndefinedUnitError or DimensionalityError when Pint can't parse the unit.
+    """
+    compiled = _compile_unit(unit_str)
+    if isinstance(compiled, _ParseFailure):
+        # A new error per call: one cached instance would be shared, and its traceback
+        # rewritten, by every request and thread that raised it.
+        error_type, args = compiled
+        raise error_type(*args)
+    magnitude, units = compiled
+    return value * magnitude, units
+
+
+@lru_cache(maxsize=1024)
+def conversion_factor(from_units, to_units):
+    """Float factor from `from_units` to `to_units`, or None when they measure different dimensions."""
+    if from_units == to_units:
+        return 1.0
+    try:
+        with timed('pint'):
+            return ureg.Quantity(1.0, from_units).to(to_units).magnitude
+    except pint.errors.DimensionalityError:
+        return None
+
+
+def convert(magnitude, from_units, to_units):
+    """Converts a magnitude between units returned by parse_quantity(); None when incompatible."""
+    factor = conversion_factor(from_units, to_units)
+    return None if factor is None else magnitude * factor
+
+
+@lru_cache(maxsize=1024)
+def base_unit_factor(units):
+    """(factor, dimension) taking `units` to the registry's base unit for its dimension, e.g. cup -> m**3."""
+    with timed('pint'):
+        base = ureg.Quantity(1.0, units).to_base_units()
+    return base.magnitude, str(base.dimensionality)
+
+
+def clear_unit_caches():
+    _compile_unit.cache_clear()
+    conversion_factor.cache_clear()
+    base_unit_factor.cache_clear()
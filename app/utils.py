@@ -1,29 +1,29 @@
 import os
-import pint
 import smtplib
-import logging
 from email.message import EmailMessage
 from flask import flash, url_for, current_app
 from . import db, s
-from .models import Achievement, UserAchievement, PantryItem, Ingredient
+from .models import Achievement, UserAchievement
 
 # --- Achievement Utilities ---
-def award_achievement(user, achievement_name):
+def achievement_message(achievement):
+    return f'🏆 Achievement Unlocked: {achievement.name}! - {achievement.description}'
+
+def award_achievement(user, achievement_name, notify=True):
+    """Unlocks an achievement once per user. Returns it when newly unlocked; `notify=False` skips the flash (for code running outside a request)."""
     achievement = db.session.query(Achievement).filter_by(name=achievement_name).first()
     if not achievement:
         print(f"WARN: Achievement '{achievement_name}' not found in database.")
-        return
+        return None
     exists = db.session.query(UserAchievement).filter_by(user_id=user.id, achievement_id=achievement.id).first()
-    if not exists:
-        new_unlock = UserAchievement(user_id=user.id, achievement_id=achievement.id)
-        db.session.add(new_unlock)
-        db.session.commit()
-        flash(f'🏆 Achievement Unlocked: {achievement.name}! - {achievement.description}', 'success')
-
-# --- Credit Utilities ---
-def deduct_ai_credit(user):
-    if user.subscription_plan != 'elite' and user.ai_credits > 0:
-        user.ai_credits -= 1
+    if exists:
+        return None
+    new_unlock = UserAchievement(user_id=user.id, achievement_id=achievement.id)
+    db.session.add(new_unlock)
+    db.session.commit()
+    if notify:
+        flash(achievement_message(achievement), 'success')
+    return achievement
 
 # --- Data Conversion Utilities ---
 def convert_quantity_to_float(quantity_str):
@@ -49,74 +49,6 @@ def convert_quantity_to_float(quantity_str):
     except (ValueError, ZeroDivisionError):
         return 0.0
 
-# --- Unit Conversion (Pint) Setup ---
-ureg = pint.UnitRegistry()
-ureg.load_definitions('app/unit_definitions.txt')
-
-def sanitize_unit(unit_str):
-    if not unit_str:
-        return "dimensionless"
-    cleaned_unit = unit_str.lower().strip().rstrip('s')
-    if not cleaned_unit:
-        return "dimensionless"
-    unit_map = {
-        'oz': 'fluid_ounce', 'ounce': 'fluid_ounce', 'lb': 'pound', 'cup': 'cup',
-        'tsp': 'teaspoon', 'teaspoon': 'teaspoon', 'tbsp': 'tablespoon', 'tablespoon': 'tablespoon',
-        'g': 'gram', 'gram': 'gram', 'kg': 'kilogram', 'ml': 'milliliter', 'stick': 'stick_of_butter',
-        'slice': 'slice', 'each': 'each', 'clove': 'clove', 'head': 'head', 'sprig': 'sprig',
-        'bunch': 'bunch', 'stalk': 'stalk', 'ear': 'ear', 'fillet': 'fillet', 'leaf': 'leaf',
-        'piece': 'piece', 'pat': 'pat', 'link': 'link', 'strip': 'strip', 'sheet': 'sheet',
-    }
-    return unit_map.get(cleaned_unit, cleaned_unit)
-
-def consume_ingredients_from_recipe(user, recipe):
-    updated, skipped = [], []
-    all_pantry_items = PantryItem.query.filter_by(household_id=user.household_id).all()
-
-    for req_ing in recipe.ingredients:
-        if not req_ing.quantity or req_ing.quantity <= 0:
-            continue
-
-        pantry_item = next((item for item in all_pantry_items if item.ingredient_id == req_ing.ingredient_id), None)
-        
-        if not pantry_item:
-            search_term = req_ing.ingredient.name.lower()
-            # THIS IS THE FIX: The search is now bidirectional
-            substitutes = [
-                item for item in all_pantry_items 
-                if search_term in item.ingredient.name.lower() or item.ingredient.name.lower() in search_term
-            ]
-            if len(substitutes) == 1:
-                pantry_item = substitutes[0]
-            elif len(substitutes) > 1:
-                sub_names = ", ".join([s.ingredient.name for s in substitutes])
-                skipped.append(f"{req_ing.ingredient.name} (Multiple substitutes found: {sub_names})")
-                continue
-
-        if not pantry_item:
-            continue
-        
-        try:
-            recipe_qty = req_ing.quantity * ureg(sanitize_unit(req_ing.unit))
-            pantry_qty = pantry_item.quantity * ureg(sanitize_unit(pantry_item.unit))
-            
-            if not recipe_qty.is_compatible_with(pantry_qty):
-                raise pint.errors.DimensionalityError(pantry_qty.units, recipe_qty.units)
-
-            new_pantry_qty = pantry_qty - recipe_qty.to(pantry_qty.units)
-            pantry_item.quantity = max(0, new_pantry_qty.to(pantry_qty.units).magnitude)
-            updated.append(pantry_item.ingredient.name)
-
-        except pint.errors.DimensionalityError as e:
-            skipped.append(f"{pantry_item.ingredient.name} (Cannot convert pantry unit '{e.units1}' to recipe unit '{e.units2}')")
-        except pint.errors.UndefinedUnitError as e:
-            skipped.append(f"{pantry_item.ingredient.name} (The unit '{e.unit_name}' is not recognized)")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred during pantry deduction for item '{pantry_item.ingredient.name}': {e}", exc_info=True)
-            skipped.append(f"{pantry_item.ingredient.name} (An unexpected error occurred: {repr(e)})")
-    
-    return updated, skipped
-
 # --- Email Utilities ---
 def send_reset_email(user_email):
     token = s.dumps(user_email, salt='password-reset-salt')
@@ -0,0 +1,132 @@
+"""
+URL import latency: one structured model call vs. the old recipe-then-nutrition calls,
+and pages whose schema.org JSON-LD skips the model altogether.
+
+Serves recipe pages locally and runs imports through the job pipeline with the fake
+model client, which sleeps --latency seconds per call like a slow model would. The
+"two calls" variant has the model leave nutrition out of the extraction, which forces
+the separate nutrition call the import used to always make; the "json-ld" variant
+imports a page that embeds a complete schema.org Recipe. Prints p50/p95 per stage from
+the jobs' recorded timings.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --imports 40 --latency 1.5
+"""
+import argparse
+import http.server
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+ARTICLE = ("<article><h1>Weeknight Chicken Soup</h1>"
+           + "Simmer the chicken with onions, carrots and celery in stock until tender. " * 20
+           + "</article>")
+JSON_LD = json.dumps({
+    '@context': 'https://schema.org', '@type': 'Recipe', 'name': 'Weeknight Chicken Soup', 'recipeYield': '4 servings',
+    'recipeIngredient': ['1 lb chicken thighs', '2 carrots, sliced', '1 onion, diced', '6 cups chicken stock'],
+    'recipeInstructions': [{'@type': 'HowToStep', 'text': 'Simmer everything in the stock until the chicken is tender.'}],
+    'nutrition': {'@type': 'NutritionInformation', 'calories': '310 kcal', 'proteinContent': '28 g',
+                  'fatContent': '12 g', 'carbohydrateContent': '18 g'},
+})
+PAGES = {
+    '/soup': f"<html><body>{ARTICLE}</body></html>".encode(),
+    '/soup-json-ld': (f'<html><head><script type="application/ld+json">{JSON_LD}</script></head>'
+                      f"<body>{ARTICLE}</body></html>").encode(),
+}
+
+
+class PageHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.end_headers()
+        self.wfile.write(PAGES[self.path])
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_variant(app, user, url, imports, fake_responses):
+    from app import db
+    from app.jobs import enqueue_job
+
+    app.config['AI_FAKE_RESPONSES'] = fake_responses
+    app.extensions.pop('ai_client', None)
+    timings = []
+    for _ in range(imports):
+        job = enqueue_job('import_recipe', user, {'url': url})
+        db.session.refresh(job)
+        if job.status != 'succeeded':
+            raise SystemExit(f'Import failed: {job.error}')
+        stages = dict(job.timings)
+        stages['total'] = sum(stages.values())
+        timings.append(stages)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--imports', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds per fake model call.')
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/soup'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'import.db')}", AI_MODEL_CLIENT='fake',
+                          AI_JOBS_INLINE='1', AI_CACHE_ENABLED='false', IMPORT_HOST_INTERVAL='0')
+        from flask_migrate import upgrade
+        from sqlalchemy import insert
+        from app import create_app, db
+        from app.ai_client import FAKE_RESPONSES
+        from app.models import Household, User
+
+        app = create_app()
+        app.config['AI_FAKE_LATENCY'] = args.latency
+        with app.app_context():
+            upgrade(directory=os.path.join(ROOT, 'migrations'))
+            household_id = db.session.execute(insert(Household).values(name='Bench')).inserted_primary_key[0]
+            user = User(email='bench@example.com', password='x', household_id=household_id, ai_credits=0,
+                        subscription_plan='elite')
+            db.session.add(user)
+            db.session.commit()
+
+            without_nutrition = {'import_recipe': json.dumps(FAKE_RESPONSES['recipe'](''))}
+            variants = [('two calls', run_variant(app, user, url, args.imports, without_nutrition)),
+                        ('one call', run_variant(app, user, url, args.imports, None)),
+                        ('json-ld', run_variant(app, user, url + '-json-ld', args.imports, None))]
+            db.session.remove()
+            db.engine.dispose()
+    server.shutdown()
+
+    stages = ['fetch', 'scan', 'reduce', 'extract', 'nutrition', 'save', 'total']
+    print(f"{'variant':<10} " + ' '.join(f'{s + " p50/p95":>20}' for s in stages))
+    for label, timings in variants:
+        cells = []
+        for stage in stages:
+            values = [t[stage] for t in timings if stage in t]
+            cells.append(f'{percentile(values, 50):>9.1f}/{percentile(values, 95):<10.1f}' if values else f'{"-":>20}')
+        print(f'{label:<10} ' + ' '.join(cells))
+    before = statistics.median(t['total'] for t in variants[0][1])
+    print()
+    for label, timings in variants[1:]:
+        after = statistics.median(t['total'] for t in timings)
+        print(f'p50 import latency, {label}: {before:.0f} ms -> {after:.0f} ms ({after / before:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Saving a generated meal plan: the bulk plan writer vs. the old one-object-per-meal save.
+
+Builds a scratch database with one household and saves generated week and month plans
+of one to four slots a day, each onto an empty range and then over the previous plan
+with every other meal changed. Prints statements executed and time per save; the
+writer's statement count stays the same whatever the plan's size.
+
+    python benchmarks/bench_plan_save.py
+    python benchmarks/bench_plan_save.py --database-url postgresql://localhost/meal_bench
+
+A --database-url must point at an empty scratch database: it is migrated and filled
+with benchmark rows.
+"""
+import argparse
+import calendar
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SLOTS = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+
+
+def seed(db, rng):
+    from sqlalchemy import insert
+    from app.models import Household, User, Recipe
+
+    household_id = db.session.execute(insert(Household).values(name='Plan Benchmark')).inserted_primary_key[0]
+    user_id = db.session.execute(insert(User).values(
+        email=f'plan-bench-{household_id}@example.com', password='x', household_id=household_id,
+        subscription_plan='free', ai_credits=0
+    )).inserted_primary_key[0]
+    db.session.execute(insert(Recipe), [
+        {'user_id': user_id, 'household_id': household_id, 'name': f'Recipe {i}', 'instructions': 'Cook.',
+         'is_favorite': False, 'meal_type': 'Main Course', 'rating': 0} for i in range(200)
+    ])
+    db.session.commit()
+    return household_id, [rid for (rid,) in db.session.query(Recipe.id).filter_by(household_id=household_id)]
+
+
+def generated_plan(rng, recipe_ids, days, slots):
+    # What the model returns: recipe ids, plus takeout nights and leftovers without one.
+    return {day: {slot: ({'id': rng.choice(recipe_ids), 'name': 'Recipe'} if rng.random() < 0.85
+                         else {'id': None, 'name': rng.choice(['Takeout Night', 'Leftovers'])})
+                  for slot in slots} for day in days}
+
+
+def old_save(db, household_id, plan_data, dates, start, end):
+    from app.dashboard import invalidate_household_stats
+    from app.models import MealPlan
+
+    MealPlan.query.filter(MealPlan.household_id == household_id, MealPlan.meal_date.between(start, end)).delete(synchronize_session=False)
+    invalidate_household_stats(household_id)
+    for day, meals in plan_data.items():
+        for slot, meal in meals.items():
+            if meal and meal.get('name') and meal['name'] != 'Unplanned':
+                db.session.add(MealPlan(household_id=household_id, meal_date=dates[day], meal_slot=slot, recipe_id=meal.get('id'),
+                                        custom_item_name=None if meal.get('id') else meal.get('name')))
+    db.session.commit()
+
+
+def new_save(db, household_id, plan_data, dates, start, end):
+    from app.meal_plans import entries_from_ai_plan, write_plan
+
+    write_plan(household_id, start, end, entries_from_ai_plan(household_id, plan_data, dates))
+    db.session.commit()
+
+
+def measure(db, save, *args):
+    from sqlalchemy import event
+
+    statements = []
+
+    def count(*_):
+        statements.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    started = time.perf_counter()
+    try:
+        save(db, *args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return len(statements), (time.perf_counter() - started) * 1000
+
+
+def run(database_url, repeat):
+    os.environ['DATABASE_URL'] = database_url
+    from flask_migrate import upgrade
+    from app import create_app, db
+
+    app = create_app()
+    results = []
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
+        rng = random.Random(7)
+        household_id, recipe_ids = seed(db, rng)
+        year, month = 2030, 1
+        month_end = date(year, month, calendar.monthrange(year, month)[1])
+        month_dates = {str(day): date(year, month, day) for day in range(1, month_end.day + 1)}
+        week_dates = {name: date(year, month, 7 + i) for i, name in enumerate(
+            ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])}
+        for label, dates in (('week', week_dates), ('month', month_dates)):
+            start, end = min(dates.values()), max(dates.values())
+            for slot_count in range(1, len(SLOTS) + 1):
+                slots = SLOTS[:slot_count]
+                for path, save in (('one-by-one', old_save), ('bulk writer', new_save)):
+                    empty, resave = [], []
+                    for _ in range(repeat):
+                        db.session.execute(db.text('DELETE FROM meal_plan'))
+                        db.session.commit()
+                        plan = generated_plan(rng, recipe_ids, dates, slots)
+                        empty.append(measure(db, save, household_id, plan, dates, start, end))
+                        for day in list(plan)[::2]:
+                            plan[day] = generated_plan(rng, recipe_ids, [day], slots)[day]
+                        resave.append(measure(db, save, household_id, plan, dates, start, end))
+                    for kind, samples in (('empty', empty), ('resave', resave)):
+                        results.append((label, len(dates) * slot_count, path, kind, samples[0][0],
+                                        statistics.median(ms for _, ms in samples)))
+        db.session.remove()
+        db.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Scratch database to use instead of a temporary SQLite file.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'plan':<6} {'meals':>5}  {'path':<12} {'onto':<7} {'statements':>10} {'p50 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        for label, meals, path, kind, statements, ms in run(url, args.repeat):
+            print(f"{label:<6} {meals:>5}  {path:<12} {kind:<7} {statements:>10} {ms:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Latency and query counts of the hot routes, with JSON baselines to catch regressions.
+
+Migrates a scratch database, fills it with synthetic households (see app/synthetic.py,
+also available as `flask generate-synthetic-data`) and drives each route below through
+the Flask test client as the households' members, round robin. Prints p50/p95/p99
+latency and the most statements any one request sent. --save writes the results as the
+baseline for the database in use (benchmarks/baselines/routes-<dialect>.json); without
+it, a run is compared against that baseline when there is one and exits non-zero if a
+route now sends more statements, or its p50 grew by more than --tolerance.
+
+    python benchmarks/bench_routes.py
+    python benchmarks/bench_routes.py --database-url postgresql://localhost/meal_bench
+    python benchmarks/bench_routes.py --households 10 --months 12 --save
+
+A --database-url must point at an empty scratch database: it is migrated and filled
+with benchmark rows. Latency baselines only mean something on the machine that wrote
+them; statement counts hold anywhere.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+
+
+def _mark_eaten(request_number):
+    # Toggles a past dinner, which deducts the recipe from the pantry on every other call.
+    day = date.today() - timedelta(days=1 + request_number // 2 % 14)
+    return {'json': {'date': day.isoformat(), 'slot': 'Dinner'}}
+
+
+# (label, method, path, request keyword arguments by request number)
+ROUTES = [
+    ('dashboard', 'GET', '/', None),
+    ('recipes in pantry', 'GET', '/recipes?filter=pantry', None),
+    ('shopping list', 'GET', '/shopping-list', None),
+    ('monthly plan', 'GET', '/monthly-plan', None),
+    ('mark meal eaten', 'POST', '/api/mark-meal-eaten', _mark_eaten),
+]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def run(database_url, args):
+    os.environ['DATABASE_URL'] = database_url
+    from flask_migrate import upgrade
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.synthetic import generate_households
+
+    app = create_app()
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        members = generate_households(args.households, recipes=args.recipes, ingredients=args.ingredients,
+                                      pantry=args.pantry, months=args.months, seed=args.seed,
+                                      shapes_folder=os.path.join(ROOT, 'uploads'))
+        from app.models import User
+        user_ids = [db.session.query(User.id).filter_by(email=email).scalar() for _, email in members]
+        dialect = db.engine.dialect.name
+        db.session.remove()
+
+        clients = []
+        for user_id in user_ids:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+            clients.append(client)
+
+        statements = []
+
+        def count(*_):
+            statements.append(1)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        results = {}
+        try:
+            for label, method, path, arguments in ROUTES:
+                timings, queries = [], []
+                for number in range(-len(clients), args.requests):
+                    client = clients[number % len(clients)]
+                    statements.clear()
+                    started = time.perf_counter()
+                    response = client.open(path, method=method, **(arguments(number) if arguments else {}))
+                    elapsed = (time.perf_counter() - started) * 1000
+                    if response.status_code != 200:
+                        raise SystemExit(f"{method} {path} returned {response.status_code}: {response.get_data(as_text=True)[:300]}")
+                    if number >= 0:  # The first round warms each household's caches.
+                        timings.append(elapsed)
+                        queries.append(len(statements))
+                results[label] = {
+                    'p50_ms': round(percentile(timings, 0.50), 2),
+                    'p95_ms': round(percentile(timings, 0.95), 2),
+                    'p99_ms': round(percentile(timings, 0.99), 2),
+                    'queries': max(queries),
+                }
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+            db.session.remove()
+            db.engine.dispose()
+    return dialect, results
+
+
+def compare(results, baseline, tolerance):
+    """The regressions of `results` against `baseline`, as messages."""
+    problems = []
+    for label, now in results.items():
+        before = baseline['routes'].get(label)
+        if before is None:
+            continue
+        if now['queries'] > before['queries']:
+            problems.append(f"{label}: {now['queries']} statements, baseline {before['queries']}")
+        if now['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            problems.append(f"{label}: p50 {now['p50_ms']:.2f} ms, baseline {before['p50_ms']:.2f} ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Scratch database to use instead of a temporary SQLite file.')
+    parser.add_argument('--households', type=int, default=3)
+    parser.add_argument('--recipes', type=int, default=150, help='Recipes per household.')
+    parser.add_argument('--ingredients', type=int, default=300)
+    parser.add_argument('--pantry', type=int, default=60, help='Pantry items per household.')
+    parser.add_argument('--months', type=float, default=6, help='Months of meal plan history per household.')
+    parser.add_argument('--requests', type=int, default=30, help='Timed requests per route.')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--baseline', help='Baseline file to compare with or --save to; defaults to one per database.')
+    parser.add_argument('--save', action='store_true', help='Write the results as the new baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed p50 growth over the baseline (0.5 = 50%%).')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        dialect, results = run(url, args)
+
+    print(f"{'route':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for label, result in results.items():
+        print(f"{label:<18} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['queries']:>8}")
+
+    path = args.baseline or os.path.join(BASELINE_DIR, f'routes-{dialect}.json')
+    params = {name: getattr(args, name) for name in ('households', 'recipes', 'ingredients', 'pantry', 'months', 'requests', 'seed')}
+    if args.save:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'database': dialect, 'python': platform.python_version(), 'machine': platform.machine(),
+                       'params': params, 'routes': results}, f, indent=2)
+            f.write('\n')
+        print(f"Saved the baseline to {os.path.relpath(path)}.")
+    elif os.path.exists(path):
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline['params'] != params:
+            print(f"Not compared: {os.path.relpath(path)} was written with {baseline['params']}.")
+            return
+        problems = compare(results, baseline, args.tolerance)
+        if problems:
+            print(f"Regressions against {os.path.relpath(path)}:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print(f"No regressions against {os.path.relpath(path)}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Recipe search latency: full-text index vs. the old ILIKE scan.
+
+Builds a scratch database per size, fills one household with synthetic recipes and
+times both search paths for a fixed set of queries.
+
+    python benchmarks/bench_search.py                     # SQLite, 1k/10k/100k recipes
+    python benchmarks/bench_search.py --sizes 1000 5000
+    python benchmarks/bench_search.py --database-url postgresql://localhost/meal_bench
+
+A --database-url must point at an empty scratch database: it is migrated and filled
+with benchmark rows, one size after another.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYLLABLES = ['ba', 'ko', 'ri', 'ta', 'mel', 'zu', 'quin', 'sha', 'lo', 'pe', 'dra', 'vi', 'no', 'ches', 'tor', 'gam']
+QUERY_COUNT = 12
+
+
+def _vocabulary(rng, size=3000):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _sentence(rng, words, n):
+    return ' '.join(rng.choice(words) for _ in range(n))
+
+
+def seed(db, size, rng, words):
+    from sqlalchemy import insert, text
+    from app.models import Household, User, Recipe, Ingredient, RecipeIngredient
+    from app.search import reindex_recipes
+
+    household_id = db.session.execute(insert(Household).values(name='Search Benchmark')).inserted_primary_key[0]
+    user_id = db.session.execute(insert(User).values(
+        email=f'search-bench-{household_id}@example.com', password='x', household_id=household_id,
+        subscription_plan='free', ai_credits=0
+    )).inserted_primary_key[0]
+
+    ingredient_ids = [db.session.execute(insert(Ingredient).values(name=f'{word} {household_id}')).inserted_primary_key[0]
+                      for word in rng.sample(words, 200)]
+    for start in range(0, size, 1000):
+        rows = [{'user_id': user_id, 'household_id': household_id, 'name': _sentence(rng, words, 3).title(),
+                 'instructions': '\n'.join(_sentence(rng, words, 12) for _ in range(6)), 'is_favorite': False,
+                 'meal_type': 'Main Course', 'rating': 0} for _ in range(min(1000, size - start))]
+        db.session.execute(insert(Recipe), rows)
+    recipe_ids = [rid for (rid,) in db.session.query(Recipe.id).filter_by(household_id=household_id)]
+    db.session.execute(insert(RecipeIngredient), [
+        {'recipe_id': rid, 'ingredient_id': ing_id, 'quantity': 1, 'unit': 'cup'}
+        for rid in recipe_ids for ing_id in rng.sample(ingredient_ids, 4)
+    ])
+    reindex_recipes(recipe_ids)
+    db.session.commit()
+    # Refresh planner statistics the way autovacuum would after a bulk load.
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    return household_id
+
+
+def time_queries(run, queries, repeat):
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def bench_size(size, database_url, repeat):
+    os.environ['DATABASE_URL'] = database_url
+    from flask_migrate import upgrade
+    from app import create_app, db
+    from app.models import Recipe
+    from app.search import search_recipes, _backend_cache
+
+    app = create_app()
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
+        _backend_cache.clear()
+        rng = random.Random(size)
+        words = _vocabulary(rng)
+        household_id = seed(db, size, rng, words)
+        queries = [rng.choice(words) for _ in range(QUERY_COUNT // 2)] + \
+                  [f'{rng.choice(words)} {rng.choice(words)[:4]}' for _ in range(QUERY_COUNT // 2)]
+
+        def base():
+            return Recipe.query.filter_by(household_id=household_id)
+
+        # The recipe list loads every match; autocomplete takes the first ten.
+        def fts_list(query):
+            return search_recipes(base(), query).all()
+
+        def ilike_list(query):
+            term = f'%{query}%'
+            return base().filter(db.or_(Recipe.name.ilike(term), Recipe.instructions.ilike(term))).all()
+
+        def fts_autocomplete(query):
+            return search_recipes(base(), query, fields=('name',)).limit(10).all()
+
+        def ilike_autocomplete(query):
+            return base().filter(Recipe.name.ilike(f'%{query}%')).limit(10).all()
+
+        results = {name: time_queries(fn, queries, repeat) for name, fn in (
+            ('list/full-text', fts_list), ('list/ilike', ilike_list),
+            ('auto/full-text', fts_autocomplete), ('auto/ilike', ilike_autocomplete))}
+        db.session.remove()
+        db.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--database-url', help='Scratch database to use instead of a temporary SQLite file per size.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'recipes':>8}  {'path':<15} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            for path, (p50, p95) in bench_size(size, url, args.repeat).items():
+                print(f"{size:>8}  {path:<15} {p50:>9.2f} {p95:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Unit conversion micro-benchmarks: the compiled factors in app/units.py vs. Pint.
+
+Times the three conversion patterns the app runs per ingredient line (shopping list
+shortfall, pantry deduction, pantry restock) both ways, after checking that both give
+identical results for every pair of units in UNIT_STRINGS.
+
+    python benchmarks/bench_units.py
+    python benchmarks/bench_units.py --lines 50000 --repeat 7
+
+Exits non-zero if the compiled path disagrees with Pint anywhere.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# unit_definitions.txt is loaded relative to the working directory, as under gunicorn.
+os.chdir(ROOT)
+
+import pint  # noqa: E402
+
+from app.units import ureg, sanitize_unit, parse_quantity, convert  # noqa: E402
+
+# What recipe and pantry rows actually contain: the sanitize_unit() aliases, plurals and
+# casing variants, the custom units from app/unit_definitions.txt, and free-text junk.
+UNIT_STRINGS = [
+    '', None, 'cup', 'Cups', 'tsp', 'tbsp', 'Tablespoons', 'teaspoon', 'oz', 'ounces', 'lb', 'lbs',
+    'g', 'grams', 'kg', 'ml', 'liter', 'quart', 'pint', 'gallon', 'stick', 'sticks', 'pinch', 'dash',
+    'smidgen', 'drop', 'each', 'clove', 'cloves', 'head', 'sprig', 'bunch', 'stalk', 'ear', 'fillet',
+    'leaf', 'leaves', 'piece', 'pat', 'link', 'strip', 'sheet', 'slice', 'can_beans_15oz',
+    'can_tomatoes_14oz', 'can_tomatoes_28oz', 'can_tomato_paste_6oz', 'package_yeast',
+    'envelope_yeast', 'bouillon_cube', '10 oz', '1/2 cup', '1-2 cups', 'large', 'to taste', 'handful',
+]
+QUANTITIES = [0.25, 0.5, 1, 1.5, 2, 3.3, 7, 12.75, 100]
+
+
+# --- Reference (Pint) implementations, as the routes used to compute them ---
+def pint_shortfall(needed, recipe_unit, have, pantry_unit):
+    required_qty = needed * ureg(sanitize_unit(recipe_unit))
+    pantry_qty = have * ureg(sanitize_unit(pantry_unit))
+    if not required_qty.is_compatible_with(pantry_qty):
+        return 'incompatible'
+    if pantry_qty.to(required_qty.units) >= required_qty:
+        return None
+    amount_to_buy = required_qty - pantry_qty.to(required_qty.units)
+    return amount_to_buy.magnitude, str(amount_to_buy.units)
+
+
+def pint_deduct(needed, recipe_unit, have, pantry_unit):
+    recipe_qty = needed * ureg(sanitize_unit(recipe_unit))
+    pantry_qty = have * ureg(sanitize_unit(pantry_unit))
+    if not recipe_qty.is_compatible_with(pantry_qty):
+        return 'incompatible'
+    new_pantry_qty = pantry_qty - recipe_qty.to(pantry_qty.units)
+    return max(0, new_pantry_qty.to(pantry_qty.units).magnitude)
+
+
+def pint_restock(adding, new_unit, have, pantry_unit):
+    existing_qty = have * ureg(sanitize_unit(pantry_unit))
+    new_qty = adding * ureg(sanitize_unit(new_unit))
+    if existing_qty.is_compatible_with(new_qty):
+        return (existing_qty + new_qty.to(existing_qty.units)).magnitude
+    return have + adding
+
+
+# --- Compiled implementations, as the routes compute them now ---
+def compiled_shortfall(needed, recipe_unit, have, pantry_unit):
+    required_qty, required_units = parse_quantity(needed, recipe_unit)
+    pantry_qty, pantry_units = parse_quantity(have, pantry_unit)
+    pantry_in_required = convert(pantry_qty, pantry_units, required_units)
+    if pantry_in_required is None:
+        return 'incompatible'
+    if pantry_in_required >= required_qty:
+        return None
+    return required_qty - pantry_in_required, str(required_units)
+
+
+def compiled_deduct(needed, recipe_unit, have, pantry_unit):
+    recipe_qty, recipe_units = parse_quantity(needed, recipe_unit)
+    pantry_qty, pantry_units = parse_quantity(have, pantry_unit)
+    recipe_in_pantry_units = convert(recipe_qty, recipe_units, pantry_units)
+    if recipe_in_pantry_units is None:
+        return 'incompatible'
+    return max(0, pantry_qty - recipe_in_pantry_units)
+
+
+def compiled_restock(adding, new_unit, have, pantry_unit):
+    existing_qty, existing_units = parse_quantity(have, pantry_unit)
+    new_qty, new_units = parse_quantity(adding, new_unit)
+    new_in_existing = convert(new_qty, new_units, existing_units)
+    if new_in_existing is not None:
+        return existing_qty + new_in_existing
+    return have + adding
+
+
+PATTERNS = [
+    ('shopping shortfall', pint_shortfall, compiled_shortfall),
+    ('pantry deduction', pint_deduct, compiled_deduct),
+    ('pantry restock', pint_restock, compiled_restock),
+]
+
+
+def outcome(fn, *args):
+    try:
+        return fn(*args)
+    except (pint.errors.UndefinedUnitError, pint.errors.DimensionalityError) as e:
+        return (type(e).__name__, str(e))
+
+
+def check_equivalence():
+    mismatches = 0
+    for label, reference, compiled in PATTERNS:
+        for unit_a in UNIT_STRINGS:
+            for unit_b in UNIT_STRINGS:
+                for qty_a, qty_b in zip(QUANTITIES, reversed(QUANTITIES)):
+                    expected = outcome(reference, qty_a, unit_a, qty_b, unit_b)
+                    actual = outcome(compiled, qty_a, unit_a, qty_b, unit_b)
+                    if expected != actual:
+                        mismatches += 1
+                        if mismatches <= 10:
+                            print(f'MISMATCH {label}: {qty_a} {unit_a!r} / {qty_b} {unit_b!r}: {expected!r} != {actual!r}')
+    return mismatches
+
+
+def time_pattern(fn, lines, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for args in lines:
+            outcome(fn, *args)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) / len(lines) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=5000, help='Ingredient lines per timed run.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence()
+    print(f'equivalence: {len(UNIT_STRINGS) ** 2 * len(QUANTITIES) * len(PATTERNS)} cases, {mismatches} mismatches\n')
+
+    rng = random.Random(7)
+    lines = [(rng.choice(QUANTITIES), rng.choice(UNIT_STRINGS), rng.choice(QUANTITIES), rng.choice(UNIT_STRINGS))
+             for _ in range(args.lines)]
+    print(f"{'pattern':<20} {'pint us/line':>13} {'compiled us/line':>17} {'speedup':>8}")
+    for label, reference, compiled in PATTERNS:
+        pint_us = time_pattern(reference, lines, args.repeat)
+        compiled_us = time_pattern(compiled, lines, args.repeat)
+        print(f'{label:<20} {pint_us:>13.2f} {compiled_us:>17.2f} {pint_us / compiled_us:>7.1f}x')
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
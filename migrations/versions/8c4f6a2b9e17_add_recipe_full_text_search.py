@@ -0,0 +1,65 @@
+"""Add recipe full-text search
+
+Revision ID: 8c4f6a2b9e17
+Revises: 5e1a0c7f3d28
+Create Date: 2026-10-16 11:20:05.734118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f6a2b9e17'
+down_revision = '5e1a0c7f3d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Hand-written: the search structures are dialect specific and are not part of the
+    # model metadata (see include_object in migrations/env.py).
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.add_column('recipe', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.create_index('ix_recipe_search_vector', 'recipe', ['search_vector'], unique=False, postgresql_using='gin')
+        op.execute("""
+            UPDATE recipe SET search_vector =
+                setweight(to_tsvector('english', coalesce(recipe.name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(names.ingredients, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(recipe.instructions, '')), 'C')
+            FROM (
+                SELECT recipe.id AS recipe_id, string_agg(ingredient.name, ' ') AS ingredients
+                FROM recipe
+                LEFT JOIN recipe_ingredient ON recipe_ingredient.recipe_id = recipe.id
+                LEFT JOIN ingredient ON ingredient.id = recipe_ingredient.ingredient_id
+                GROUP BY recipe.id
+            ) AS names
+            WHERE recipe.id = names.recipe_id
+        """)
+    elif dialect == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE recipe_fts USING fts5(
+                name, instructions, ingredients,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+        op.execute("""
+            INSERT INTO recipe_fts (rowid, name, instructions, ingredients)
+            SELECT recipe.id, recipe.name, recipe.instructions, COALESCE(group_concat(ingredient.name, ' '), '')
+            FROM recipe
+            LEFT JOIN recipe_ingredient ON recipe_ingredient.recipe_id = recipe.id
+            LEFT JOIN ingredient ON ingredient.id = recipe_ingredient.ingredient_id
+            GROUP BY recipe.id
+        """)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_recipe_search_vector', table_name='recipe', postgresql_using='gin')
+        op.drop_column('recipe', 'search_vector')
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS recipe_fts")
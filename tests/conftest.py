@@ -0,0 +1,82 @@
+import os
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Any request running one query shape more often than this fails, as an N+1 load.
+N_PLUS_ONE_THRESHOLD = 5
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An application on a freshly migrated SQLite database, inside an app context."""
+    monkeypatch.setenv('DATABASE_URL', os.getenv('TEST_DATABASE_URL') or f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('AI_MODEL_CLIENT', 'fake')
+    monkeypatch.setenv('AI_JOBS_INLINE', 'true')
+    monkeypatch.setenv('N_PLUS_ONE_THRESHOLD', str(N_PLUS_ONE_THRESHOLD))
+    monkeypatch.setenv('N_PLUS_ONE_RAISE', 'true')
+    from flask_migrate import upgrade
+    from app import create_app, db
+    from app.cookable import _index_cache
+    from app.ingredients import forget_ingredient_ids
+
+    # Per-process caches are tagged with versions that every new database starts again from.
+    forget_ingredient_ids()
+    _index_cache.clear()
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def households(app):
+    """Adds synthetic households: households(count, **sizes) -> [(household id, member email)]."""
+    from app.synthetic import generate_households
+
+    def add(count=1, **sizes):
+        return generate_households(count, seed=7, shapes_folder=os.path.join(ROOT, 'uploads'), **sizes)
+    return add
+
+
+@contextmanager
+def count_query_shapes():
+    """Counts the statements run inside the block by their query_watch shape."""
+    from app import db
+    from app.query_watch import query_shape
+
+    shapes = Counter()
+
+    def count(conn, cursor, statement, *_):
+        shapes[query_shape(statement)] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        yield shapes
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+
+@pytest.fixture
+def login(app):
+    """login(email) -> a test client signed in as that user."""
+    from app import db
+    from app.models import User
+
+    def client_for(email):
+        user_id = db.session.query(User.id).filter_by(email=email).scalar()
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+    return client_for
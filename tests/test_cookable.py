@@ -0,0 +1,28 @@
+from sqlalchemy import select
+
+from app import db
+from app.cookable import get_cookable_index
+from app.dashboard import get_household_stats
+from app.ingredients import resolve_ingredient_ids
+from app.models import Recipe, RecipeIngredient
+
+
+def test_an_index_built_in_a_rolled_back_transaction_is_not_reused(households):
+    (household_id, _), = households(recipes=5, ingredients=20, pantry=5, months=0.5)
+    ids = resolve_ingredient_ids(['Saffron', 'Sumac'])
+    recipe_id = db.session.scalar(select(Recipe.id).filter_by(household_id=household_id))
+    db.session.commit()
+    get_household_stats(household_id)  # Creates the row holding recipe_index_version.
+    get_cookable_index(household_id)
+
+    db.session.add(RecipeIngredient(recipe_id=recipe_id, ingredient_id=ids['saffron'], quantity=1, unit='pinch'))
+    db.session.flush()
+    assert ids['saffron'] in get_cookable_index(household_id).requirements[recipe_id]
+    db.session.rollback()
+
+    # Bumps recipe_index_version to the number the rolled-back transaction had used.
+    db.session.add(RecipeIngredient(recipe_id=recipe_id, ingredient_id=ids['sumac'], quantity=1, unit='tsp'))
+    db.session.commit()
+
+    requirements = get_cookable_index(household_id).requirements[recipe_id]
+    assert ids['sumac'] in requirements and ids['saffron'] not in requirements
@@ -0,0 +1,93 @@
+import io
+
+from sqlalchemy import func, select
+
+from app import db
+from app.csv_import import import_csv
+from app.exports import export_csv
+from app.models import Recipe, RecipeIngredient, User
+
+
+def member(email):
+    return db.session.scalar(select(User).filter_by(email=email))
+
+
+def upload(text, upload_type, user):
+    return import_csv(io.BytesIO(text.encode()), upload_type, user)
+
+
+def exported(table, household_id):
+    return ''.join(export_csv(table, household_id))
+
+
+def test_bad_rows_are_rejected_with_their_line_numbers(app, households):
+    app.config['CSV_IMPORT_MAX_ERRORS'] = 2
+    (_, email), = households(recipes=1, ingredients=1, pantry=0, months=0)
+
+    report = upload(
+        'name,servings,rating,is_favorite\n'
+        'Good soup,4,5,True\n'
+        ',4,5,True\n'
+        'Bad servings,lots,5,False\n'
+        '\n'
+        'Bad rating,2,9,False\n'
+        'Good stew,2,,\n',
+        'recipes', member(email)
+    )
+
+    assert (report.rows, report.created, report.rejected) == (5, 2, 3)
+    assert report.errors == [(3, 'name is required.'), (4, 'servings must be a whole number, not "lots".')]
+    assert report.summary() == '2 recipes added, 3 of 5 rows rejected'
+
+
+def test_a_sheet_recipes_ingredients_may_run_into_the_next_chunk(app, households):
+    app.config['CSV_IMPORT_CHUNK_ROWS'] = 3
+    (household_id, email), = households(recipes=1, ingredients=1, pantry=0, months=0)
+
+    report = upload(
+        'RECIPE,Big salad,Toss it all.,2\n'
+        'INGREDIENT,Lettuce,1,head\n'
+        'INGREDIENT,Tomato,2,\n'
+        'INGREDIENT,Cucumber,1,\n'
+        'INGREDIENT,Olive oil,2,tbsp\n'
+        'RECIPE,Toast,Toast it.,1\n'
+        'INGREDIENT,Bread,2,"slice, thick"\n',
+        'recipes', member(email)
+    )
+
+    assert (report.created, report.ingredient_links, report.rejected) == (2, 5, 0)
+    lines = dict(db.session.execute(
+        select(Recipe.name, func.count(RecipeIngredient.id)).join(RecipeIngredient)
+        .where(Recipe.household_id == household_id, Recipe.name.in_(['Big salad', 'Toast'])).group_by(Recipe.name)
+    ).all())
+    assert lines == {'Big salad': 4, 'Toast': 1}
+    assert db.session.scalar(select(RecipeIngredient.unit).join(Recipe).where(Recipe.name == 'Toast')) == 'slice, thick'
+
+
+def test_recipes_of_another_household_are_rejected(households):
+    (_, email), (other_id, _) = households(2, recipes=2, ingredients=10, pantry=0, months=0)
+    other_recipe = db.session.scalar(select(Recipe).filter_by(household_id=other_id))
+    other_name, other_lines = other_recipe.name, len(other_recipe.ingredients)
+    user = member(email)
+
+    recipes = upload(f'id,name\n{other_recipe.id},Taken over\n', 'recipes', user)
+    ingredients = upload(f'recipe_id,ingredient_name,quantity,unit\n{other_recipe.id},Salt,1,tsp\n', 'recipe_ingredients', user)
+
+    assert recipes.errors == [(2, f'Recipe {other_recipe.id} is not in your household. Leave id blank to add a new recipe.')]
+    assert ingredients.errors == [(2, f'Recipe {other_recipe.id} is not in your household.')]
+    db.session.expire_all()
+    assert other_recipe.name == other_name and len(other_recipe.ingredients) == other_lines
+
+
+def test_an_export_imports_back_unchanged(households):
+    (household_id, email), = households(recipes=12, ingredients=40, pantry=0, months=0)
+    recipes, recipe_ingredients = exported('recipes', household_id), exported('recipe_ingredients', household_id)
+    user = member(email)
+
+    recipe_report = upload(recipes, 'recipes', user)
+    ingredient_report = upload(recipe_ingredients, 'recipe_ingredients', user)
+
+    assert (recipe_report.updated, recipe_report.created, recipe_report.rejected) == (12, 0, 0)
+    assert ingredient_report.ingredient_links == recipe_ingredients.count('\n') - 1 and not ingredient_report.rejected
+    assert exported('recipes', household_id) == recipes
+    assert exported('recipe_ingredients', household_id) == recipe_ingredients
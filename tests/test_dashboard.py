@@ -0,0 +1,68 @@
+from sqlalchemy import delete, func, select
+
+from app import dashboard, db
+from app.dashboard import get_dashboard_stats, get_household_stats, invalidate_household_stats
+from app.models import HouseholdStats, Recipe, ShoppingListItem
+
+from conftest import count_query_shapes
+
+
+def test_dashboard_stats_run_a_fixed_set_of_queries(households):
+    (small_id, _), = households(recipes=5, ingredients=20, pantry=5, months=0.5)
+    (large_id, _), = households(recipes=120, ingredients=200, pantry=60, months=6)
+    db.session.expire_all()
+
+    with count_query_shapes() as small:
+        small_stats = get_dashboard_stats(small_id)
+    with count_query_shapes() as large:
+        large_stats = get_dashboard_stats(large_id)
+
+    assert large_stats['kitchen_stats']['total_recipes'] == 120
+    assert small_stats['kitchen_stats']['total_recipes'] == 5
+    assert large == small
+    assert sum(large.values()) <= 10
+
+
+def test_favoriting_a_recipe_refreshes_only_the_recipe_counts(households):
+    (household_id, _), = households(recipes=20, ingredients=40, pantry=10, months=1)
+    before = get_household_stats(household_id)
+    recipe = db.session.scalars(select(Recipe).filter_by(household_id=household_id, is_favorite=False)).first()
+    recipe.is_favorite = True
+    db.session.commit()
+
+    with count_query_shapes() as shapes:
+        after = get_household_stats(household_id)
+
+    assert after.favorite_recipes == before.favorite_recipes + 1
+    assert after.items_to_buy == before.items_to_buy
+    assert not any('shopping_list_item' in shape or 'meal_plan' in shape for shape in shapes)
+    assert db.session.get(HouseholdStats, household_id, populate_existing=True).stale_parts == 0
+
+
+def test_refreshing_the_snapshot_leaves_the_request_session_uncommitted(households):
+    (household_id, _), = households(recipes=5, ingredients=20, pantry=5, months=0.5)
+    db.session.add(ShoppingListItem(household_id=household_id, name='Candles', category='Other'))
+
+    stats = get_household_stats(household_id)
+    db.session.rollback()
+
+    assert db.session.scalar(select(func.count(ShoppingListItem.id)).filter_by(household_id=household_id)) == 0
+    assert stats.items_to_buy == get_household_stats(household_id).items_to_buy + 1
+
+
+def test_a_write_committed_during_the_first_refresh_leaves_the_snapshot_stale(households, monkeypatch):
+    (household_id, _), = households(recipes=5, ingredients=20, pantry=5, months=0.5)
+    db.session.execute(delete(HouseholdStats))
+    db.session.commit()
+    compute = dashboard._snapshot_parts
+
+    def compute_while_another_request_writes(*args):
+        values = compute(*args)
+        with db.engine.begin() as conn:
+            invalidate_household_stats(household_id, bind=conn)
+        return values
+
+    monkeypatch.setattr(dashboard, '_snapshot_parts', compute_while_another_request_writes)
+    get_household_stats(household_id)
+
+    assert db.session.get(HouseholdStats, household_id, populate_existing=True).is_stale
@@ -0,0 +1,103 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import select, update
+
+from app import db, importer
+from app.models import AIJob, Recipe, User
+
+STEPS = ['Whisk the eggs.', 'Cook them gently in butter.']
+FILLER = ' '.join(['Stir the pot slowly and season to taste before serving it warm.'] * 5)
+
+
+def json_ld_page(name, nutrition=True):
+    recipe = {
+        '@context': 'https://schema.org', '@type': 'Recipe', 'name': name, 'recipeYield': '2 servings',
+        'recipeIngredient': ['3 eggs', '1 tbsp butter'],
+        'recipeInstructions': [{'@type': 'HowToStep', 'text': step} for step in STEPS],
+    }
+    if nutrition:
+        recipe['nutrition'] = {'@type': 'NutritionInformation', 'calories': '210 kcal', 'proteinContent': '13 g',
+                               'fatContent': '16 g', 'carbohydrateContent': '1 g'}
+    return f'<html><head><script type="application/ld+json">{json.dumps(recipe)}</script></head><body></body></html>'
+
+
+MICRODATA_PAGE = f'''<html><body><div itemscope itemtype="https://schema.org/Recipe">
+<h1 itemprop="name">Microdata Pancakes</h1><meta itemprop="recipeYield" content="4">
+<ul><li itemprop="recipeIngredient">2 cups flour</li><li itemprop="recipeIngredient">1 cup milk</li></ul>
+<div itemprop="recipeInstructions">Mix, then fry in a hot pan.</div>
+<div itemprop="nutrition" itemscope itemtype="https://schema.org/NutritionInformation">
+<span itemprop="calories">350 calories</span><span itemprop="proteinContent">9 g</span>
+<span itemprop="fatContent">7 g</span><span itemprop="carbohydrateContent">60 g</span></div>
+</div></body></html>'''
+
+
+def plain_page(canonical=None):
+    link = f'<link rel="canonical" href="{canonical}">' if canonical else ''
+    return f'<html><head>{link}</head><body><article><h1>Grandma\'s stew</h1><p>{FILLER}</p></article></body></html>'
+
+
+@pytest.fixture
+def recipe_site():
+    """A local web server with recipe pages of every kind: site(path) -> its URL."""
+    pages = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(self.path.split('?')[0])
+            self.send_response(200 if body else 404)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.end_headers()
+            self.wfile.write((body or 'Not found').encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def site(path):
+        return f'http://127.0.0.1:{server.server_port}{path}'
+    pages.update({
+        '/json-ld': json_ld_page('Structured Omelette'),
+        '/json-ld-no-nutrition': json_ld_page('Lean Omelette', nutrition=False),
+        '/microdata': MICRODATA_PAGE,
+        '/plain': plain_page(),
+        '/plain-copy': plain_page(canonical=site('/plain')),
+    })
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+def test_a_batch_import_charges_only_for_pages_that_needed_the_model(app, households, login, recipe_site, monkeypatch):
+    app.config['IMPORT_HOST_INTERVAL'] = 0
+    monkeypatch.setattr(importer, '_http', None)
+    reported, report_progress = [], importer.report_progress
+    monkeypatch.setattr(importer, 'report_progress', lambda progress: (
+        reported.append([entry['status'] for entry in progress]), report_progress(progress)))
+    (household_id, email), = households(recipes=3, ingredients=10, pantry=3, months=0.5)
+    db.session.execute(update(User).where(User.email == email).values(ai_credits=10, subscription_plan='free'))
+    db.session.commit()
+    urls = [recipe_site(path) for path in ('/json-ld', '/json-ld-no-nutrition', '/microdata', '/plain', '/plain-copy', '/missing')]
+    urls += [recipe_site('/plain?utm_source=newsletter'), 'not a url']
+
+    response = login(email).post('/api/import-recipes', json={'urls': urls})
+
+    job = db.session.get(AIJob, response.get_json()['job_id'], populate_existing=True)
+    statuses = [entry['status'] for entry in job.progress]
+    assert job.status == 'succeeded'
+    assert statuses[:3] == ['imported'] * 3 and statuses[5:] == ['failed', 'duplicate', 'failed']
+    # The copy names the plain page as canonical; whichever of the two is fetched first is imported.
+    assert sorted(statuses[3:5]) == ['duplicate', 'imported']
+    names = set(db.session.scalars(select(Recipe.name).where(Recipe.id.in_(job.result['recipe_ids']))))
+    assert {'Structured Omelette', 'Lean Omelette', 'Microdata Pancakes'} < names and len(names) == 4
+    # Every URL's status as each fetch finished, starting from the duplicates and bad addresses.
+    assert reported[0] == ['queued'] * 6 + ['duplicate', 'failed']
+    assert len(reported) >= 7 and reported[-1] == statuses
+    # Six unique pages were reserved; only the page without nutrition and the plain page called the model.
+    assert job.reserved_credits == 0
+    assert db.session.scalar(select(User.ai_credits).where(User.email == email)) == 8
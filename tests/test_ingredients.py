@@ -0,0 +1,54 @@
+from sqlalchemy import delete, select, update
+
+from app import db
+from app.ingredients import forget_ingredient_ids, resolve_ingredient_ids
+from app.models import Ingredient, IngredientCatalogVersion, Recipe, RecipeIngredient
+from app.search import search_recipes
+
+
+def test_deleting_an_ingredient_used_by_recipes(households, login):
+    (_, email), = households(recipes=5, ingredients=20, pantry=5, months=0.5)
+    ingredient_id = db.session.scalar(select(RecipeIngredient.ingredient_id))
+    db.session.remove()
+
+    response = login(email).post(f'/ingredient/{ingredient_id}/delete', follow_redirects=True)
+
+    assert b'Successfully deleted' in response.data
+    assert db.session.get(Ingredient, ingredient_id) is None
+    assert not db.session.scalars(select(RecipeIngredient).filter_by(ingredient_id=ingredient_id)).all()
+
+
+def test_resolving_non_ascii_names(app):
+    names = ['Ñame', 'Crème Fraîche', 'Jalapeño']
+
+    created = resolve_ingredient_ids(names)
+    db.session.commit()
+
+    assert set(created) == {'ñame', 'crème fraîche', 'jalapeño'}
+    forget_ingredient_ids()
+    assert resolve_ingredient_ids(names) == created
+    assert set(resolve_ingredient_ids(name.upper() for name in names)) == set(created)
+
+
+def test_deleting_an_ingredient_retires_ids_cached_by_other_processes(app):
+    ingredient_id = resolve_ingredient_ids(['Shallot'])['shallot']
+    db.session.commit()
+
+    # A bulk delete, as another worker or `flask nuke-ingredients` would run it.
+    db.session.execute(delete(Ingredient).where(Ingredient.id == ingredient_id))
+    db.session.execute(update(IngredientCatalogVersion).values(version=IngredientCatalogVersion.version + 1))
+    db.session.commit()
+
+    new_id = resolve_ingredient_ids(['shallot'])['shallot']
+    assert db.session.get(Ingredient, new_id).name == 'shallot'
+
+
+def test_nuking_ingredients_drops_them_from_recipe_search(app, households):
+    households(recipes=5, ingredients=20, pantry=5, months=0.5)
+    name = db.session.scalar(select(Ingredient.name).join(RecipeIngredient).limit(1))
+    assert search_recipes(Recipe.query, name, fields=('ingredients',)).count()
+
+    result = app.test_cli_runner().invoke(args=['nuke-ingredients'], input='y\n')
+
+    assert 'Success!' in result.output
+    assert search_recipes(Recipe.query, name, fields=('ingredients',)).count() == 0
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import current_app, g
+from sqlalchemy import select, update
+
+from app import db
+from app import jobs
+from app.jobs import (JOB_INTERRUPTED, InsufficientCredits, JobError, enqueue_job, job_handler, job_status,
+                      report_progress, spend_ai_credit)
+from app.models import AIJob, Recipe, User
+
+polled = []
+
+
+@job_handler('test_failure', 'Failed: {error}')
+def run_test_failure(payload, user, client):
+    client.generate('Anything', task='freeform')
+    raise JobError('The model said no.')
+
+
+@job_handler('test_batch', 'Failed: {error}', charges_credit=False)
+def run_test_batch(payload, user, client):
+    for step in range(payload['steps']):
+        client.generate('Anything', task='freeform')
+        spend_ai_credit()
+        report_progress([{'step': step}])
+        backdate(g.job.id, *payload['backdate'])
+        polled.append(poll(g.job.id)['status'])
+    return {'steps': payload['steps']}
+
+
+def backdate(job_id, *columns):
+    """Moves the job's `columns` an hour into the past, as if it had been running that long."""
+    with db.engine.begin() as connection:
+        connection.execute(update(AIJob).where(AIJob.id == job_id).values(
+            {column: datetime.utcnow() - timedelta(hours=1) for column in columns}
+        ))
+
+
+def poll(job_id):
+    """job_status() as a status request sees it, in its own app context and session."""
+    with current_app.app_context():
+        return job_status(db.session.get(AIJob, job_id))
+
+
+def member(email, credits):
+    db.session.execute(update(User).where(User.email == email).values(ai_credits=credits))
+    db.session.commit()
+    return db.session.scalar(select(User).filter_by(email=email))
+
+
+def credits_of(user_id):
+    return db.session.scalar(select(User.ai_credits).where(User.id == user_id).execution_options(populate_existing=True))
+
+
+def test_queued_jobs_cannot_outnumber_credits(app, households, login, monkeypatch):
+    (_, email), = households(recipes=3, ingredients=10, pantry=3, months=0.5)
+    user = member(email, 1)
+    app.config['AI_JOBS_INLINE'] = False
+    queued = []
+    monkeypatch.setattr(jobs, '_get_executor', lambda app: type('Executor', (), {'submit': lambda self, *args: queued.append(args)})())
+    client = login(email)
+
+    first = client.post('/api/generate-from-ingredients', json={'ingredients': 'eggs'})
+    second = client.post('/api/generate-from-ingredients', json={'ingredients': 'rice'})
+
+    assert first.status_code == 202 and second.status_code == 403
+    assert credits_of(user.id) == 0 and len(queued) == 1
+    # A request that got past require_ai_credits before the reservation still can't queue a job.
+    with pytest.raises(InsufficientCredits):
+        enqueue_job('generate_from_ingredients', db.session.get(User, user.id), {'ingredients': 'beans'})
+    assert db.session.scalar(select(AIJob.reserved_credits)) == 1
+
+
+def test_a_failed_job_returns_its_credit(households):
+    (_, email), = households(recipes=3, ingredients=10, pantry=3, months=0.5)
+    user = member(email, 2)
+
+    job = enqueue_job('test_failure', user, {})
+    db.session.refresh(job)
+
+    assert job.status == 'failed' and job.reserved_credits == 0
+    assert credits_of(user.id) == 2
+
+
+def test_a_successful_job_spends_its_credit_and_a_cache_hit_is_free(app, households):
+    app.config['AI_CACHE_HITS_CHARGE_CREDITS'] = False
+    (household_id, email), = households(recipes=3, ingredients=10, pantry=3, months=0.5)
+    user = member(email, 2)
+    recipe_name = db.session.scalar(select(Recipe.name).filter_by(household_id=household_id))
+
+    first = enqueue_job('remix_recipe', user, {'recipe_name': recipe_name, 'remix_type': 'vegan'})
+    second = enqueue_job('remix_recipe', user, {'recipe_name': recipe_name, 'remix_type': 'vegan'})
+    db.session.refresh(first)
+    db.session.refresh(second)
+
+    assert first.status == second.status == 'succeeded'
+    assert credits_of(user.id) == 1
+
+
+def test_a_long_batch_reporting_progress_is_not_expired(households):
+    (_, email), = households(recipes=3, ingredients=10, pantry=3, months=0.5)
+    user = member(email, 5)
+    polled.clear()
+
+    job = enqueue_job('test_batch', user, {'steps': 3, 'backdate': ['created_at', 'started_at']}, credits=4)
+    db.session.refresh(job)
+
+    assert polled == ['running'] * 3
+    assert job.status == 'succeeded' and job.progress == [{'step': 2}]
+    assert credits_of(user.id) == 2
+
+
+def test_an_expired_job_is_not_revived_by_its_thread(households):
+    (_, email), = households(recipes=3, ingredients=10, pantry=3, months=0.5)
+    user = member(email, 5)
+    polled.clear()
+
+    job = enqueue_job('test_batch', user, {'steps': 2, 'backdate': ['created_at', 'started_at', 'heartbeat_at']},
+                      credits=4)
+    db.session.refresh(job)
+
+    assert polled == ['failed']
+    assert job.status == 'failed' and job.error == JOB_INTERRUPTED and job.result is None
+    # The model call before the expiry is paid for; the rest of the reservation came back.
+    assert job.reserved_credits == 0 and credits_of(user.id) == 4
+
+
+def test_a_queued_job_expires_only_when_its_process_is_gone(app, households, monkeypatch):
+    (_, email), = households(recipes=3, ingredients=10, pantry=3, months=0.5)
+    user = member(email, 1)
+    app.config['AI_JOBS_INLINE'] = False
+    monkeypatch.setattr(jobs, '_get_executor', lambda app: type('Executor', (), {'submit': lambda self, *args: None})())
+    job = enqueue_job('test_failure', user, {})
+
+    backdate(job.id, 'created_at')
+    assert poll(job.id)['status'] == 'queued'
+
+    backdate(job.id, 'heartbeat_at')
+    assert poll(job.id) == {'job_id': job.id, 'kind': 'test_failure', 'status': 'failed', 'error': JOB_INTERRUPTED}
+    assert credits_of(user.id) == 1
+
+    jobs.run_job(app, job.id)
+    db.session.refresh(job)
+    assert job.status == 'failed' and job.error == JOB_INTERRUPTED
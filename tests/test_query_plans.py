@@ -0,0 +1,107 @@
+import re
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+
+from app import db
+from app.models import (Household, User, Recipe, Ingredient, RecipeIngredient, MealPlan, PantryItem,
+                        HistoricalPlan, HistoricalPlanEntry)
+
+TODAY = date(2026, 1, 5)
+
+# (label, SQL) pairs mirroring the ORM filters in the routes.
+HOT_QUERIES = [
+    ('meal plan by week', """
+        SELECT * FROM meal_plan WHERE household_id = :hh AND meal_date BETWEEN :start AND :end"""),
+    ("today's dinner", """
+        SELECT * FROM meal_plan WHERE household_id = :hh AND meal_date = :start AND meal_slot = 'Dinner'"""),
+    ('meal plan by recipe', """
+        SELECT * FROM meal_plan WHERE recipe_id = :rid"""),
+    ('pantry item lookup', """
+        SELECT * FROM pantry_item WHERE household_id = :hh AND ingredient_id = :iid"""),
+    ('pantry in stock', """
+        SELECT * FROM pantry_item WHERE household_id = :hh AND quantity > 0"""),
+    ('recipe ingredients', """
+        SELECT * FROM recipe_ingredient WHERE recipe_id = :rid"""),
+    ('recipes using ingredient', """
+        SELECT * FROM recipe_ingredient WHERE ingredient_id = :iid"""),
+    ('ingredient by name', """
+        SELECT * FROM ingredient WHERE lower(name) = lower(:name)"""),
+    ('recipes by name', """
+        SELECT * FROM recipe WHERE household_id = :hh ORDER BY name"""),
+    ('shopping list', """
+        SELECT * FROM shopping_list_item WHERE household_id = :hh"""),
+    ('saved meals', """
+        SELECT * FROM saved_meal WHERE household_id = :hh ORDER BY name"""),
+    ('saved meals using recipe', """
+        SELECT * FROM saved_meal_recipe_link WHERE recipe_id = :rid"""),
+    ('historical plans', """
+        SELECT * FROM historical_plan WHERE household_id = :hh ORDER BY name"""),
+    ('historical plan entries', """
+        SELECT * FROM historical_plan_entry WHERE historical_plan_id = :pid"""),
+    ('grocery stores', """
+        SELECT * FROM grocery_store WHERE household_id = :hh ORDER BY name"""),
+    ('household members', """
+        SELECT * FROM "user" WHERE household_id = :hh"""),
+    ('household invitations', """
+        SELECT * FROM household_invitation WHERE household_id = :hh"""),
+]
+
+
+def seed():
+    ids = {}
+    for n in range(3):
+        household_id = db.session.execute(insert(Household).values(name=f'Plans {n}')).inserted_primary_key[0]
+        user_id = db.session.execute(insert(User).values(
+            email=f'plans-{household_id}@example.com', password='x', household_id=household_id,
+            subscription_plan='free', ai_credits=0
+        )).inserted_primary_key[0]
+        ingredient_ids = [db.session.execute(insert(Ingredient).values(name=f'Ingredient {household_id}-{i}')).inserted_primary_key[0]
+                          for i in range(20)]
+        recipe_ids = [db.session.execute(insert(Recipe).values(
+            user_id=user_id, household_id=household_id, name=f'Recipe {household_id}-{i}', instructions='',
+            is_favorite=False, meal_type='Main Course', rating=0
+        )).inserted_primary_key[0] for i in range(20)]
+        db.session.execute(insert(RecipeIngredient), [
+            {'recipe_id': rid, 'ingredient_id': iid, 'quantity': 1, 'unit': 'cup'}
+            for rid in recipe_ids for iid in ingredient_ids[:3]
+        ])
+        db.session.execute(insert(PantryItem), [
+            {'household_id': household_id, 'ingredient_id': iid, 'quantity': 1, 'unit': 'cup'} for iid in ingredient_ids
+        ])
+        db.session.execute(insert(MealPlan), [
+            {'household_id': household_id, 'recipe_id': recipe_ids[d % 20], 'meal_date': TODAY + timedelta(days=d),
+             'meal_slot': 'Dinner', 'is_eaten': False}
+            for d in range(60)
+        ])
+        plan_id = db.session.execute(insert(HistoricalPlan).values(household_id=household_id, name='Plan')).inserted_primary_key[0]
+        db.session.execute(insert(HistoricalPlanEntry), [
+            {'historical_plan_id': plan_id, 'day_of_week': d, 'meal_slot': 'Dinner', 'recipe_id': recipe_ids[d]} for d in range(7)
+        ])
+        ids = {'hh': household_id, 'rid': recipe_ids[0], 'iid': ingredient_ids[0], 'pid': plan_id}
+    db.session.commit()
+    return ids
+
+
+def full_scans(sql, params):
+    """Returns the tables a statement reads without an index, according to EXPLAIN."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params).all()
+        # "SCAN meal_plan" is a full scan; "SCAN x USING [COVERING] INDEX" and "SEARCH" are not.
+        return [m.group(1) for row in rows for m in [re.match(r'SCAN (?:TABLE )?(\w+)$', row[-1])] if m]
+    # On Postgres sequential scans are disabled for the session, so a Seq Scan in a plan means
+    # no usable index exists (the planner would otherwise prefer one on tables this small).
+    db.session.execute(text('SET enable_seqscan = off'))
+    rows = db.session.execute(text('EXPLAIN ' + sql), params).scalars().all()
+    return [m.group(1) for line in rows for m in [re.search(r'Seq Scan on "?(\w+)"?', line)] if m]
+
+
+def test_hot_filters_use_an_index(app):
+    params = seed()
+    db.session.execute(text('ANALYZE'))
+    params.update(start=TODAY, end=TODAY + timedelta(days=6), name='INGREDIENT 1-0')
+
+    scans = {label: full_scans(sql, params) for label, sql in HOT_QUERIES}
+
+    assert {label: tables for label, tables in scans.items() if tables} == {}
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import select
+
+from app import db
+from app.models import HistoricalPlan, HistoricalPlanEntry, Recipe, SavedMeal
+
+from conftest import N_PLUS_ONE_THRESHOLD, count_query_shapes
+
+
+def add_saved_meals_and_plan(household_id):
+    """Twelve saved meals of four recipes each and a historical week with three meals a day."""
+    recipes = db.session.scalars(select(Recipe).filter_by(household_id=household_id).order_by(Recipe.id)).all()
+    for number in range(12):
+        db.session.add(SavedMeal(name=f'Meal {number}', household_id=household_id,
+                                 recipes=recipes[number * 4:number * 4 + 4]))
+    plan = HistoricalPlan(name='Last week', household_id=household_id, entries=[
+        HistoricalPlanEntry(day_of_week=day, meal_slot=slot, recipe_id=recipes[day * 3 + slot_number].id)
+        for day in range(7) for slot_number, slot in enumerate(('Breakfast', 'Lunch', 'Dinner'))
+    ])
+    db.session.add(plan)
+    db.session.commit()
+    return plan.id, recipes[0].id
+
+
+@pytest.mark.parametrize('route', ['pantry', 'view_recipe', 'saved_meals', 'shopping_list', 'load_historical_plan'])
+def test_pages_run_each_query_shape_a_bounded_number_of_times(households, login, route):
+    (household_id, email), = households(recipes=60, ingredients=120, pantry=40, months=1)
+    plan_id, recipe_id = add_saved_meals_and_plan(household_id)
+    url = {
+        'pantry': '/pantry',
+        'view_recipe': f'/recipe/{recipe_id}',
+        'saved_meals': '/saved-meals',
+        'shopping_list': '/shopping-list',
+        'load_historical_plan': f'/api/load-historical-plan/{plan_id}',
+    }[route]
+    client = login(email)
+
+    with count_query_shapes() as shapes:
+        response = client.get(url)
+
+    assert response.status_code == 200
+    assert max(shapes.values()) <= N_PLUS_ONE_THRESHOLD, shapes.most_common(3)
@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.ingredients import resolve_ingredient_ids
+from app.models import MealPlan, PantryItem, Recipe, RecipeIngredient, User
+from app.shopping import compute_shopping_lists
+
+DAY = date(2031, 3, 4)
+
+
+@pytest.fixture
+def plan(households):
+    """
+    plan(lines, pantry) -> the shopping list entries, by ingredient name, for a day with a
+    recipe of `lines` planned; lines and pantry rows are (ingredient name, quantity, unit).
+    """
+    (household_id, _), = households(recipes=1, ingredients=1, pantry=0, months=0)
+    user_id = db.session.query(User.id).filter_by(household_id=household_id).scalar()
+
+    def shopping_list(lines, pantry=()):
+        ids = resolve_ingredient_ids(name for name, _, _ in [*lines, *pantry])
+        recipe = Recipe(user_id=user_id, household_id=household_id, name='Test bake', instructions='Bake.', ingredients=[
+            RecipeIngredient(ingredient_id=ids[name.lower()], quantity=quantity, unit=unit) for name, quantity, unit in lines
+        ])
+        db.session.add(MealPlan(household_id=household_id, meal_date=DAY, recipe=recipe))
+        db.session.add_all(PantryItem(household_id=household_id, ingredient_id=ids[name.lower()], quantity=quantity, unit=unit)
+                           for name, quantity, unit in pantry)
+        db.session.commit()
+        shopping = compute_shopping_lists([household_id], DAY, DAY)[household_id]
+        return {name: item for items in shopping['grouped_list'].values() for name, item in items.items()}
+    return shopping_list
+
+
+def test_amounts_of_one_dimension_are_added_up(plan):
+    items = plan([('Flour', 1, 'cup'), ('Flour', 2, 'tbsp'), ('Butter', 100, 'g'), ('Butter', 0.5, 'kg')])
+
+    assert items['Flour']['quantity'] == pytest.approx(1.125) and items['Flour']['units'] == ['cup']
+    assert items['Butter']['quantity'] == pytest.approx(600) and items['Butter']['units'] == ['gram']
+
+
+def test_amounts_of_different_dimensions_are_kept_apart(plan):
+    items = plan([('Sugar', 200, 'g'), ('Sugar', 1, 'cup'), ('Sugar', 50, 'g'), ('Eggs', 2, ''), ('Eggs', 1, 'cup')])
+
+    assert items['Sugar']['quantity'] == pytest.approx(250) and items['Sugar']['units'] == ['gram']
+    assert items['Sugar']['note'] == 'Not in pantry. Also needed: 1.00 cup'
+    assert items['Eggs']['quantity'] == pytest.approx(2) and items['Eggs']['units'] == ['']
+    assert items['Eggs']['note'] == 'Not in pantry. Also needed: 1.00 cup'
+
+
+def test_the_pantry_is_taken_off_in_its_own_units(plan):
+    items = plan(
+        [('Butter', 250, 'g'), ('Rice', 1, 'cup'), ('Milk', 2, 'cup'), ('Oats', 1, 'cup')],
+        pantry=[('Butter', 0.1, 'kg'), ('Rice', 2, 'cup'), ('Milk', 8, 'tbsp'), ('Oats', 3, 'lb')],
+    )
+
+    assert items['Butter']['quantity'] == pytest.approx(150) and items['Butter']['note'] is None
+    assert 'Rice' not in items
+    assert items['Milk']['quantity'] == pytest.approx(1.5) and items['Milk']['units'] == ['cup']
+    # Stock in another dimension can't be taken off.
+    assert items['Oats']['quantity'] == pytest.approx(1)
+    assert items['Oats']['note'] == 'Unit Mismatch! Check pantry: you have 3.0 lb'
+
+
+def test_a_pantry_substitute_is_taken_off_when_its_own_name_is_not_needed(plan):
+    items = plan(
+        [('Scallions', 4, ''), ('Chopped Cilantro', 1, 'cup'), ('Chickpeas', 2, 'cup'), ('Garbanzo Beans', 1, 'cup')],
+        pantry=[('Green Onion', 6, ''), ('Coriander', 0.5, 'cup'), ('Garbanzo Beans', 1, 'cup')],
+    )
+
+    assert 'Scallions' not in items
+    assert items['Chopped Cilantro']['quantity'] == pytest.approx(0.5)
+    assert items['Chopped Cilantro']['note'] == 'Counting the Coriander in your pantry'
+    # The garbanzo beans are needed under their own name, so they don't stand in for the chickpeas.
+    assert 'Garbanzo Beans' not in items
+    assert items['Chickpeas']['quantity'] == pytest.approx(2) and items['Chickpeas']['note'] == 'Not in pantry'
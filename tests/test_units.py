@@ -0,0 +1,16 @@
+import pint
+import pytest
+
+from app.units import parse_quantity
+
+
+@pytest.mark.parametrize('unit', ['blorps', '1-2 cups'])
+def test_unparseable_units_raise_a_new_error_each_time(unit):
+    errors = []
+    for _ in range(2):
+        with pytest.raises((pint.errors.UndefinedUnitError, pint.errors.DimensionalityError)) as raised:
+            parse_quantity(1, unit)
+        errors.append(raised.value)
+
+    assert errors[0] is not errors[1]
+    assert type(errors[0]) is type(errors[1]) and str(errors[0]) == str(errors[1])